@@ -1,25 +1,186 @@
 # core/admin.py
+"""
+Admin des grosses tables (Listing, ListingPhoto, FetchLog): pas de
+<select> de toutes les fiches (autocomplete), pas de date_hierarchy
+(agrégats de dates distinctes à chaque affichage), recherche par préfixe
+d'ID sur un index, COUNT(*) estimé sans filtre et
+changelists limitées aux colonnes affichées.
+
+Actions « Exporter en CSV / NDJSON » (fiches, messages de contact): la
+sélection, ou toute la liste filtrée avec « Sélectionner tous », est
+envoyée en flux (core/export.py).
+"""
+from typing import Optional
+
 from django.contrib import admin
-from .models import Agent, Certification, Listing, ListingPhoto, FetchLog
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import export
+from .models import (
+    Agent, CatalogRelease, Certification, ContactMessage, FetchLog, Listing, ListingPhoto, SavedSearch,
+    SavedSearchMatch,
+)
 from django.utils.html import format_html
 from .models import Certification
 
+ESTIMATE_THRESHOLD = 10000   # en deçà, le COUNT(*) exact est bon marché
+PREFIX_END = "\U0010ffff"    # borne haute d'une recherche par préfixe (plage sur l'index)
+
+
+def estimated_count(model, using="default") -> Optional[int]:
+    """Nombre de lignes selon les statistiques du planificateur (ANALYZE), None si inconnu."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "sqlite":
+                # 1er entier de stat = nombre de lignes de la table
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+        except DatabaseError:  # sqlite_stat1 absente: jamais analysée
+            return None
+        row = cursor.fetchone()
+    if not row:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None  # PostgreSQL: -1 = jamais analysée
+
+
+class EstimatedCountPaginator(Paginator):
+    """COUNT(*) exact si la liste est filtrée ou la table petite; sinon l'estimation."""
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        if not qs.query.where:
+            estimate = estimated_count(qs.model, qs.db)
+            if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class LeanChangeList(ChangeList):
+    """Ne lit que `list_only` (les colonnes affichées), pas les descriptions ni le JSON."""
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(*self.model_admin.list_only)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # pas de second COUNT(*) de la table entière
+    list_only = ()
+    prefix_search_field = ""        # champ de search_fields cherché par préfixe (plage >= / < sur l'index)
+
+    def get_changelist(self, request, **kwargs):
+        return LeanChangeList if self.list_only else super().get_changelist(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not self.prefix_search_field or not term or " " in term:
+            return super().get_search_results(request, queryset, search_term)
+        field = self.prefix_search_field
+        match = Q(**{f"{field}__gte": term, f"{field}__lt": term + PREFIX_END})
+        for name in self.search_fields:
+            if name != field:
+                match |= Q(**{f"{name}__icontains": term})
+        return queryset.filter(match), False
+
+
+class ExportActionsMixin:
+    """Exports en flux du queryset de l'action (colonnes: export.EXPORT_FIELDS)."""
+    actions = ("export_csv", "export_ndjson")
+
+    @admin.action(description="Exporter en CSV")
+    def export_csv(self, request, queryset):
+        return export.streaming_response(queryset, "csv")
+
+    @admin.action(description="Exporter en NDJSON")
+    def export_ndjson(self, request, queryset):
+        return export.streaming_response(queryset, "ndjson")
+
+
+class DecadeFilter(admin.SimpleListFilter):
+    """Décennie de construction: choix fixes (pas de SELECT DISTINCT sur la table)."""
+    title = "année de construction"
+    parameter_name = "decade"
+
+    def lookups(self, request, model_admin):
+        return [("old", "Avant 1950")] + [(str(y), f"{y}–{y + 9}") for y in range(1950, 2030, 10)]
+
+    def queryset(self, request, queryset):
+        if self.value() == "old":
+            return queryset.filter(annee_construction__lt=1950)
+        if self.value():
+            start = int(self.value())
+            return queryset.filter(annee_construction__gte=start, annee_construction__lt=start + 10)
+        return queryset
+
+
 @admin.register(Listing)
-class ListingAdmin(admin.ModelAdmin):
-    list_display = ("centris_id", "adresse", "prix", "status", "last_seen_at", "first_seen_at")
-    list_filter = ("status", "annee_construction")
-    search_fields = ("centris_id", "adresse", "description", "proximites_text", "caracteristiques_text")
-    readonly_fields = ("first_seen_at", "updated_at", "last_seen_at", "sold_at")
-    date_hierarchy = "first_seen_at"
+class ListingAdmin(ExportActionsMixin, LargeTableAdmin):
+    # Une ligne par fiche et par version du catalogue (core/catalog.py)
+    list_display = ("centris_id", "adresse", "prix", "status", "release_id", "last_seen_at", "first_seen_at")
+    list_only = list_display
+    list_filter = ("status", DecadeFilter, "first_seen_at")
+    # ID: préfixe sur l'index de centris_id; adresse en icontains (les textes longs ne sont plus parcourus)
+    search_fields = ("centris_id", "adresse")
+    prefix_search_field = "centris_id"
+    search_help_text = "Début de l'ID Centris ou partie de l'adresse"
+    raw_id_fields = ("release",)
+    readonly_fields = ("first_seen_at", "updated_at", "last_seen_at", "sold_at", "revision")
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(ExportActionsMixin, admin.ModelAdmin):
+    list_display = ("created_at", "name", "email", "phone", "emailed_at", "crm_synced_at")
+    list_filter = ("created_at",)
+    search_fields = ("name", "email", "phone")
+    readonly_fields = ("created_at", "emailed_at", "crm_synced_at", "notify_attempts")
+
+class SavedSearchMatchInline(admin.TabularInline):
+    model = SavedSearchMatch
+    fields = ("created_at", "kind", "listing_id", "prix", "prix_before", "notified_at")
+    readonly_fields = fields
+    ordering = ("-pk",)
+    extra = 0
+    max_num = 0
+
+@admin.register(SavedSearch)
+class SavedSearchAdmin(admin.ModelAdmin):
+    list_display = ("email", "name", "prix_min", "prix_max", "chambres_min", "sdb_min", "active", "created_at")
+    list_filter = ("active",)
+    search_fields = ("email", "name")
+    inlines = (SavedSearchMatchInline,)
 
 @admin.register(ListingPhoto)
-class ListingPhotoAdmin(admin.ModelAdmin):
-    list_display = ("listing", "sequence", "url")
-    search_fields = ("listing__centris_id", "url")
+class ListingPhotoAdmin(LargeTableAdmin):
+    list_display = ("listing_id", "sequence", "url")
+    list_only = ("listing_id", "sequence", "url")
+    ordering = ("-pk",)  # index de la clé primaire, pas de tri de toute la table
+    autocomplete_fields = ("listing",)
+    search_fields = ("listing__centris_id",)
+    prefix_search_field = "listing__centris_id"
+    search_help_text = "Début de l'ID Centris de la fiche"
 
 @admin.register(FetchLog)
-class FetchLogAdmin(admin.ModelAdmin):
+class FetchLogAdmin(LargeTableAdmin):
     list_display = ("created_at", "file_date", "source_name", "items_total", "items_added", "items_updated", "items_marked_sold", "duration_seconds")
+    list_filter = ("created_at",)
+    ordering = ("-pk",)
+
+@admin.register(CatalogRelease)
+class CatalogReleaseAdmin(admin.ModelAdmin):
+    list_display = ("pk", "created_at", "source_name", "state", "parent", "active_before", "items_total", "items_added", "items_marked_sold", "items_reactivated")
+    list_filter = ("state",)
+    list_select_related = ("parent",)
+    readonly_fields = ("rolled_back_at", "parent")
     date_hierarchy = "created_at"
 
 
@@ -33,7 +194,7 @@ class CertificationAdmin(admin.ModelAdmin):
 
     def thumb(self, obj):
         if obj.logo:
-            return format_html('<img src="{}" style="height:40px;object-fit:contain;" />', obj.logo.url)
+            return format_html('<img src="{}" style="height:40px;object-fit:contain;" />', obj.logo_thumb)
         return "—"
     thumb.short_description = "Logo"
 
@@ -56,7 +217,7 @@ class AgentAdmin(admin.ModelAdmin):
         if getattr(obj, "photo", None):
             return format_html(
                 '<img src="{}" style="height:72px;width:72px;object-fit:cover;border-radius:9999px;border:1px solid #e5e7eb;" />',
-                obj.photo.url,
+                obj.photo_thumb,
             )
         return "—"
     photo_preview.short_description = "Aperçu"
\ No newline at end of file
@@ -0,0 +1,328 @@
+# core/alerts.py
+"""
+Alertes des recherches enregistrées (SavedSearch), après chaque import.
+
+On n'évalue que le delta de l'import (journal des changements,
+core/changes.py): fiches CREATED -> « nouvelle fiche », UPDATED avec un
+prix en baisse -> « baisse de prix ». Les recherches ne sont pas parcourues
+une à une pour chaque fiche: `SearchIndex` les range par prédicat.
+
+- prix: intervalles de PRICE_BUCKET $. Chaque case connaît les recherches
+  qui la couvrent entièrement (aucune vérification) et, triées par borne,
+  celles dont le minimum ou le maximum tombe dans la case (bisect);
+- chambres / sdb: pour chaque valeur k, les recherches dont le minimum est
+  <= k (ou absent); une fiche à k chambres garde leur intersection;
+- codes "CAT:VAL": recherches groupées par ensemble de codes exigés, liste
+  inversée code -> ensembles qui le contiennent. Une fiche ne teste que les
+  ensembles atteints par ses propres codes;
+- texte: vérifié en dernier, sur les seules candidates qui en ont un.
+
+Les correspondances sont enregistrées (SavedSearchMatch, une seule fois
+par fiche, type et prix) puis envoyées par lots: un job RQ par
+ALERT_BATCH_SIZE correspondances, un courriel par adresse. Redis
+indisponible: rien n'est perdu, `manage.py send_notifications` envoie ce
+qui attend en base. Mesure: `manage.py bench_alerts --searches 100000`.
+"""
+import logging
+import unicodedata
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import django_rq
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rq import Retry
+
+from .models import Listing, ListingChange, SavedSearch, SavedSearchMatch
+
+logger = logging.getLogger("core.alerts")
+
+PRICE_BUCKET = 50000
+PRICE_BUCKETS = 60                    # au-delà de 3 M$: dernière case, ouverte
+ALERT_BATCH_SIZE = 500
+RETRY_INTERVALS = [30, 120, 600, 1800, 3600]
+SEARCH_FIELDS = ("pk", "prix_min", "prix_max", "chambres_min", "sdb_min", "codes", "texte")
+LISTING_FIELDS = ("centris_id", "slug", "prix", "adresse", "nombre_chambres", "nombre_sdb",
+                  "description", "proximites", "caracteristiques")
+
+
+class AlertError(Exception):
+    pass
+
+
+# --- codes et texte des fiches -------------------------------------------------
+@lru_cache(maxsize=None)
+def _reverse_labels():
+    # Libellés de l'import -> codes Centris (un code non mappé est gardé tel quel à l'import)
+    from .management.commands.import_centris import CAT_LABEL, VAL_LABEL
+    return {v: k for k, v in CAT_LABEL.items()}, {v: k for k, v in VAL_LABEL.items()}
+
+
+def listing_codes(listing: dict) -> Set[str]:
+    cats, vals = _reverse_labels()
+    codes = {f"PROX:{vals.get(label, label)}" for label in listing.get("proximites") or []}
+    for item in listing.get("caracteristiques") or []:
+        if isinstance(item, dict):
+            cat, val = item.get("cat", ""), item.get("val", "")
+            codes.add(f"{cats.get(cat, cat)}:{vals.get(val, val)}")
+    return codes
+
+
+def normalize(text: str) -> str:
+    """Minuscules sans accents, pour comparer « Église » et « eglise »."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def _bucket(prix: int) -> int:
+    return min(prix // PRICE_BUCKET, PRICE_BUCKETS)
+
+
+# --- index des recherches ------------------------------------------------------
+class SearchIndex:
+    """Recherches actives indexées par prédicat; `match(fiche)` -> ids des recherches satisfaites."""
+
+    def __init__(self, searches: Iterable[tuple]):
+        n = PRICE_BUCKETS + 1
+        self.full = [set() for _ in range(n)]       # case entièrement couverte
+        self.lows = [[] for _ in range(n)]          # (min, id): le minimum tombe dans la case
+        self.highs = [[] for _ in range(n)]         # (max, id): le maximum tombe dans la case
+        self.inner = [[] for _ in range(n)]         # (id, min, max): les deux bornes dans la case
+        self.any_price: Set[int] = set()
+        minimums = {"chambres": defaultdict(set), "sdb": defaultdict(set)}  # minimum -> recherches
+        self.by_codes: Dict[frozenset, Set[int]] = defaultdict(set)       # codes exigés -> recherches
+        self.code_sets: Dict[str, Set[frozenset]] = defaultdict(set)      # code -> ensembles exigés
+        self.texts: Dict[int, List[str]] = {}
+        self.size = 0
+
+        for pk, prix_min, prix_max, chambres_min, sdb_min, codes, texte in searches:
+            self.size += 1
+            self._add_price(pk, prix_min, prix_max)
+            minimums["chambres"][chambres_min or 0].add(pk)
+            minimums["sdb"][sdb_min or 0].add(pk)
+            if codes:
+                required = frozenset(codes)
+                self.by_codes[required].add(pk)
+                for code in required:
+                    self.code_sets[code].add(required)
+            words = normalize(texte).split()
+            if words:
+                self.texts[pk] = words
+        self.with_text = set(self.texts)
+        self.with_codes = set().union(*self.by_codes.values())
+        # allowed[k]: minimum <= k; au-delà du plus grand minimum, aucun filtre
+        self.chambres, self.sdb = (self._allowed(minimums[name]) for name in ("chambres", "sdb"))
+        for bounds in (self.lows, self.highs):
+            for i, rows in enumerate(bounds):
+                rows.sort()
+                bounds[i] = ([bound for bound, _ in rows], [pk for _, pk in rows])
+
+    @staticmethod
+    def _allowed(groups: Dict[int, Set[int]]) -> List[Set[int]]:
+        allowed, current = [], set()
+        for k in range(max(groups, default=0)):
+            current = current | groups.get(k, set())
+            allowed.append(current)
+        return allowed
+
+    def _add_price(self, pk, prix_min, prix_max):
+        if prix_min is None and prix_max is None:
+            self.any_price.add(pk)
+            return
+        if prix_min is not None and prix_max is not None and prix_min > prix_max:
+            return  # intervalle vide: aucune fiche (SavedSearch.clean() le refuse)
+        low, high = prix_min or 0, prix_max
+        first = _bucket(low)
+        last = PRICE_BUCKETS if high is None else _bucket(high)
+        cut_low = low > first * PRICE_BUCKET
+        cut_high = high is not None and (last == PRICE_BUCKETS or high < (last + 1) * PRICE_BUCKET - 1)
+        for b in range(first + cut_low, last + 1 - cut_high):
+            self.full[b].add(pk)
+        if first == last and cut_low and cut_high:
+            self.inner[first].append((pk, low, high))
+            return
+        if cut_low:
+            self.lows[first].append((low, pk))
+        if cut_high:
+            self.highs[last].append((high, pk))
+
+    @classmethod
+    def load(cls) -> "SearchIndex":
+        rows = SavedSearch.objects.filter(active=True).values_list(*SEARCH_FIELDS)
+        return cls(rows.iterator(chunk_size=5000))
+
+    def match(self, listing: dict) -> Set[int]:
+        prix = listing.get("prix")
+        if prix is None:
+            candidates = set(self.any_price)
+        else:
+            b = _bucket(prix)
+            candidates = self.full[b] | self.any_price
+            bounds, pks = self.lows[b]
+            candidates.update(pks[:bisect_right(bounds, prix)])       # min <= prix
+            bounds, pks = self.highs[b]
+            candidates.update(pks[bisect_left(bounds, prix):])        # prix <= max
+            candidates.update(pk for pk, low, high in self.inner[b] if low <= prix <= high)
+        if not candidates:
+            return candidates
+
+        # Intersections et différences: CPython parcourt le plus petit des deux ensembles
+        for allowed, value in ((self.chambres, listing.get("nombre_chambres")), (self.sdb, listing.get("nombre_sdb"))):
+            if (value or 0) < len(allowed):
+                candidates &= allowed[value or 0]
+
+        if self.by_codes:
+            codes = listing_codes(listing)
+            kept = candidates - self.with_codes
+            reached = set().union(*(self.code_sets.get(code, ()) for code in codes))
+            for required in reached:
+                if required <= codes:
+                    kept |= candidates & self.by_codes[required]
+            candidates = kept
+
+        with_text = candidates & self.with_text
+        if with_text:
+            haystack = normalize(f"{listing.get('adresse') or ''} {listing.get('description') or ''}")
+            candidates -= {pk for pk in with_text if not all(w in haystack for w in self.texts[pk])}
+        return candidates
+
+
+def matches_naive(search: SavedSearch, listing: dict) -> bool:
+    """Évaluation directe d'une recherche (référence de bench_alerts)."""
+    prix = listing.get("prix")
+    if search.prix_min is not None and (prix is None or prix < search.prix_min):
+        return False
+    if search.prix_max is not None and (prix is None or prix > search.prix_max):
+        return False
+    for minimum, value in ((search.chambres_min, listing.get("nombre_chambres")),
+                           (search.sdb_min, listing.get("nombre_sdb"))):
+        if minimum and (value is None or value < minimum):
+            return False
+    if not set(search.codes or []) <= listing_codes(listing):
+        return False
+    haystack = normalize(f"{listing.get('adresse') or ''} {listing.get('description') or ''}")
+    return all(w in haystack for w in normalize(search.texte).split())
+
+
+# --- delta d'un import ---------------------------------------------------------
+def delta(release) -> List[Tuple[str, dict, Optional[int]]]:
+    """[(type, fiche, prix d'avant)] des fiches nouvelles ou en baisse de prix de la version `release`."""
+    events = ListingChange.objects.filter(
+        release=release, kind__in=[ListingChange.KIND_CREATED, ListingChange.KIND_UPDATED],
+    ).values_list("listing_id", "kind", "prix_before")
+    events = {pk: (kind, before) for pk, kind, before in events}
+    result = []
+    listings = Listing.objects.filter(
+        release=release, centris_id__in=list(events), status=Listing.STATUS_ACTIVE,
+    ).values(*LISTING_FIELDS)
+    for listing in listings.iterator(chunk_size=2000):
+        kind, before = events[listing["centris_id"]]
+        if kind == ListingChange.KIND_CREATED:
+            result.append((SavedSearchMatch.KIND_NEW, listing, None))
+        elif before is not None and listing["prix"] is not None and listing["prix"] < before:
+            result.append((SavedSearchMatch.KIND_PRICE_DROP, listing, before))
+    return result
+
+
+def evaluate(release, index: Optional[SearchIndex] = None) -> List[int]:
+    """Enregistre les correspondances du delta de `release`; retourne les ids créés."""
+    changed = delta(release)
+    if not changed:
+        return []
+    index = index or SearchIndex.load()
+    now = timezone.now()
+    found = [
+        SavedSearchMatch(
+            search_id=pk, listing_id=listing["centris_id"], kind=kind, prix=listing["prix"],
+            prix_before=before, release=release, created_at=now,
+        )
+        for kind, listing, before in changed
+        for pk in index.match(listing)
+    ]
+    SavedSearchMatch.objects.bulk_create(found, batch_size=1000, ignore_conflicts=True)
+    # ignore_conflicts: pas de clés retournées; relues par la version
+    return list(
+        SavedSearchMatch.objects.filter(release=release, notified_at__isnull=True).order_by("pk")
+        .values_list("pk", flat=True)
+    )
+
+
+def schedule(match_ids: List[int]) -> int:
+    """Un job RQ par lot de correspondances; retourne le nombre de jobs mis en file."""
+    jobs = 0
+    try:
+        queue = django_rq.get_queue("default")
+        for i in range(0, len(match_ids), ALERT_BATCH_SIZE):
+            queue.enqueue(
+                deliver, match_ids[i:i + ALERT_BATCH_SIZE],
+                retry=Retry(max=len(RETRY_INTERVALS), interval=RETRY_INTERVALS),
+            )
+            jobs += 1
+    except RedisError as exc:
+        logger.warning("file RQ indisponible (%s): alertes en attente en base", exc)
+    return jobs
+
+
+def run(release) -> Dict[str, int]:
+    """Après l'import: correspondances du delta, puis jobs d'envoi."""
+    ids = evaluate(release)
+    return {"matches": len(ids), "jobs": schedule(ids)}
+
+
+# --- envoi ---------------------------------------------------------------------
+def _site_url(path: str) -> str:
+    return getattr(settings, "SITE_URL", "").rstrip("/") + path
+
+
+def deliver(match_ids: Optional[List[int]] = None):
+    """Job RQ: un courriel par adresse pour les correspondances pas encore envoyées."""
+    pending = SavedSearchMatch.objects.filter(notified_at__isnull=True)
+    if match_ids is not None:
+        pending = pending.filter(pk__in=match_ids)
+    rows = list(pending.order_by("pk").values_list(
+        "pk", "search__email", "search__name", "kind", "prix", "prix_before", "listing_id",
+    ))
+    # Adresse et lien: la fiche dans la version en ligne (absente: correspondance sans objet)
+    live = {
+        centris_id: (adresse, slug) for centris_id, adresse, slug in
+        Listing.objects.live().filter(centris_id__in={row[6] for row in rows}).values_list("centris_id", "adresse", "slug")
+    }
+    by_email = defaultdict(list)
+    stale = []
+    for row in rows:
+        if row[6] in live:
+            by_email[row[1]].append(row[:6] + live[row[6]])
+        else:
+            stale.append(row[0])
+    if stale:
+        SavedSearchMatch.objects.filter(pk__in=stale).update(notified_at=timezone.now())
+
+    failed = []
+    with get_connection() as connection:
+        for email, items in by_email.items():
+            lines = []
+            for _, _, name, kind, prix, before, adresse, slug in items:
+                what = "Baisse de prix" if kind == SavedSearchMatch.KIND_PRICE_DROP else "Nouvelle fiche"
+                price = f"{prix:,} $".replace(",", " ") if prix is not None else "prix sur demande"
+                if before:
+                    price += f" (avant {before:,} $)".replace(",", " ")
+                search = f" [{name}]" if name else ""
+                lines.append(f"- {what}{search}: {adresse}, {price}\n  {_site_url(reverse('property_detail', args=[slug]))}")
+            message = EmailMessage(
+                subject=f"{len(items)} fiche(s) pour vos recherches enregistrées",
+                body="\n".join(lines), to=[email], connection=connection,
+            )
+            try:
+                message.send()
+            except Exception as exc:  # SMTP: une adresse refusée ne bloque pas le lot
+                logger.warning("alerte à %s non envoyée: %s", email, exc)
+                failed.append(email)
+                continue
+            SavedSearchMatch.objects.filter(pk__in=[item[0] for item in items]).update(notified_at=timezone.now())
+    if failed:
+        raise AlertError(f"{len(failed)} alerte(s) en échec")
@@ -0,0 +1,316 @@
+# core/api.py
+"""
+API JSON en lecture seule pour le front Framer / intégrations partenaires.
+
+- GET /api/listings/                 résumé paginé (mêmes filtres que properties_list)
+- GET /api/listings/?format=ndjson   tout le catalogue visible, en flux NDJSON
+- GET /api/listings/<slug>/          détail + photos + caractéristiques
+- GET /api/map/?bbox=O,S,E,N&zoom=Z  marqueurs d'une fenêtre de carte (grappes si zoom faible)
+- GET /api/changes/?since=<curseur>  changements de fiches après le curseur (core/changes.py)
+
+Le contenu ne change qu'à chaque import, ou quand une fiche vendue sort de
+la fenêtre de visible(): l'ETag et les clés de cache sont dérivés du
+dernier FetchLog, du pointeur de la version en ligne (core/catalog.py) et
+de la plus ancienne vendue encore visible. Les clés ne
+reprennent que les paramètres lus par la vue, normalisés (numéro de page
+ramené dans le catalogue, bbox arrondie): un paramètre inconnu ou dans un
+autre ordre sert la même entrée, sans en créer une nouvelle.
+
+Vues async (ORM async, cache aget/aset): sous ASGI elles n'occupent pas de
+thread pendant les E/S; sous WSGI Django les exécute dans une boucle dédiée.
+"""
+import json
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from . import geo, metrics
+from .http import acondition, arequire_safe
+from .models import FetchLog, Listing, ListingChange, ListingPhoto, ListingQuerySet, LiveCatalog
+from .views import PAGE_SIZE
+
+# Projection "lean": uniquement ce qu'une carte de liste affiche
+SUMMARY_FIELDS = (
+    "centris_id", "slug", "prix", "adresse",
+    "nombre_pieces", "nombre_chambres", "nombre_sdb",
+    "status", "sold_at", "last_seen_at",
+)
+DETAIL_FIELDS = SUMMARY_FIELDS + (
+    "superficie_habitable", "superficie_terrain", "annee_construction",
+    "inclus", "description",
+    "proximites_text", "proximites",
+    "caracteristiques_text", "caracteristiques",
+    "first_seen_at", "updated_at",
+)
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson; charset=utf-8"
+NDJSON_CHUNK_SIZE = 2000
+CACHE_TIMEOUT = 60 * 60 * 24   # les clés sont versionnées: un import les rend caduques
+MAX_AGE = 300                  # Cache-Control côté navigateur / CDN
+MAP_MAX_MARKERS = 500
+MAP_MAX_ZOOM = 22
+CLUSTER_MAX_ZOOM = 12          # en deçà: grappes par préfixe geohash
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+
+
+async def catalog_version(request=None) -> str:
+    """
+    Identifiant du dernier import (change à chaque FetchLog), de la
+    dernière bascule de la version en ligne et de la prochaine expiration
+    d'une vendue. Mémorisé sur la requête: l'ETag et
+    la clé de cache le lisent tous deux.
+    """
+    if request is not None and hasattr(request, "_catalog_version"):
+        return request._catalog_version
+    # Une annulation (core/catalog.py) déplace le pointeur sans nouveau FetchLog
+    switched = LiveCatalog.objects.filter(pk=LiveCatalog.PK).values("switched_at")[:1]
+    # visible() retire une vendue SOLD_VISIBLE_DAYS après sold_at, sans import:
+    # la plus ancienne encore visible change quand elle expire
+    cutoff = timezone.now() - timedelta(days=ListingQuerySet.SOLD_VISIBLE_DAYS)
+    expiring = (
+        Listing.objects.live().filter(status=Listing.STATUS_SOLD, sold_at__gte=cutoff)
+        .order_by("sold_at").values("sold_at")[:1]
+    )
+    last = await (
+        FetchLog.objects.order_by("-pk")
+        .values_list("pk", "created_at", Subquery(switched), Subquery(expiring))
+        .afirst()
+    )
+    version = f"{last[0]}-{last[1]:%Y%m%d%H%M%S%f}" if last else "0"
+    if last and last[2]:
+        version += f"-r{last[2]:%Y%m%d%H%M%S%f}"
+    if last and last[3]:
+        version += f"-s{last[3]:%Y%m%d%H%M%S%f}"
+    if request is not None:
+        request._catalog_version = version
+    return version
+
+
+def _wants_ndjson(request) -> bool:
+    return (
+        request.GET.get("format") == "ndjson"
+        or "application/x-ndjson" in request.headers.get("Accept", "")
+    )
+
+
+async def _listings_etag(request, *args, **kwargs):
+    fmt = "ndjson" if _wants_ndjson(request) else "json"
+    return f"{await catalog_version(request)}-{fmt}"
+
+
+async def _request_version(request, *args, **kwargs):
+    return await catalog_version(request)
+
+
+def _summary_queryset():
+    cover = (
+        ListingPhoto.objects
+        .filter(listing=OuterRef("pk"))
+        .order_by("sequence")
+        .values("url")[:1]
+    )
+    return Listing.objects.visible().values(*SUMMARY_FIELDS).annotate(photo=Subquery(cover))
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+async def _cached_json(request, build, key: str):
+    """Sert `await build()` sérialisé depuis le cache partagé (clé = version + `key`)."""
+    key = f"api:{await catalog_version(request)}:{key}"
+    payload = await cache.aget(key)
+    metrics.record_cache("api", payload is not None)
+    if payload is None:
+        payload = _dumps(await build()).encode("utf-8")
+        await cache.aset(key, payload, CACHE_TIMEOUT)
+    response = HttpResponse(payload, content_type="application/json")
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
+
+
+def _ndjson_lines(qs):
+    for row in qs.iterator(chunk_size=NDJSON_CHUNK_SIZE):
+        yield (_dumps(row) + "\n").encode("utf-8")
+
+
+async def _andjson_lines(qs):
+    async for row in qs.aiterator(chunk_size=NDJSON_CHUNK_SIZE):
+        yield (_dumps(row) + "\n").encode("utf-8")
+
+
+@arequire_safe
+@acondition(_listings_etag)
+async def listings(request):
+    qs = _summary_queryset()
+
+    if _wants_ndjson(request):
+        # Le serveur consomme le flux: itérateur async sous ASGI, synchrone
+        # sous WSGI (sinon Django bufferise tout le catalogue avant d'envoyer)
+        lines = _andjson_lines(qs) if isinstance(request, ASGIRequest) else _ndjson_lines(qs)
+        response = StreamingHttpResponse(lines, content_type=NDJSON_CONTENT_TYPE)
+        patch_cache_control(response, public=True, max_age=MAX_AGE)
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    # Numéro de page résolu comme get_page() (invalide -> 1, trop grand ->
+    # dernière): une entrée de cache par page réelle du catalogue
+    count_key = f"api:{await catalog_version(request)}:listings:count"
+    count = await cache.aget(count_key)
+    if count is None:
+        count = await qs.acount()
+        await cache.aset(count_key, count, CACHE_TIMEOUT)
+    paginator = Paginator(range(count), PAGE_SIZE)
+    page_obj = paginator.get_page(request.GET.get("page") or 1)
+
+    async def build():
+        rows = [r async for r in qs[page_obj.start_index() - 1:page_obj.end_index()]] if count else []
+        return {
+            "count": paginator.count,
+            "num_pages": paginator.num_pages,
+            "page": page_obj.number,
+            "next": page_obj.next_page_number() if page_obj.has_next() else None,
+            "previous": page_obj.previous_page_number() if page_obj.has_previous() else None,
+            "results": rows,
+        }
+
+    response = await _cached_json(request, build, key=f"listings:{page_obj.number}")
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+@arequire_safe
+@acondition(_request_version)
+async def listing_detail(request, slug):
+    async def build():
+        data = await Listing.objects.live().filter(slug=slug).values("pk", *DETAIL_FIELDS).afirst()
+        if data is None:
+            raise Http404("Listing introuvable")
+        photos = (
+            ListingPhoto.objects
+            .filter(listing_id=data.pop("pk"))
+            .order_by("sequence")
+            .values("sequence", "url", "width", "height", "placeholder_color")
+        )
+        data["photos"] = [p async for p in photos]
+        return data
+
+    return await _cached_json(request, build, key=f"detail:{slug}")
+
+
+def _parse_bbox(raw):
+    """`ouest,sud,est,nord` -> (sud, ouest, nord, est) ou None."""
+    try:
+        west, south, east, north = (float(v) for v in (raw or "").split(","))
+    except ValueError:
+        return None
+    if not (-90 <= south <= north <= 90 and -180 <= west <= east <= 180):
+        return None
+    return south, west, north, east
+
+
+def _bbox_queryset(south, west, north, east):
+    qs = Listing.objects.visible().filter(
+        latitude__gte=south, latitude__lte=north,
+        longitude__gte=west, longitude__lte=east,
+    )
+    # Plages sur l'index geohash: ne lit que les cellules de la fenêtre
+    cells = geo.cells_for_bbox(south, west, north, east)
+    if cells:
+        ranges = Q()
+        for cell in cells:
+            ranges |= Q(geohash__gte=cell, geohash__lt=cell + geo.RANGE_END)
+        qs = qs.filter(ranges)
+    return qs.order_by()
+
+
+@arequire_safe
+@acondition(_request_version)
+async def listings_map(request):
+    bbox = _parse_bbox(request.GET.get("bbox"))
+    if bbox is None:
+        return JsonResponse({"error": "Paramètre bbox=ouest,sud,est,nord invalide."}, status=400)
+    try:
+        zoom = int(request.GET.get("zoom", CLUSTER_MAX_ZOOM))
+    except ValueError:
+        zoom = CLUSTER_MAX_ZOOM
+    zoom = min(max(zoom, 0), MAP_MAX_ZOOM)
+
+    if zoom < CLUSTER_MAX_ZOOM:
+        # Grappes: fenêtre alignée sur la grille -> bon taux de succès du cache en panoramique
+        precision = geo.zoom_to_precision(zoom)
+        snapped = geo.snap_bbox(*bbox, precision)
+
+        async def build_clusters():
+            clusters = (
+                _bbox_queryset(*snapped)
+                .annotate(cell=Substr("geohash", 1, precision))
+                .values("cell")
+                .annotate(count=Count("pk"), lat=Avg("latitude"), lon=Avg("longitude"))
+            )
+            return {"zoom": zoom, "clusters": [c async for c in clusters]}
+
+        key = "map:{}:{:.6f},{:.6f},{:.6f},{:.6f}".format(precision, *snapped)
+        return await _cached_json(request, build_clusters, key=key)
+
+    async def build():
+        qs = _bbox_queryset(*bbox)
+        rows = [
+            r async for r in
+            qs.values("slug", "prix", "adresse", "status", "latitude", "longitude")[:MAP_MAX_MARKERS + 1]
+        ]
+        return {
+            "zoom": zoom,
+            "truncated": len(rows) > MAP_MAX_MARKERS,
+            "listings": rows[:MAP_MAX_MARKERS],
+        }
+
+    key = "map:{}:{:.6f},{:.6f},{:.6f},{:.6f}".format(zoom, *bbox)
+    return await _cached_json(request, build, key=key)
+
+
+@arequire_safe
+async def listing_changes(request):
+    """
+    Une page du journal après `since` (0 = depuis le début), avec le résumé
+    actuel de chaque fiche dans la version en ligne (null si elle n'y est pas). Pas de cache: une
+    lecture de plage sur la clé primaire, et le curseur avance à chaque appel.
+    """
+    try:
+        since = max(0, int(request.GET.get("since") or 0))
+        limit = min(CHANGES_MAX_PAGE_SIZE, max(1, int(request.GET.get("limit") or CHANGES_PAGE_SIZE)))
+    except ValueError:
+        return JsonResponse({"error": "Paramètres since et limit: entiers attendus."}, status=400)
+
+    rows = [
+        r async for r in
+        ListingChange.objects.filter(pk__gt=since).order_by("pk")
+        .values("pk", "listing_id", "kind", "prix_before", "created_at")[:limit + 1]
+    ]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    ids = {r["listing_id"] for r in rows}
+    listings = {
+        row["centris_id"]: row async for row in Listing.objects.live().filter(centris_id__in=ids).values(*SUMMARY_FIELDS)
+    } if ids else {}
+    return JsonResponse({
+        "changes": [
+            {
+                "cursor": r["pk"], "centris_id": r["listing_id"], "kind": r["kind"],
+                "at": r["created_at"], "prix_before": r["prix_before"],
+                "listing": listings.get(r["listing_id"]),
+            }
+            for r in rows
+        ],
+        "next": rows[-1]["pk"] if rows else since,
+        "has_more": has_more,
+    })
@@ -0,0 +1,218 @@
+# core/bench.py
+"""
+Outils communs aux commandes bench_*: catalogue synthétique, clients
+(WSGI/ASGI en processus ou HTTP vers un serveur lancé à part) et
+statistiques de latence.
+
+Les lignes synthétiques sont repérables (centris_id "B…", noms "Bench …",
+courriel BENCH_EMAIL) et `clear()` ne supprime qu'elles.
+"""
+import asyncio
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from django.db import connection
+from django.utils import timezone
+
+from . import catalog, fragments, geo
+from .models import Agent, CatalogRelease, Certification, ContactMessage, FetchLog, Listing, ListingPhoto
+
+BENCH_EMAIL = "bench@example.com"
+# Jeton CSRF fixe: cookie et en-tête identiques (secret non masqué de 32 caractères)
+CSRF_TOKEN = "benchbenchbenchbenchbenchbench12"
+SQL_COUNT = re.compile(r'desc="(\d+) SQL"')
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+# --- données ---------------------------------------------------------------
+def seed(n_listings: int, n_photos: int, n_agents: int = 0, n_certifications: int = 0, rnd_seed: int = 42):
+    now = timezone.now()
+    rnd = random.Random(rnd_seed)
+    # Ajoutées à la version en ligne (une version "bench" publiée si le catalogue est vide)
+    release = catalog.live_release() or catalog.publish(CatalogRelease.objects.create(source_name="bench"))
+    listings = []
+    for i in range(n_listings):
+        # sud du Québec, densité plus forte autour de la ville de Québec
+        if i % 2:
+            lat, lon = rnd.gauss(46.81, 0.15), rnd.gauss(-71.22, 0.25)
+        else:
+            lat, lon = rnd.uniform(45.0, 49.0), rnd.uniform(-79.0, -64.0)
+        listings.append(Listing(
+            release=release, centris_id=f"B{i:07d}", slug=f"bench-{i}", prix=200000 + i,
+            adresse=f"{i}, Rue du Banc", nombre_chambres=i % 5, nombre_sdb=1 + i % 2,
+            description="x" * 400, last_seen_at=now,
+            latitude=lat, longitude=lon, geohash=geo.encode(lat, lon),
+        ))
+    Listing.objects.bulk_create(listings, batch_size=1000)  # clés relues (RETURNING)
+    ListingPhoto.objects.bulk_create(
+        [
+            ListingPhoto(listing=listing, sequence=s, url=f"https://img.example/{i}/{s}.jpg")
+            for i, listing in enumerate(listings) for s in range(1, n_photos + 1)
+        ],
+        batch_size=5000,
+    )
+    titles = ("Courtier immobilier résidentiel", "Adjointe administrative")
+    Agent.objects.bulk_create(
+        Agent(name=f"Bench Agent {i:03d}", title=titles[i % 2], email=BENCH_EMAIL) for i in range(n_agents)
+    )
+    Certification.objects.bulk_create(
+        Certification(name=f"Bench Prix {i:03d}", order=i) for i in range(n_certifications)
+    )
+    FetchLog.objects.create(items_total=n_listings, items_added=n_listings, source_name="bench")
+    fragments.bump_version()  # bulk_create n'émet pas post_save
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")  # statistiques pour que le planificateur choisisse les bons index
+
+
+def clear():
+    bench_listings = Listing.objects.filter(centris_id__startswith="B", slug__startswith="bench-")
+    ListingPhoto.objects.filter(listing__in=bench_listings).delete()
+    bench_listings.delete()
+    Agent.objects.filter(name__startswith="Bench Agent ").delete()
+    Certification.objects.filter(name__startswith="Bench Prix ").delete()
+    ContactMessage.objects.filter(email=BENCH_EMAIL).delete()
+    FetchLog.objects.filter(source_name="bench").delete()
+
+
+# --- statistiques ----------------------------------------------------------
+def percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(q * (len(values) - 1))))
+    return values[idx]
+
+
+def summarize(samples_ms: List[float], wall_s: float, queries: List[int], errors: int) -> Dict[str, float]:
+    return {
+        "requests": len(samples_ms),
+        "errors": errors,
+        "rps": round(len(samples_ms) / wall_s, 1) if wall_s else 0.0,
+        "p50_ms": round(statistics.median(samples_ms), 2),
+        "p95_ms": round(percentile(samples_ms, 0.95), 2),
+        "p99_ms": round(percentile(samples_ms, 0.99), 2),
+        "max_ms": round(max(samples_ms), 2),
+        "queries_per_request": round(float(statistics.mean(queries)), 1) if queries else None,
+    }
+
+
+def sql_count(headers: Dict[str, str]) -> Optional[int]:
+    """Nombre de requêtes SQL annoncé par Server-Timing (core.perf)."""
+    match = SQL_COUNT.search(headers.get("server-timing", ""))
+    return int(match.group(1)) if match else None
+
+
+# --- clients ---------------------------------------------------------------
+def _request_headers(body: bytes, origin: str = "https://localhost") -> List[Tuple[str, str]]:
+    headers = [("cookie", f"csrftoken={CSRF_TOKEN}")]
+    if body:
+        headers += [
+            ("content-type", "application/x-www-form-urlencoded"),
+            ("x-csrftoken", CSRF_TOKEN),
+            ("referer", f"{origin}/contact/"),  # exigé par CsrfViewMiddleware en HTTPS
+        ]
+    return headers
+
+
+class WSGIClient:
+    """Appelle l'application WSGI (celle de gunicorn) sans passer par le réseau."""
+    name = "wsgi"
+
+    def __init__(self):
+        from lafreniere_site.wsgi import application
+        self.app = application
+
+    def request(self, method: str, url: str, body: bytes = b"") -> Response:
+        parts = urlsplit(url)
+        environ = {
+            "REQUEST_METHOD": method, "PATH_INFO": parts.path, "QUERY_STRING": parts.query,
+            "SERVER_NAME": "localhost", "SERVER_PORT": "443", "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1", "HTTP_HOST": "localhost",
+            "CONTENT_LENGTH": str(len(body)), "wsgi.input": BytesIO(body), "wsgi.errors": sys.stderr,
+            "wsgi.version": (1, 0), "wsgi.url_scheme": "https",
+            "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+        }
+        for key, value in _request_headers(body):
+            name = key.upper().replace("-", "_")
+            environ[name if name == "CONTENT_TYPE" else f"HTTP_{name}"] = value
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured["status"], captured["headers"] = int(status[:3]), {k.lower(): v for k, v in headers}
+
+        result = self.app(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()  # request_finished: libère la connexion DB
+        return captured["status"], captured["headers"], content
+
+
+class ASGIClient:
+    """Appelle l'application ASGI (celle d'uvicorn) dans la boucle asyncio courante."""
+    name = "asgi"
+
+    def __init__(self):
+        from lafreniere_site.asgi import application
+        self.app = application
+
+    async def arequest(self, method: str, url: str, body: bytes = b"") -> Response:
+        parts = urlsplit(url)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "https", "path": parts.path, "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(), "root_path": "",
+            "headers": [(b"host", b"localhost")] + [(k.encode(), v.encode()) for k, v in _request_headers(body)],
+            "server": ("localhost", 443), "client": ("127.0.0.1", 50000),
+        }
+        sent = []
+        chunks = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if chunks:
+                return chunks.pop()
+            await asyncio.Event().wait()  # jamais: pas de déconnexion pendant la réponse
+
+        async def send(message):
+            sent.append(message)
+
+        # une tâche par requête (contexte neuf), comme le fait un serveur ASGI
+        await asyncio.create_task(self.app(scope, receive, send))
+        start = next(m for m in sent if m["type"] == "http.response.start")
+        headers = {k.decode().lower(): v.decode() for k, v in start["headers"]}
+        content = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+        return start["status"], headers, content
+
+
+class HTTPClient:
+    """Serveur lancé à part (gunicorn, uvicorn): une Session keep-alive par thread."""
+    name = "http"
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.local = threading.local()
+
+    def request(self, method: str, url: str, body: bytes = b"") -> Response:
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        r = session.request(method, self.base_url + url, data=body or None,
+                            headers=dict(_request_headers(body, self.base_url)), allow_redirects=False, timeout=60)
+        return r.status_code, {k.lower(): v for k, v in r.headers.items()}, r.content
+
+
+def timed(fn, *args) -> Tuple[float, Optional[Response]]:
+    t0 = time.perf_counter()
+    try:
+        res = fn(*args)
+    except Exception:  # une erreur compte comme échec, on continue la mesure
+        res = None
+    return (time.perf_counter() - t0) * 1000, res
@@ -0,0 +1,186 @@
+# core/catalog.py
+"""
+Versions du catalogue: chaque import construit la sienne à côté de la
+version en ligne, la publication et l'annulation ne font que déplacer un
+pointeur.
+
+Une fiche est une ligne de Listing par version (release). Le pointeur
+LiveCatalog (une seule ligne) désigne la version en ligne; les lectures
+publiques (ListingQuerySet.live() / visible(): pages, API, sitemaps,
+export statique) ne voient que ses lignes.
+
+- Construction (`fork()`, import_centris, dans sa transaction): nouvelle
+  CatalogRelease, copie ensembliste (INSERT … SELECT) des fiches et photos
+  de la version en ligne (parent), puis le chargement (orm_load /
+  core/pgload.py) applique le flux à ces lignes seulement. Les visiteurs
+  lisent toujours l'ancienne version.
+- Publication (`publish()`): `check()` compare d'abord l'import aux seuils:
+  flux vide, ou plus de CATALOG_MAX_DISAPPEARED_PCT % des fiches actives
+  disparues (INSCRIPTIONS.TXT tronqué). Au-delà, RejectedFeed: la
+  transaction est annulée (lignes comprises) et la version consignée
+  REJECTED. Sinon une mise à jour du pointeur, au commit.
+- Annulation (`rollback()`, manage.py undo_import): le pointeur revient sur
+  le parent de la version en ligne, ou sur toute version antérieure encore
+  gardée (`to=`). Temps constant quelle que soit la taille du catalogue:
+  prix, descriptions, coordonnées, statuts et photos de la version visée
+  reviennent ensemble, sans réécrire une fiche. Plusieurs annulations
+  successives remontent la chaîne des parents.
+
+La rétention (core/retention.py) ne garde les lignes que des
+CATALOG_KEEP_RELEASES dernières versions publiées (PRUNED ensuite).
+
+Journal des changements (core/changes.py): une annulation écrit, dans sa
+transaction, un événement par fiche qui diffère entre les deux versions
+(colonne `revision`, comparée en SQL): CREATED / UPDATED / SOLD pour la
+version remise en ligne, REMOVED pour les fiches qu'elle n'a pas.
+"""
+from typing import Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import changes
+from .models import CatalogRelease, Listing, ListingPhoto, LiveCatalog
+
+
+class CatalogError(Exception):
+    pass
+
+
+class RejectedFeed(CatalogError):
+    pass
+
+
+def live_release() -> Optional[CatalogRelease]:
+    return CatalogRelease.objects.filter(pk=LiveCatalog.release_subquery()).first()
+
+
+def _columns(model, exclude):
+    q = connection.ops.quote_name
+    return [q(f.column) for f in model._meta.concrete_fields if f.name not in exclude]
+
+
+def copy_rows(source: CatalogRelease, target: CatalogRelease):
+    """Recopie les fiches de `source` et leurs photos dans `target` (deux requêtes ensemblistes)."""
+    listing_table = connection.ops.quote_name(Listing._meta.db_table)
+    photo_table = connection.ops.quote_name(ListingPhoto._meta.db_table)
+    listing_cols = ", ".join(_columns(Listing, ("id", "release")))
+    photo_cols = _columns(ListingPhoto, ("id", "listing"))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {listing_table} (release_id, {listing_cols}) "
+            f"SELECT %s, {listing_cols} FROM {listing_table} WHERE release_id = %s",
+            [target.pk, source.pk],
+        )
+        cursor.execute(
+            f"INSERT INTO {photo_table} (listing_id, {', '.join(photo_cols)}) "
+            f"SELECT n.id, {', '.join(f'p.{c}' for c in photo_cols)} FROM {photo_table} p "
+            f"JOIN {listing_table} o ON o.id = p.listing_id "
+            f"JOIN {listing_table} n ON n.centris_id = o.centris_id AND n.release_id = %s "
+            f"WHERE o.release_id = %s",
+            [target.pk, source.pk],
+        )
+
+
+def fork(release: CatalogRelease) -> CatalogRelease:
+    """Enregistre `release` (pas encore publiée) avec une copie des lignes de la version en ligne."""
+    release.parent = live_release()
+    release.active_before = Listing.objects.live().filter(status=Listing.STATUS_ACTIVE).count()
+    release.save()
+    if release.parent is not None:
+        copy_rows(release.parent, release)
+    return release
+
+
+def publish(release: CatalogRelease, now=None) -> CatalogRelease:
+    """Met `release` en ligne: une seule ligne mise à jour (visible au commit)."""
+    LiveCatalog.objects.update_or_create(
+        pk=LiveCatalog.PK, defaults=dict(release=release, switched_at=now or timezone.now()),
+    )
+    return release
+
+
+def check(release: CatalogRelease):
+    """Lève RejectedFeed si l'import `release` dépasse les seuils."""
+    if not release.items_total:
+        raise RejectedFeed("flux vide (aucune inscription)")
+    max_pct = getattr(settings, "CATALOG_MAX_DISAPPEARED_PCT", 20.0)
+    if release.active_before:
+        pct = 100.0 * release.items_marked_sold / release.active_before
+        if pct > max_pct:
+            raise RejectedFeed(
+                f"{release.items_marked_sold}/{release.active_before} fiches actives disparues "
+                f"({pct:.0f} % > {max_pct:g} %)"
+            )
+
+
+def reject(release: CatalogRelease, reason: str) -> CatalogRelease:
+    """Consigne un import rejeté (hors de sa transaction, annulée)."""
+    release.pk = None
+    release.state = CatalogRelease.STATE_REJECTED
+    release.note = reason
+    release.save()
+    return release
+
+
+# Événements d'une bascule `current` -> `target`: fiches de target dont le
+# contenu diffère (ou absentes de current), puis fiches de current absentes de target
+SWITCH_CHANGES_SQL = (
+    """
+    INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+    SELECT t.centris_id,
+           CASE WHEN c.id IS NULL THEN 'CREATED'
+                WHEN t.status = 'SOLD' AND c.status <> 'SOLD' THEN 'SOLD'
+                ELSE 'UPDATED' END,
+           %s, CASE WHEN c.prix <> t.prix THEN c.prix END, %s
+    FROM core_listing t
+    LEFT JOIN core_listing c ON c.release_id = %s AND c.centris_id = t.centris_id
+    WHERE t.release_id = %s AND (c.id IS NULL OR c.revision <> t.revision)
+    ORDER BY t.centris_id
+    """,
+    """
+    INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+    SELECT c.centris_id, 'REMOVED', %s, NULL, %s
+    FROM core_listing c
+    WHERE c.release_id = %s
+      AND NOT EXISTS (SELECT 1 FROM core_listing t WHERE t.release_id = %s AND t.centris_id = c.centris_id)
+    ORDER BY c.centris_id
+    """,
+)
+
+
+def rollback(to: Optional[int] = None, note: str = ""):
+    """
+    Remet en ligne la version `to` (pk), par défaut le parent de la version
+    en ligne; retourne (version retirée, version remise en ligne, événements).
+    """
+    with transaction.atomic():
+        changes.lock()
+        pointer = LiveCatalog.objects.select_for_update().filter(pk=LiveCatalog.PK).first()
+        current = pointer.release if pointer else None
+        if current is None:
+            raise CatalogError("aucune version en ligne")
+        target = current.parent if to is None else CatalogRelease.objects.filter(pk=to).first()
+        if target is None or target.pk == current.pk:
+            raise CatalogError(f"aucune version à remettre en ligne avant #{current.pk} (relancer l'import)")
+        if target.state in (CatalogRelease.STATE_REJECTED, CatalogRelease.STATE_PRUNED):
+            raise CatalogError(f"version #{target.pk} {target.get_state_display().lower()}: plus de lignes")
+
+        now = timezone.now()
+        publish(target, now)  # la bascule; le reste n'est que de la tenue de registre
+        current.state = CatalogRelease.STATE_ROLLED_BACK
+        current.rolled_back_at = now
+        current.note = note
+        current.save(update_fields=["state", "rolled_back_at", "note"])
+        if target.state != CatalogRelease.STATE_LIVE:
+            target.state = CatalogRelease.STATE_LIVE
+            target.save(update_fields=["state"])
+
+        events = 0
+        with connection.cursor() as cursor:
+            cursor.execute(SWITCH_CHANGES_SQL[0], [target.pk, now, current.pk, target.pk])
+            events += cursor.rowcount
+            cursor.execute(SWITCH_CHANGES_SQL[1], [target.pk, now, current.pk, target.pk])
+            events += cursor.rowcount
+    return current, target, events
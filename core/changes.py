@@ -0,0 +1,67 @@
+# core/changes.py
+"""
+Journal des changements de fiches, pour la synchronisation incrémentale
+(GET /api/changes/?since=<curseur>, core/api.py).
+
+Événements (ListingChange), écrits dans la transaction qui fait le
+changement:
+
+- import_centris (orm_load / core/pgload.py): CREATED, UPDATED (contenu du
+  flux modifié ou fiche revenue; prix_before si le prix change), PHOTOS
+  (liste d'URL modifiée), SOLD;
+- version remise en ligne (core/catalog.py): CREATED / UPDATED / SOLD pour
+  les fiches qui diffèrent de la version retirée, REMOVED pour celles
+  qu'elle n'a pas;
+- archivage (core/retention.py): REMOVED.
+
+Le curseur est la clé primaire. Un client garde le dernier curseur reçu et
+redemande `since=<curseur>` jusqu'à has_more = false: O(changements), pas
+O(catalogue). Un événement veut dire « relire cette fiche » (résumé joint à
+la réponse), pas un delta à appliquer: REMOVED / SOLD retirent la fiche,
+les autres la remplacent.
+
+Les écrivains prennent `lock()` avant d'insérer: PostgreSQL attribue les
+clés à l'insertion mais les rend visibles au commit; sans verrou, un
+client pourrait lire le curseur 201 (archivage) avant que 100-200 (import
+en cours) ne soient visibles, et les sauter. SQLite n'a qu'un écrivain.
+
+Compaction (`compact()`, manage.py apply_retention): au-delà de
+CHANGES_COMPACT_DAYS, seul le dernier événement de chaque fiche est gardé.
+Un client parti plus longtemps reçoit encore l'état final de chaque fiche
+touchée depuis son curseur; le journal reste borné par le nombre de fiches,
+plus par le nombre d'imports.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ListingChange
+
+LOCK_ID = 0x4C43  # pg_advisory_xact_lock: écrivains du journal
+BATCH_SIZE = 1000
+
+
+def lock():
+    """Sérialise les transactions qui écrivent dans le journal (PostgreSQL; relâché au commit)."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [LOCK_ID])
+
+
+def record(events):
+    ListingChange.objects.bulk_create(events, batch_size=BATCH_SIZE)
+
+
+def compact(now=None, dry_run: bool = False) -> int:
+    """Supprime les anciens événements remplacés par un plus récent de la même fiche; retourne le nombre."""
+    days = getattr(settings, "CHANGES_COMPACT_DAYS", 30)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    latest = ListingChange.objects.values("listing_id").annotate(last=Max("pk")).values("last")
+    superseded = ListingChange.objects.filter(created_at__lt=cutoff).exclude(pk__in=latest)
+    if dry_run:
+        return superseded.count()
+    deleted, _ = superseded.delete()
+    return deleted
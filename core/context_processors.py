@@ -1,5 +1,14 @@
 # core/context_processors.py
 from django.conf import settings
 
+from . import fragments
+
 def tidio_settings(request):
     return {"TIDIO_PUBLIC_KEY": getattr(settings, "TIDIO_PUBLIC_KEY", "")}
+
+
+def fragment_cache(request):
+    return {
+        "FRAGMENT_VERSION": fragments.current_version(),
+        "FRAGMENT_TIMEOUT": fragments.TIMEOUT,
+    }
@@ -0,0 +1,106 @@
+# core/export.py
+"""
+Exports CSV / NDJSON en flux (actions d'admin, manage.py export_data).
+
+Le queryset est lu par `values_list(*colonnes).iterator(chunk_size=…)`: pas
+d'instances de modèle, pas de cache de queryset, seulement les colonnes
+exportées. Chaque ligne est produite à la demande (StreamingHttpResponse ou
+fichier): la mémoire ne dépend que de EXPORT_CHUNK_SIZE, pas du nombre de
+lignes. PostgreSQL: curseur côté serveur (sauf DISABLE_SERVER_SIDE_CURSORS);
+SQLite: lecture par fetchmany.
+
+CSV: les textes qui commencent par =, +, -, @, tabulation ou retour
+chariot sont préfixés d'une apostrophe (injection de formules à
+l'ouverture dans Excel / LibreOffice; noms et messages viennent du
+formulaire public). Le NDJSON garde les valeurs telles quelles.
+"""
+import csv
+import json
+from datetime import date, datetime
+from typing import Iterator, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import ContactMessage, Listing
+
+EXPORT_CHUNK_SIZE = 2000
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+# Colonnes exportées par modèle: pas de description ni de JSON de la fiche
+EXPORT_FIELDS = {
+    Listing: (
+        "centris_id", "status", "prix", "adresse", "nombre_pieces", "nombre_chambres", "nombre_sdb",
+        "annee_construction", "superficie_habitable", "superficie_terrain", "latitude", "longitude",
+        "slug", "first_seen_at", "last_seen_at", "sold_at",
+    ),
+    ContactMessage: ("id", "created_at", "name", "email", "phone", "message", "emailed_at", "crm_synced_at"),
+}
+
+
+class _Echo:
+    """Tampon de csv.writer: rend la ligne formatée au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return "" if value is None else value
+
+
+def _csv_cell(value):
+    value = _cell(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _rows(qs, fields: Sequence[str]) -> Iterator[tuple]:
+    return qs.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(qs, fields: Sequence[str]) -> Iterator[str]:
+    # BOM: Excel ouvre le fichier en UTF-8 (accents des adresses)
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(fields)
+    for row in _rows(qs, fields):
+        yield writer.writerow([_csv_cell(v) for v in row])
+
+
+def ndjson_lines(qs, fields: Sequence[str]) -> Iterator[str]:
+    for row in _rows(qs, fields):
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def lines(qs, fmt: str, fields: Sequence[str] = ()) -> Iterator[str]:
+    fields = tuple(fields) or EXPORT_FIELDS[qs.model]
+    return csv_lines(qs, fields) if fmt == "csv" else ndjson_lines(qs, fields)
+
+
+def filename(model, fmt: str) -> str:
+    return f"{model._meta.model_name}-{timezone.localtime():%Y%m%d-%H%M}.{fmt}"
+
+
+def streaming_response(qs, fmt: str, fields: Sequence[str] = ()) -> StreamingHttpResponse:
+    # order_by("pk"): tri sur l'index, stable d'un chunk à l'autre
+    response = StreamingHttpResponse(lines(qs.order_by("pk"), fmt, fields), content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename(qs.model, fmt)}"'
+    return response
+
+
+def write(qs, fmt: str, stream, fields: Sequence[str] = ()) -> int:
+    """Écrit l'export dans `stream` (fichier texte); retourne le nombre de lignes de données."""
+    count = -1 if fmt == "csv" else 0  # en-tête CSV
+    for line in lines(qs.order_by("pk"), fmt, fields):
+        stream.write(line)
+        count += 1
+    return count
@@ -0,0 +1,47 @@
+# core/fragments.py
+"""
+Version des fragments de gabarits mis en cache ({% cache %}).
+
+Les inclusions communes (navbar, footer, FAQ, carrousel...) sont mises en
+cache avec FRAGMENT_VERSION dans leur clé. Enregistrer ou supprimer une
+Certification ou un Agent change la version: toutes les anciennes clés
+deviennent orphelines et expirent d'elles-mêmes.
+
+Les fragments contiennent des URL {% static %} hachées: la version inclut
+aussi STATIC_VERSION, ou à défaut un hash du manifeste de collectstatic.
+Après un déploiement, les processus relancés ne relisent donc pas des
+fragments qui pointent vers des fichiers que collectstatic a remplacés.
+"""
+import hashlib
+from functools import lru_cache
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+
+VERSION_KEY = "fragments:version"
+TIMEOUT = 60 * 60 * 24
+
+
+@lru_cache(maxsize=None)
+def static_version() -> str:
+    """Lu une fois par processus, comme le manifeste par le stockage."""
+    if settings.STATIC_VERSION:
+        return settings.STATIC_VERSION
+    read_manifest = getattr(staticfiles_storage, "read_manifest", None)
+    manifest = read_manifest() if read_manifest else None
+    return hashlib.sha256(manifest.encode("utf-8")).hexdigest()[:12] if manifest else "dev"
+
+
+def current_version() -> str:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid4().hex[:12], None)
+        version = cache.get(VERSION_KEY)
+    return f"{version}-{static_version()}"
+
+
+def bump_version(*args, **kwargs) -> None:
+    """Utilisable directement comme récepteur de signal."""
+    cache.set(VERSION_KEY, uuid4().hex[:12], None)
@@ -0,0 +1,109 @@
+# core/geo.py
+"""
+Geohash minimal (sans dépendance) pour l'index spatial des inscriptions.
+
+Un geohash est une chaîne base32 où chaque caractère raffine la cellule
+précédente: toutes les inscriptions d'une cellule partagent le même préfixe.
+Une requête "bounding box" devient donc quelques plages `geohash >= c AND
+geohash < c + '{'` sur un index B-tree ordinaire (SQLite comme PostgreSQL).
+"""
+from math import ceil, floor
+from typing import List, Optional, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9            # ~5 m: précision stockée sur Listing.geohash
+RANGE_END = "{"          # premier caractère ASCII après 'z'
+
+
+def encode(lat: float, lon: float, precision: int = PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    out, bits, ch, even = [], 0, 0, True
+    while len(out) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(out)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(hauteur en degrés de latitude, largeur en degrés de longitude)."""
+    lon_bits = ceil(5 * precision / 2)
+    lat_bits = floor(5 * precision / 2)
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(south: float, west: float, north: float, east: float,
+                   precision: int) -> List[str]:
+    """Toutes les cellules de `precision` qui intersectent la boîte."""
+    h, w = cell_size(precision)
+    lat0 = floor((south + 90.0) / h)
+    lat1 = floor((min(north, 89.999999) + 90.0) / h)
+    lon0 = floor((west + 180.0) / w)
+    lon1 = floor((min(east, 179.999999) + 180.0) / w)
+    cells = []
+    for i in range(lat0, lat1 + 1):
+        for j in range(lon0, lon1 + 1):
+            cells.append(encode(-90.0 + (i + 0.5) * h, -180.0 + (j + 0.5) * w, precision))
+    return sorted(set(cells))
+
+
+def cells_for_bbox(south: float, west: float, north: float, east: float,
+                   max_cells: int = 16) -> Optional[List[str]]:
+    """
+    Préfixes couvrant la boîte, à la précision la plus fine qui tient en
+    `max_cells` cellules. None si la boîte est trop grande pour être utile
+    (on se contente alors du filtre lat/lon).
+    """
+    best = None
+    for precision in range(1, PRECISION + 1):
+        h, w = cell_size(precision)
+        estimate = (floor((north - south) / h) + 2) * (floor((east - west) / w) + 2)
+        if estimate > max_cells * 4:
+            break
+        cells = covering_cells(south, west, north, east, precision)
+        if len(cells) > max_cells:
+            break
+        best = cells
+    return best
+
+
+def snap_bbox(south: float, west: float, north: float, east: float,
+              precision: int) -> Tuple[float, float, float, float]:
+    """Élargit la boîte aux frontières de cellules (fenêtres voisines = même clé de cache)."""
+    h, w = cell_size(precision)
+    return (
+        max(-90.0, floor((south + 90.0) / h) * h - 90.0),
+        max(-180.0, floor((west + 180.0) / w) * w - 180.0),
+        min(90.0, ceil((north + 90.0) / h) * h - 90.0),
+        min(180.0, ceil((east + 180.0) / w) * w - 180.0),
+    )
+
+
+def zoom_to_precision(zoom: int) -> int:
+    """Taille des grappes (préfixe geohash) selon le zoom de la carte."""
+    if zoom <= 4:
+        return 2
+    if zoom <= 7:
+        return 3
+    if zoom <= 9:
+        return 4
+    return 5
@@ -0,0 +1,76 @@
+# core/http.py
+"""
+Décorateurs de vues pour les vues `async def`.
+
+Sous Django 4.2, require_http_methods() et condition() enveloppent la vue
+dans une fonction synchrone: appliqués à une coroutine, Django croirait la
+vue synchrone et l'exécuterait dans un thread. Ces équivalents gardent la
+vue asynchrone (même comportement, mêmes réponses 405/304).
+
+client_ip(): adresse du client derrière TRUSTED_PROXY_COUNT mandataires
+(nginx, répartiteur), pour la limitation de débit et /metrics.
+"""
+import ipaddress
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.log import log_response
+
+
+def arequire_http_methods(methods):
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in methods:
+                response = HttpResponseNotAllowed(methods)
+                log_response(
+                    "Method Not Allowed (%s): %s", request.method, request.path,
+                    response=response, request=request,
+                )
+                return response
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+arequire_POST = arequire_http_methods(["POST"])
+arequire_safe = arequire_http_methods(["GET", "HEAD"])
+
+
+def acondition(etag_func):
+    """condition(etag_func=...) pour une vue async; `etag_func` est elle-même async."""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = quote_etag(await etag_func(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+            return response
+        return inner
+    return decorator
+
+
+def client_ip(request) -> str:
+    """
+    REMOTE_ADDR, ou l'adresse ajoutée à X-Forwarded-For par le plus externe
+    des TRUSTED_PROXY_COUNT mandataires de confiance. Chaque mandataire
+    ajoute à droite l'adresse qu'il voit: les entrées plus à gauche viennent
+    du client et ne sont pas crues.
+    """
+    remote = request.META.get("REMOTE_ADDR", "")
+    hops = getattr(settings, "TRUSTED_PROXY_COUNT", 0)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if not hops or not forwarded:
+        return remote
+    chain = [part.strip() for part in forwarded.split(",") if part.strip()]
+    candidate = chain[-hops] if len(chain) >= hops else chain[0]
+    try:
+        return str(ipaddress.ip_address(candidate))
+    except ValueError:
+        return remote
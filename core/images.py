@@ -0,0 +1,118 @@
+# core/images.py
+"""
+Réencodage d'images partagé (photos Centris, logos, portraits).
+
+Les dérivés sont produits avec Pillow en WebP (et AVIF si le build de
+Pillow le supporte). Pillow n'écrit pas les métadonnées EXIF à moins qu'on
+les lui passe: réencoder suffit à les retirer (GPS, appareil, etc.).
+"""
+import hashlib
+import os
+from io import BytesIO
+from typing import Dict, Iterable, List
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, features
+
+QUALITY = {"webp": 78, "avif": 55}
+SIBLING_HASH_LENGTH = 12
+FORMATS = ("webp", "avif") if features.check("avif") else ("webp",)
+MIME = {"webp": "image/webp", "avif": "image/avif"}
+
+
+def open_normalized(data: bytes) -> Image.Image:
+    """Ouvre l'image, applique l'orientation EXIF et la passe en RGB(A)."""
+    with Image.open(BytesIO(data)) as src:
+        img = ImageOps.exif_transpose(src)
+        return img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+
+
+def dominant_color(img: Image.Image) -> str:
+    """Couleur la plus représentée (palette réduite à 8 teintes), en hexadécimal."""
+    small = img.convert("RGB")
+    small.thumbnail((64, 64))
+    quantized = small.quantize(colors=8)
+    count, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def target_widths(img: Image.Image, widths: Iterable[int]) -> List[int]:
+    """Largeurs demandées, plafonnées à la largeur d'origine (jamais d'agrandissement)."""
+    return sorted({min(w, img.width) for w in widths})
+
+
+def encode(img: Image.Image, width: int, fmt: str) -> bytes:
+    height = max(1, round(img.height * width / img.width))
+    out = BytesIO()
+    img.resize((width, height), Image.LANCZOS).save(out, fmt.upper(), quality=QUALITY[fmt])
+    return out.getvalue()
+
+
+def sibling_name(name: str, width: int, fmt: str, digest: str = "") -> str:
+    """
+    `agents/jean.jpg` -> `agents/jean-<sha256 court>-256.webp` (à côté de
+    l'original). Le hash du contenu distingue jean.jpg de jean.png et un
+    original remplacé sous le même nom; les dérivés plus anciens, sans
+    hash, gardent `agents/jean-256.webp`.
+    """
+    stem, _ = os.path.splitext(name)
+    return f"{stem}-{digest}-{width}.{fmt}" if digest else f"{stem}-{width}.{fmt}"
+
+
+def build_sibling_derivatives(field_file, widths: Iterable[int], force: bool = False) -> Dict[str, object]:
+    """
+    Génère les dérivés d'un ImageField dans le même stockage/dossier que
+    l'original. Retourne {"hash": …, "webp": [largeurs], …}.
+    """
+    storage = field_file.storage
+    with field_file.open("rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:SIBLING_HASH_LENGTH]
+    img = open_normalized(data)
+
+    done: Dict[str, object] = {"hash": digest}
+    for fmt in FORMATS:
+        for width in target_widths(img, widths):
+            name = sibling_name(field_file.name, width, fmt, digest)
+            if force and storage.exists(name):
+                storage.delete(name)
+            if not storage.exists(name):
+                storage.save(name, ContentFile(encode(img, width, fmt)))
+            done.setdefault(fmt, []).append(width)
+    return done
+
+
+def stored_derivatives(instance, field: str, derivatives_field: str):
+    """(nom du fichier, dérivés) tels qu'en base, avant un save() qui les change; None si nouvel objet."""
+    if instance.pk is None:
+        return None
+    return type(instance).objects.filter(pk=instance.pk).values_list(field, derivatives_field).first()
+
+
+def delete_sibling_derivatives(storage, name: str, derivatives: Dict[str, object]) -> None:
+    """Supprime les dérivés d'un original remplacé ou retiré (l'original, lui, reste)."""
+    digest = derivatives.get("hash", "")
+    for fmt in FORMATS:
+        for width in derivatives.get(fmt, []):
+            storage.delete(sibling_name(name, width, fmt, digest))
+
+
+def sibling_srcset(field_file, derivatives: Dict[str, List[int]], fmt: str = "webp") -> str:
+    if not field_file:
+        return ""
+    return ", ".join(
+        f"{field_file.storage.url(sibling_name(field_file.name, w, fmt, derivatives.get('hash', '')))} {w}w"
+        for w in derivatives.get(fmt, [])
+    )
+
+
+def sibling_url(field_file, derivatives: Dict[str, List[int]], min_width: int = 0) -> str:
+    """Plus petit dérivé WebP d'au moins `min_width` px (ou l'original à défaut)."""
+    if not field_file:
+        return ""
+    widths = derivatives.get("webp") or []
+    candidates = [w for w in widths if w >= min_width] or widths[-1:]
+    if not candidates:
+        return field_file.url
+    return field_file.storage.url(sibling_name(field_file.name, candidates[0], "webp", derivatives.get("hash", "")))
@@ -0,0 +1,30 @@
+# core/management/commands/apply_retention.py
+from django.core.management.base import BaseCommand
+
+from core import retention
+
+
+class Command(BaseCommand):
+    help = "Purge les lignes des vieilles versions du catalogue, archive les fiches vendues anciennes (et leurs photos), regroupe les vieux FetchLog, compacte le journal des changements, puis VACUUM/ANALYZE."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Compter sans rien archiver ni supprimer")
+        parser.add_argument("--no-vacuum", action="store_true", help="Ne pas lancer VACUUM/ANALYZE")
+
+    def handle(self, *args, **opts):
+        stats = retention.apply(dry_run=opts["dry_run"], do_vacuum=not opts["no_vacuum"])
+        prefix = "[dry-run] " if opts["dry_run"] else ""
+        self.stdout.write(
+            f"{prefix}Versions du catalogue purgées: {stats['releases']} ({stats['release_files']} dérivés supprimés)"
+        )
+        self.stdout.write(
+            f"{prefix}Fiches archivées: {stats['listings']} ({stats['photos']} photos, "
+            f"{stats['files']} dérivés supprimés) {stats['path']}"
+        )
+        self.stdout.write(f"{prefix}FetchLog regroupés: {stats['fetchlogs']} lignes supprimées")
+        self.stdout.write(f"{prefix}Journal des changements compacté: {stats['changes']} événements supprimés")
+        if stats["reclaimed"] is not None:
+            self.stdout.write(self.style.SUCCESS(
+                f"Base: {stats['bytes_before'] / 1e6:.1f} Mo -> {stats['bytes_after'] / 1e6:.1f} Mo "
+                f"({stats['reclaimed'] / 1e6:.1f} Mo récupérés)"
+            ))
@@ -0,0 +1,97 @@
+# core/management/commands/bench_alerts.py
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import alerts
+from core.models import SavedSearch
+
+
+class _Rollback(Exception):
+    pass
+
+
+PROX_CODES = ("PROX:AUTO", "PROX:PCYC", "PROX:PRIM", "PROX:SEC", "PROX:TRSP")
+CAR_CODES = ("ALLE:NPAV", "EAU:AMU", "SYEG:EGMU", "VUE:EAU", "ZONG:RES", "FOND:BETO")
+WORDS = ("lac", "garage", "piscine", "foyer", "rénovée", "boisé", "plain-pied", "jumelé")
+
+
+def synthetic_searches(n, rnd):
+    """Critères plausibles: un budget presque toujours, des chambres souvent, parfois codes ou mots."""
+    for i in range(n):
+        prix_min = rnd.randrange(100000, 1200000, 10000) if rnd.random() < 0.95 else None
+        prix_max = (prix_min or 100000) + rnd.randrange(50000, 250000, 10000) if rnd.random() < 0.9 else None
+        yield SavedSearch(
+            email=f"bench-{i % 20000}@example.com", name=f"Bench {i}",
+            prix_min=prix_min, prix_max=prix_max,
+            chambres_min=rnd.choice([None, 1, 2, 2, 3, 3, 4]), sdb_min=rnd.choice([None, None, 1, 2]),
+            codes=rnd.sample(PROX_CODES + CAR_CODES, rnd.choice([0, 0, 1, 2, 3])),
+            texte=rnd.choice(WORDS) if rnd.random() < 0.1 else "",
+        )
+
+
+def synthetic_listings(n, rnd):
+    """Fiches d'un delta d'import au format de alerts.LISTING_FIELDS (libellés comme l'import)."""
+    cats, vals = alerts._reverse_labels()
+    labels_cat, labels_val = {v: k for k, v in cats.items()}, {v: k for k, v in vals.items()}
+    for i in range(n):
+        codes = rnd.sample(PROX_CODES + CAR_CODES, rnd.randint(0, 6))
+        yield {
+            "centris_id": f"A{i:07d}", "slug": f"bench-alert-{i}", "prix": rnd.randrange(90000, 1500000, 1000),
+            "adresse": f"{i}, Rue du Banc", "nombre_chambres": rnd.randint(0, 5), "nombre_sdb": rnd.randint(1, 3),
+            "description": " ".join(rnd.sample(WORDS, 3)),
+            "proximites": [labels_val.get(c[5:], c[5:]) for c in codes if c.startswith("PROX:")],
+            "caracteristiques": [
+                {"cat": labels_cat.get(c.split(":")[0], c.split(":")[0]), "val": labels_val.get(c.split(":")[1], c.split(":")[1])}
+                for c in codes if not c.startswith("PROX:")
+            ],
+        }
+
+
+class Command(BaseCommand):
+    help = "Mesure l'évaluation des recherches enregistrées (core/alerts.py) sur un delta synthétique (rollback à la fin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--searches", type=int, default=100000, help="Nb de recherches enregistrées")
+        parser.add_argument("--listings", type=int, default=2000, help="Nb de fiches changées par l'import")
+        parser.add_argument("--check", type=int, default=20, help="Fiches comparées à l'évaluation directe")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(42)
+        listings = list(synthetic_listings(opts["listings"], rnd))
+        try:
+            with transaction.atomic():
+                SavedSearch.objects.bulk_create(synthetic_searches(opts["searches"], rnd), batch_size=5000)
+
+                t0 = time.perf_counter()
+                index = alerts.SearchIndex.load()
+                t_index = time.perf_counter() - t0
+                self.stdout.write(f"index: {index.size} recherches en {t_index:.2f}s")
+
+                t0 = time.perf_counter()
+                results = [index.match(listing) for listing in listings]
+                t_match = time.perf_counter() - t0
+                n_matches = sum(len(r) for r in results)
+                self.stdout.write(
+                    f"index:  {len(listings)} fiches en {t_match:.2f}s "
+                    f"({1000 * t_match / max(1, len(listings)):.2f} ms/fiche), {n_matches} correspondances"
+                )
+
+                # Référence: chaque recherche évaluée pour chaque fiche
+                searches = list(SavedSearch.objects.all())
+                sample = listings[:opts["check"]]
+                t0 = time.perf_counter()
+                for listing, expected in zip(sample, results):
+                    naive = {s.pk for s in searches if alerts.matches_naive(s, listing)}
+                    if naive != expected:
+                        raise CommandError(f"{listing['centris_id']}: index {len(expected)} ≠ direct {len(naive)}")
+                t_naive = (time.perf_counter() - t0) / max(1, len(sample))
+                self.stdout.write(
+                    f"direct: {1000 * t_naive:.2f} ms/fiche (×{t_naive * len(listings) / max(t_match, 1e-9):.0f}), "
+                    f"{len(sample)} fiches identiques"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass
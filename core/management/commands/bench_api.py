@@ -0,0 +1,97 @@
+# core/management/commands/bench_api.py
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from core import api, bench
+from core.bench import percentile
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mesure la latence de l'API JSON sur un catalogue synthétique (rollback à la fin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=10000, help="Nb d'inscriptions à générer")
+        parser.add_argument("--photos", type=int, default=5, help="Nb de photos par inscription")
+        parser.add_argument("--repeat", type=int, default=30, help="Nb de requêtes par scénario")
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self.seed(opts["listings"], opts["photos"])
+                self.run(opts["repeat"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, n, n_photos):
+        t0 = time.perf_counter()
+        bench.seed(n, n_photos)
+        self.stdout.write(f"seed: {n} listings × {n_photos} photos en {time.perf_counter() - t0:.1f}s")
+
+    def run(self, repeat):
+        rf = RequestFactory()
+
+        def page():
+            return api.listings(rf.get("/api/listings/", {"page": 7}))
+
+        def page_cold():
+            cache.clear()
+            return page()
+
+        etag = page()["ETag"]
+
+        def revalidate():
+            return api.listings(rf.get("/api/listings/", {"page": 7}, HTTP_IF_NONE_MATCH=etag))
+
+        def detail():
+            return api.listing_detail(rf.get("/api/listings/bench-42/"), slug="bench-42")
+
+        def ndjson():
+            res = api.listings(rf.get("/api/listings/", {"format": "ndjson"}))
+            return sum(len(chunk) for chunk in res.streaming_content)
+
+        def map_city():
+            cache.clear()
+            return api.listings_map(rf.get("/api/map/", {"bbox": "-71.30,46.78,-71.18,46.84", "zoom": 14}))
+
+        def map_region():
+            cache.clear()
+            return api.listings_map(rf.get("/api/map/", {"bbox": "-79,45,-64,49", "zoom": 6}))
+
+        pan = iter(range(10 ** 6))
+
+        def map_region_pan():
+            # petits déplacements: la fenêtre alignée retombe sur la même entrée de cache
+            dx = (next(pan) % 10) * 0.01
+            return api.listings_map(rf.get("/api/map/", {"bbox": f"{-79 + dx},45,{-64 + dx},49", "zoom": 6}))
+
+        scenarios = [
+            ("page JSON (cache froid)", page_cold, repeat),
+            ("page JSON (cache chaud)", page, repeat),
+            ("304 If-None-Match", revalidate, repeat),
+            ("détail", detail, repeat),
+            ("NDJSON complet", ndjson, max(3, repeat // 10)),
+            ("carte quartier (marqueurs)", map_city, repeat),
+            ("carte province (grappes)", map_region, repeat),
+            ("carte province (panoramique)", map_region_pan, repeat),
+        ]
+        for label, fn, n in scenarios:
+            samples = []
+            for _ in range(n):
+                t0 = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - t0) * 1000)
+            self.stdout.write(
+                f"{label:<30} n={n:<4} p50={statistics.median(samples):8.2f}ms "
+                f"p95={percentile(samples, 0.95):8.2f}ms max={max(samples):8.2f}ms"
+            )
+        cache.clear()
@@ -0,0 +1,117 @@
+# core/management/commands/bench_import.py
+import csv
+import random
+import time
+import zipfile
+from io import BytesIO, StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core import catalog, pgload
+from core.management.commands.import_centris import ENC, Record, orm_load, parse_feed
+from core.models import CatalogRelease
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic_records(n, n_photos, generation=0, rnd_seed=42):
+    """
+    Fiches au format de build_record(). Génération 1: 2 % disparues, 2 %
+    nouvelles, 10 % de prix modifiés, 5 % de listes de photos changées.
+    """
+    # Coordonnées propres à chaque fiche: identiques d'une génération à l'autre
+    rnd = random.Random(rnd_seed)
+    coords = [(rnd.uniform(45.0, 49.0), rnd.uniform(-79.0, -64.0)) for _ in range(n + n // 50)]
+    ids = range(n)
+    if generation:
+        ids = [i for i in ids if i % 50 != 1] + list(range(n, n + n // 50))
+    for i in ids:
+        lat, lon = coords[i]
+        prix = 200000 + i + (1000 if generation and i % 10 == 0 else 0)
+        version = generation if i % 20 == 0 else 0
+        fields = dict(
+            prix=prix, adresse=f"{i}, Rue du Banc", nombre_pieces=5 + i % 4, nombre_chambres=i % 5,
+            nombre_sdb=1 + i % 2, annee_construction=1950 + i % 70, description="Belle propriété. " * 25,
+            proximites_text="École, Parc", proximites=["École", "Parc"],
+            caracteristiques_text="Allée: Asphalte", caracteristiques=[{"cat": "Allée", "val": "Asphalte"}],
+        )
+        photos = [(s, f"https://img.example/{i}/{s}-{version}.jpg") for s in range(1, n_photos + 1)]
+        yield Record(f"X{i:07d}", fields, lat, lon, photos)
+
+
+def synthetic_zip(n, n_photos, generation=0) -> bytes:
+    """
+    Les fiches de synthetic_records() en ZIP au format Centris (sans
+    en-tête, cp1252): inscriptions, remarques, caractéristiques, unités,
+    pièces, photos et addenda, comme le flux réel.
+    """
+    files = {name: [] for name in (
+        "INSCRIPTIONS.TXT", "REMARQUES.TXT", "CARACTERISTIQUES.TXT", "UNITES_DETAILLEES.TXT",
+        "PIECES_UNITES.TXT", "PHOTOS.TXT", "ADDENDA.TXT",
+    )}
+    for rec in synthetic_records(n, n_photos, generation):
+        f, id_ = rec.fields, rec.centris_id
+        civic, street = f["adresse"].split(", ", 1)
+        row = [""] * 40
+        row[0], row[6], row[10], row[25], row[27] = id_, str(f["prix"]), str(f["annee_construction"]), civic, street
+        row[30], row[31] = f"{rec.latitude:.6f}", f"{rec.longitude:.6f}"
+        files["INSCRIPTIONS.TXT"].append(row)
+        files["REMARQUES.TXT"].append([id_, "1", "F", "", "", "", f["description"]])
+        files["CARACTERISTIQUES.TXT"] += [[id_, "ALLE", "Asphalte"]] + [[id_, "PROX", p] for p in f["proximites"]]
+        files["UNITES_DETAILLEES.TXT"].append([id_, "1", "", str(f["nombre_pieces"]), str(f["nombre_chambres"])])
+        files["PIECES_UNITES.TXT"] += [[id_, "1", "", "SDB"]] * f["nombre_sdb"]
+        files["PHOTOS.TXT"] += [[id_, str(seq), "", "", "", "", url] for seq, url in rec.photos]
+        files["ADDENDA.TXT"].append([id_, "1", "F", "À proximité: " + f["proximites_text"]])
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, rows in files.items():
+            text = StringIO()
+            csv.writer(text).writerows(rows)
+            z.writestr(name, text.getvalue().encode(ENC))
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure l'import Centris (analyse du ZIP + chargement COPY PostgreSQL ou ORM) "
+        "sur un flux synthétique (rollback à la fin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=100000, help="Nb d'inscriptions du flux")
+        parser.add_argument("--photos", type=int, default=5, help="Nb de photos par inscription")
+        parser.add_argument("--loader", choices=["auto", "copy", "orm"], default="auto",
+                            help="copy = core/pgload.py (PostgreSQL), orm = chemin générique")
+
+    def handle(self, *args, **opts):
+        loader = opts["loader"]
+        if loader == "auto":
+            loader = "copy" if pgload.supported() else "orm"
+        if loader == "copy" and connection.vendor != "postgresql":
+            raise CommandError("--loader copy: PostgreSQL seulement (DB_ENGINE)")
+        load = pgload.load if loader == "copy" else orm_load
+        self.stdout.write(f"{connection.vendor} / {loader}: {opts['listings']} fiches × {opts['photos']} photos")
+
+        try:
+            with transaction.atomic():
+                for generation, label in enumerate(("chargement initial", "flux suivant")):
+                    # ZIP construit avant le chrono: analyse + chargement mesurés, comme import_centris
+                    data = synthetic_zip(opts["listings"], opts["photos"], generation)
+                    t0 = time.perf_counter()
+                    # Copie de la version en ligne comprise (core/catalog.py)
+                    release = catalog.fork(CatalogRelease(source_name="bench"))
+                    with zipfile.ZipFile(BytesIO(data)) as z:
+                        counts = load(parse_feed(z), release, timezone.now())
+                    catalog.publish(release)
+                    elapsed = time.perf_counter() - t0
+                    self.stdout.write(
+                        f"{label:<20} {elapsed:8.2f}s  {counts['items_total'] / elapsed:10.0f} fiches/s  "
+                        f"+{counts['added']} ~{counts['updated']} sold={counts['marked_sold']}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass
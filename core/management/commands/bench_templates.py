@@ -0,0 +1,81 @@
+# core/management/commands/bench_templates.py
+import statistics
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core import fragments
+from core.models import Certification
+
+PAGES = ("home", "contact", "collaborators", "invest", "about", "properties_list")
+FRAGMENTS = (
+    "navbar_black.html",
+    "navbar_white.html",
+    "footer.html",
+    "partials/home_faq.html",
+    "partials/process_slider.html",
+    "partials/awards_carousel.html",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Temps de rendu des pages et des fragments communs, "
+        "cache froid (vidé avant chaque requête) vs chaud."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20, help="Nb de rendus par mesure")
+
+    def handle(self, *args, **opts):
+        repeat = opts["repeat"]
+        rf = RequestFactory()
+
+        self.stdout.write("Pages (p50, requêtes SQL)")
+        for name in PAGES:
+            path = reverse(name)
+            view = resolve(path).func
+            if iscoroutinefunction(view):
+                view = async_to_sync(view)
+
+            def hit():
+                return view(rf.get(path))
+
+            cold = self.measure(hit, repeat, before=cache.clear)
+            warm = self.measure(hit, repeat)
+            self.stdout.write(
+                f"  {name:<18} froid={cold[0]:7.2f}ms ({cold[1]} req.)  "
+                f"chaud={warm[0]:7.2f}ms ({warm[1]} req.)  gain={cold[0] - warm[0]:6.2f}ms"
+            )
+
+        self.stdout.write("Fragments seuls (p50)")
+        context = {
+            "awards": Certification.objects.all().order_by("id"),
+            "FRAGMENT_TIMEOUT": fragments.TIMEOUT,
+            "FRAGMENT_VERSION": "bench",
+        }
+        for template in FRAGMENTS:
+            cold = self.measure(lambda: render_to_string(template, context), repeat, before=cache.clear)
+            warm = self.measure(lambda: render_to_string(template, context), repeat)
+            self.stdout.write(f"  {template:<30} froid={cold[0]:7.2f}ms  chaud={warm[0]:7.2f}ms")
+        cache.clear()
+
+    @staticmethod
+    def measure(fn, repeat, before=None):
+        """Retourne (p50 en ms, nb de requêtes SQL du dernier rendu)."""
+        samples = []
+        for _ in range(repeat):
+            if before:
+                before()
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - t0) * 1000)
+        return statistics.median(samples), len(ctx.captured_queries)
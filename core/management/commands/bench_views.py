@@ -0,0 +1,269 @@
+# core/management/commands/bench_views.py
+"""
+Bench de charge des vues publiques.
+
+    DB_NAME=bench.sqlite3 python manage.py migrate
+    DB_NAME=bench.sqlite3 python manage.py seed_bench --listings 2000 --photos 8
+
+    # en processus (application WSGI et/ou ASGI, sans réseau)
+    DB_NAME=bench.sqlite3 python manage.py bench_views --target all --json main.json
+
+    # gunicorn local lancé par la commande (DEBUG=False), clients concurrents
+    DB_NAME=bench.sqlite3 python manage.py bench_views --serve gunicorn --workers 4 --concurrency 16
+
+    # workers sync contre workers uvicorn (GUNICORN_ASGI, voir gunicorn.conf.py),
+    # même nombre de workers, même charge
+    DB_NAME=bench.sqlite3 python manage.py bench_views --serve gunicorn gunicorn-asgi --concurrency 32
+
+    # serveur déjà lancé ailleurs (avec CONTACT_RATE_LIMIT élevé pour les scénarios *_submit)
+    python manage.py bench_views --url http://127.0.0.1:8000
+
+    # comparaison avec une autre branche: échoue si p95/débit/SQL régressent
+    python manage.py bench_views --json branche.json --baseline main.json --tolerance 0.2
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core import bench
+from core.models import Listing
+from core.views import PAGE_SIZE
+
+SCENARIOS = ("home", "properties_list", "property_detail", "collaborators", "contact_submit", "invest_submit")
+SERVERS = ("gunicorn", "gunicorn-asgi")
+# Tous les POST viennent de la même IP et du même courriel: sans cela, la
+# limitation des formulaires (core/ratelimit.py) répondrait 429 dès le 6e
+BENCH_RATE_LIMIT = "1000000/s"
+PORT = 8765
+
+
+class Command(BaseCommand):
+    help = "Débit et latence (p50/p95/p99) des vues publiques, requêtes SQL par requête; sortie JSON comparable."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=("wsgi", "asgi", "all"), default="wsgi",
+                            help="Application appelée en processus")
+        parser.add_argument("--url", help="Serveur déjà lancé (ex. http://127.0.0.1:8000)")
+        parser.add_argument("--serve", nargs="+", choices=SERVERS,
+                            help="Lancer ce(s) serveur(s) local(aux) pour la mesure, l'un après l'autre")
+        parser.add_argument("--workers", type=int, default=4, help="Workers du serveur lancé par --serve")
+        parser.add_argument("--requests", type=int, default=200, help="Requêtes mesurées par scénario")
+        parser.add_argument("--concurrency", type=int, default=8, help="Clients simultanés")
+        parser.add_argument("--warmup", type=int, default=5, help="Requêtes d'échauffement par scénario")
+        parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument("--json", dest="json_path", help="Écrire les résultats dans ce fichier")
+        parser.add_argument("--baseline", help="Résultats JSON de référence à comparer")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Régression tolérée (0.25 = 25 %%)")
+
+    def handle(self, *args, **opts):
+        slugs = list(Listing.objects.live().filter(slug__startswith="bench-").values_list("slug", flat=True)[:1000])
+        if not slugs:
+            raise CommandError("Aucune donnée de bench: lancer d'abord `manage.py seed_bench`.")
+        pages = max(1, Listing.objects.visible().count() // PAGE_SIZE)
+        connections.close_all()  # les threads clients ouvrent leurs propres connexions
+
+        if opts["url"]:
+            targets = [(opts["url"], bench.HTTPClient(opts["url"]))]
+        elif opts["serve"]:
+            if "gunicorn-asgi" in opts["serve"] and importlib.util.find_spec("uvicorn") is None:
+                raise CommandError("--serve gunicorn-asgi: installer uvicorn (pip install \"uvicorn[standard]\")")
+            targets = [(f"{kind} -w {opts['workers']}", kind) for kind in opts["serve"]]
+        else:
+            kinds = ("wsgi", "asgi") if opts["target"] == "all" else (opts["target"],)
+            targets = [(kind, bench.WSGIClient() if kind == "wsgi" else bench.ASGIClient()) for kind in kinds]
+
+        report = {"meta": self.meta(opts, pages), "results": {}}
+        for label, client in targets:
+            if isinstance(client, str):
+                with self.serve(client, opts["workers"]) as url:
+                    results = self.run_all(bench.HTTPClient(url), slugs, pages, opts)
+            else:
+                with override_settings(CONTACT_RATE_LIMIT=BENCH_RATE_LIMIT):
+                    results = self.run_all(client, slugs, pages, opts)
+            report["results"][label] = results
+            self.print_table(label, results)
+
+        if opts["json_path"]:
+            with open(opts["json_path"], "w") as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"→ {opts['json_path']}")
+        if opts["baseline"]:
+            self.compare(report, opts["baseline"], opts["tolerance"])
+
+    # --- scénarios -------------------------------------------------------
+    def make_requests(self, scenario, slugs, pages, rnd):
+        form = {"name": "Bench", "email": bench.BENCH_EMAIL, "phone": "", "message": "Bonjour, bench."}
+        if scenario == "home":
+            return lambda: ("GET", "/", b"")
+        if scenario == "properties_list":
+            return lambda: ("GET", f"/properties/?page={rnd.randint(1, pages)}", b"")
+        if scenario == "property_detail":
+            return lambda: ("GET", f"/properties/{rnd.choice(slugs)}/", b"")
+        if scenario == "collaborators":
+            return lambda: ("GET", "/collaborateurs/", b"")
+        if scenario == "contact_submit":
+            return lambda: ("POST", "/contact/submit/", urlencode(form).encode())
+        if scenario == "invest_submit":
+            return lambda: ("POST", "/investir/submit/", urlencode(form).encode())
+        raise CommandError(scenario)
+
+    def run_all(self, client, slugs, pages, opts):
+        rnd = random.Random(42)
+        scenarios = {s: self.make_requests(s, slugs, pages, rnd) for s in opts["scenarios"]}
+        if isinstance(client, bench.ASGIClient):
+            # une seule boucle pour tous les scénarios, comme un serveur ASGI
+            return asyncio.run(self._run_all_async(client, scenarios, opts))
+        return {scenario: self.run_scenario(client, next_request, opts) for scenario, next_request in scenarios.items()}
+
+    async def _run_all_async(self, client, scenarios, opts):
+        results = {}
+        for scenario, next_request in scenarios.items():
+            timings = await self._run_async(client, next_request, opts["warmup"], opts["requests"], opts["concurrency"])
+            results[scenario] = self.summarize(*timings)
+        return results
+
+    def run_scenario(self, client, next_request, opts):
+        n, concurrency = opts["requests"], opts["concurrency"]
+        for _ in range(opts["warmup"]):
+            client.request(*next_request())
+        calls = [next_request() for _ in range(n)]
+        t0 = time.perf_counter()
+        if concurrency == 1:
+            timings = [bench.timed(client.request, *call) for call in calls]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                timings = list(pool.map(lambda call: bench.timed(client.request, *call), calls))
+        return self.summarize(timings, time.perf_counter() - t0)
+
+    async def _run_async(self, client, next_request, warmup, n, concurrency):
+        for _ in range(warmup):
+            await client.arequest(*next_request())
+        calls = [next_request() for _ in range(n)]
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(call):
+            async with sem:
+                t0 = time.perf_counter()
+                try:
+                    res = await client.arequest(*call)
+                except Exception:
+                    res = None
+                return (time.perf_counter() - t0) * 1000, res
+
+        t0 = time.perf_counter()
+        timings = await asyncio.gather(*(one(call) for call in calls))
+        return timings, time.perf_counter() - t0
+
+    @staticmethod
+    def summarize(timings, wall_s):
+        samples, queries, errors = [], [], 0
+        for ms, res in timings:
+            samples.append(ms)
+            if res is None or res[0] >= 400:
+                errors += 1
+                continue
+            count = bench.sql_count(res[1])
+            if count is not None:
+                queries.append(count)
+        return bench.summarize(samples, wall_s, queries, errors)
+
+    # --- serveur local -----------------------------------------------------
+    def serve(self, kind, workers):
+        command = self
+
+        class Server:
+            def __enter__(self):
+                env = {
+                    **os.environ,
+                    "DEBUG": "False", "SECURE_SSL_REDIRECT": "False",
+                    "ALLOWED_HOSTS": "127.0.0.1,localhost", "CONTACT_RATE_LIMIT": BENCH_RATE_LIMIT,
+                }
+                argv = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{PORT}",
+                        "--log-level", "warning"]
+                if kind == "gunicorn-asgi":
+                    env["GUNICORN_ASGI"] = "1"  # worker et application: gunicorn.conf.py
+                else:
+                    env.pop("GUNICORN_ASGI", None)
+                    argv.append("lafreniere_site.wsgi:application")
+                self.proc = subprocess.Popen(argv, cwd=settings.BASE_DIR, env=env)
+                deadline = time.monotonic() + 30
+                while time.monotonic() < deadline:
+                    try:
+                        socket.create_connection(("127.0.0.1", PORT), timeout=0.5).close()
+                        return f"http://127.0.0.1:{PORT}"
+                    except OSError:
+                        if self.proc.poll() is not None:
+                            break
+                        time.sleep(0.2)
+                self.__exit__()
+                raise CommandError(f"{kind} n'a pas démarré sur le port {PORT}")
+
+            def __exit__(self, *exc):
+                self.proc.terminate()
+                try:
+                    self.proc.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    self.proc.kill()
+                command.stdout.write(f"{kind} arrêté")
+
+        return Server()
+
+    # --- rapport -----------------------------------------------------------
+    def meta(self, opts, pages):
+        try:
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                                    capture_output=True, text=True, timeout=5).stdout.strip()
+        except OSError:
+            commit = ""
+        return {
+            "commit": commit,
+            "date": timezone.now().isoformat(timespec="seconds"),
+            "db": connection.vendor,
+            "listings": Listing.objects.live().count(),
+            "pages": pages,
+            **{k: opts[k] for k in ("requests", "concurrency", "warmup")},
+        }
+
+    def print_table(self, label, results):
+        self.stdout.write(f"[{label}]")
+        for scenario, r in results.items():
+            self.stdout.write(
+                f"  {scenario:<18} {r['rps']:8.1f} req/s  p50={r['p50_ms']:8.2f}ms  p95={r['p95_ms']:8.2f}ms  "
+                f"p99={r['p99_ms']:8.2f}ms  SQL/req={r['queries_per_request']}  erreurs={r['errors']}"
+            )
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+        regressions = []
+        for target, results in report["results"].items():
+            for scenario, cur in results.items():
+                ref = baseline.get(target, {}).get(scenario)
+                if not ref:
+                    continue
+                name = f"{target}/{scenario}"
+                if cur["p95_ms"] > ref["p95_ms"] * (1 + tolerance):
+                    regressions.append(f"{name}: p95 {ref['p95_ms']} → {cur['p95_ms']} ms")
+                if cur["rps"] < ref["rps"] * (1 - tolerance):
+                    regressions.append(f"{name}: débit {ref['rps']} → {cur['rps']} req/s")
+                if (cur["queries_per_request"] or 0) > (ref["queries_per_request"] or 0):
+                    regressions.append(f"{name}: SQL/req {ref['queries_per_request']} → {cur['queries_per_request']}")
+                if cur["errors"] > ref["errors"]:
+                    regressions.append(f"{name}: erreurs {ref['errors']} → {cur['errors']}")
+        if regressions:
+            raise CommandError("Régressions par rapport à la référence:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"Aucune régression par rapport à {baseline_path}"))
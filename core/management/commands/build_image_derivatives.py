@@ -0,0 +1,25 @@
+# core/management/commands/build_image_derivatives.py
+from django.core.management.base import BaseCommand
+
+from core.models import Agent, Certification
+
+
+class Command(BaseCommand):
+    help = "Génère (ou régénère) les dérivés WebP/AVIF des logos de certifications et photos d'agents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Réencoder même si les dérivés existent déjà")
+
+    def handle(self, *args, **opts):
+        force = opts["force"]
+        for model, field in ((Certification, "logo"), (Agent, "photo")):
+            done = failed = 0
+            for obj in model.objects.exclude(**{field: ""}).exclude(**{f"{field}__isnull": True}).iterator():
+                try:
+                    obj.refresh_derivatives(force=force)
+                    done += 1
+                except OSError as e:
+                    # fichier manquant sur disque ou image illisible
+                    failed += 1
+                    self.stderr.write(f"{model.__name__} #{obj.pk}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural}: {done} traités, {failed} échecs"))
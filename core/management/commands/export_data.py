@@ -0,0 +1,42 @@
+# core/management/commands/export_data.py
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import export
+from core.models import ContactMessage, Listing
+
+MODELS = {"listings": (Listing, "first_seen_at"), "contacts": (ContactMessage, "created_at")}
+
+
+class Command(BaseCommand):
+    help = "Exporte les fiches (version en ligne) ou les messages de contact en CSV / NDJSON, en flux (mémoire constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("what", choices=sorted(MODELS))
+        parser.add_argument("--format", choices=sorted(export.CONTENT_TYPES), default="csv")
+        parser.add_argument("--output", default="-", help="Fichier de sortie (- = sortie standard)")
+        parser.add_argument("--since", help="Date AAAA-MM-JJ: créés (fiches: vues la 1re fois) depuis")
+        parser.add_argument("--status", choices=[s for s, _ in Listing.STATUS_CHOICES], help="Fiches: statut")
+
+    def handle(self, *args, **opts):
+        model, date_field = MODELS[opts["what"]]
+        qs = Listing.objects.live() if model is Listing else model.objects.all()  # fiches: version en ligne
+        if opts["since"]:
+            try:
+                since = datetime.combine(datetime.strptime(opts["since"], "%Y-%m-%d").date(), time.min)
+            except ValueError:
+                raise CommandError(f"--since invalide: {opts['since']} (attendu AAAA-MM-JJ)")
+            qs = qs.filter(**{f"{date_field}__gte": timezone.make_aware(since)})
+        if opts["status"]:
+            if model is not Listing:
+                raise CommandError("--status ne s'applique qu'aux fiches")
+            qs = qs.filter(status=opts["status"])
+
+        if opts["output"] == "-":
+            count = export.write(qs, opts["format"], self.stdout)  # lignes déjà terminées par \n
+        else:
+            with open(opts["output"], "w", encoding="utf-8", newline="") as fh:
+                count = export.write(qs, opts["format"], fh)
+        self.stderr.write(f"{count} ligne(s) exportée(s)")
@@ -7,15 +7,19 @@ import time
 import zipfile
 from datetime import datetime, timedelta, date
 from io import BytesIO
-from typing import List, Optional, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 from collections import defaultdict, OrderedDict
 
 import requests
+from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from django.utils import timezone
 
-from core.models import Listing, ListingPhoto, FetchLog
+from core import alerts, catalog, changes, pgload, sqlite
+from core.models import CatalogRelease, Listing, ListingChange, ListingPhoto, FetchLog
+from core.photos import DEFAULT_WORKERS, process_pending
 
 # -------------------- MAPPINGS -------------------- #
 CAT_LABEL = {
@@ -105,6 +109,22 @@ def extract_address(row) -> Optional[str]:
     return ", ".join(parts) if parts else None
 
 
+def extract_coordinates(row) -> Tuple[Optional[float], Optional[float]]:
+    # Le flux n'a pas d'en-tête: on cherche la paire (latitude, longitude)
+    # décimale consécutive qui tombe au Québec / dans l'est du Canada.
+    for i in range(len(row) - 1):
+        a, b = clean(row[i]), clean(row[i + 1])
+        if not a or not b or "." not in a or "." not in b:
+            continue
+        try:
+            lat, lon = float(a), float(b)
+        except ValueError:
+            continue
+        if 40.0 <= lat <= 63.0 and -80.0 <= lon <= -55.0:
+            return lat, lon
+    return None, None
+
+
 def extract_price(row) -> Optional[int]:
     if len(row) > 6 and clean(row[6]).isdigit():
         return int(clean(row[6]))
@@ -123,12 +143,9 @@ def extract_description(remarques_rows) -> Optional[str]:
     return text.strip() or None
 
 
-def extract_addenda(z: zipfile.ZipFile, id_: str) -> Optional[str]:
-    if 'ADDENDA.TXT' not in z.namelist():
-        return None
-    txt = z.read('ADDENDA.TXT').decode(ENC, errors='replace')
-    reader = csv.reader(io.StringIO(txt))
-    chunks = [clean(r[-1]) for r in reader if r and clean(r[0]) == id_ and r[-1]]
+def extract_addenda(addenda_rows) -> Optional[str]:
+    # rows: id, ..., text (lignes de ADDENDA.TXT de l'inscription)
+    chunks = [clean(r[-1]) for r in addenda_rows if r[-1]]
     if chunks:
         joined = " ".join(chunks)
         joined = re.sub(r'<br\s*/?>', ' ', joined, flags=re.I)
@@ -269,6 +286,149 @@ def download_bytes(session: requests.Session, url: str) -> bytes:
         return buf.getvalue()
 
 
+# -------------------- CHARGEMENT -------------------- #
+# Champs que l'export ne fournit pas (pas mappés pour l'instant)
+FEED_DEFAULTS = dict(superficie_habitable=None, superficie_terrain=None, inclus="")
+
+
+class Record(NamedTuple):
+    centris_id: str
+    fields: dict                      # champs de contenu de Listing (hors coordonnées et statut)
+    latitude: Optional[float]
+    longitude: Optional[float]
+    photos: List[Tuple[int, str]]     # [(sequence, url)]
+
+
+def build_record(row, by_rem, by_car, by_pho, by_uni, by_pie, by_add) -> Record:
+    id_ = clean(row[0])
+    addenda = extract_addenda(by_add.get(id_, [])) or ""
+    proximites_text, proximites_arr = extract_proximites(addenda, by_car.get(id_, []))
+    car_text, car_arr = build_caracteristiques(by_car.get(id_, []))
+    n_pieces, n_chambres, n_sdb = extract_units(by_uni.get(id_, []), by_pie.get(id_, []))
+    lat, lon = extract_coordinates(row)
+    fields = dict(
+        prix=extract_price(row),
+        adresse=(extract_address(row) or ""),
+        nombre_pieces=n_pieces,
+        nombre_chambres=n_chambres,
+        nombre_sdb=n_sdb,
+        annee_construction=extract_year(row),
+        description=(extract_description(by_rem.get(id_, [])) or ""),
+        proximites_text=proximites_text,
+        proximites=proximites_arr,
+        caracteristiques_text=car_text,
+        caracteristiques=car_arr,
+    )
+    return Record(id_, fields, lat, lon, extract_photos(by_pho.get(id_, [])))
+
+
+def index_by_id(rows) -> Dict[str, list]:
+    by_id = defaultdict(list)
+    for r in rows:
+        if r:
+            by_id[clean(r[0])].append(r)
+    return by_id
+
+
+def parse_feed(z: zipfile.ZipFile) -> Iterator[Record]:
+    """
+    Records du ZIP Centris, dans l'ordre de INSCRIPTIONS.TXT. Les fichiers
+    annexes sont lus et indexés par ID une seule fois (ici, hors de la
+    transaction de l'import); les Records sont construits à la demande.
+    """
+    rows_ins = read_csv_from_zip(z, 'INSCRIPTIONS.TXT')
+    by_rem = index_by_id(read_csv_from_zip(z, 'REMARQUES.TXT'))
+    by_car = index_by_id(read_csv_from_zip(z, 'CARACTERISTIQUES.TXT'))
+    by_pho = index_by_id(read_csv_from_zip(z, 'PHOTOS.TXT'))
+    by_uni = index_by_id(read_csv_from_zip(z, 'UNITES_DETAILLEES.TXT'))
+    by_pie = index_by_id(read_csv_from_zip(z, 'PIECES_UNITES.TXT'))
+    by_add = index_by_id(read_csv_from_zip(z, 'ADDENDA.TXT'))
+    return (
+        build_record(row, by_rem, by_car, by_pho, by_uni, by_pie, by_add)
+        for row in rows_ins if row and clean(row[0])
+    )
+
+
+def orm_load(records, release, now, mark_sold: bool = True) -> Dict[str, int]:
+    """Chargement générique (SQLite…): une fiche à la fois par l'ORM, dans les lignes de `release` (catalog.fork)."""
+    counts = dict(items_total=0, added=0, updated=0, reactivated=0, marked_sold=0)
+    seen_ids = set()
+    events = []  # journal des changements (core/changes.py)
+    rows = Listing.objects.filter(release=release)
+
+    def event(centris_id, kind, **extra):
+        events.append(ListingChange(listing_id=centris_id, kind=kind, release=release, created_at=now, **extra))
+    for rec in records:
+        counts["items_total"] += 1
+        seen_ids.add(rec.centris_id)
+        obj, created = Listing.objects.get_or_create(
+            release=release, centris_id=rec.centris_id,
+            defaults=dict(
+                slug=f"listing-{rec.centris_id}",
+                **rec.fields,
+                **FEED_DEFAULTS,
+                status=Listing.STATUS_ACTIVE,
+                sold_at=None,
+                revision=release.pk,
+                last_seen_at=now,
+            ),
+        )
+        # photos réécrites seulement si la liste change; les dérivés déjà
+        # calculés suivent leur URL
+        current = [] if created or not rec.photos else list(ListingPhoto.objects.filter(listing=obj))
+        photos_changed = bool(rec.photos) and [p.url for p in current] != [u for _, u in rec.photos]
+        if created:
+            obj.ensure_slug()
+            obj.set_coordinates(rec.latitude, rec.longitude)
+            obj.save(update_fields=["slug", "latitude", "longitude", "geohash"])
+            counts["added"] += 1
+            event(obj.centris_id, ListingChange.KIND_CREATED)
+        else:
+            before = {f: getattr(obj, f) for f in pgload.FEED_FIELDS}
+            reactivated = obj.status != Listing.STATUS_ACTIVE
+            if reactivated:
+                counts["reactivated"] += 1
+            for name, value in {**rec.fields, **FEED_DEFAULTS}.items():
+                setattr(obj, name, value)
+            obj.last_seen_at = now
+            obj.status = Listing.STATUS_ACTIVE
+            obj.sold_at = None
+            obj.set_coordinates(rec.latitude, rec.longitude)
+            obj.ensure_slug()
+            changed = reactivated or any(getattr(obj, f) != before[f] for f in pgload.FEED_FIELDS)
+            if changed or photos_changed:
+                obj.revision = release.pk
+            obj.save()
+            counts["updated"] += 1
+            if changed:
+                prix_before = before["prix"] if obj.prix != before["prix"] else None
+                event(obj.centris_id, ListingChange.KIND_UPDATED, prix_before=prix_before)
+
+        if photos_changed:
+            known = {p.url: p for p in current}
+            ListingPhoto.objects.filter(listing=obj).delete()
+            ListingPhoto.objects.bulk_create(
+                [
+                    ListingPhoto(
+                        listing=obj, sequence=(i + 1), url=u,
+                        **{f: getattr(known[u], f) for f in ListingPhoto.DERIVED_FIELDS if u in known},
+                    )
+                    for i, (_, u) in enumerate(rec.photos)
+                ]
+            )
+            if not created:
+                event(obj.centris_id, ListingChange.KIND_PHOTOS)
+
+    # Mark SOLD for missing
+    if mark_sold:
+        sold_qs = rows.filter(status=Listing.STATUS_ACTIVE).exclude(centris_id__in=seen_ids)
+        for centris_id in sold_qs.order_by("centris_id").values_list("centris_id", flat=True):
+            event(centris_id, ListingChange.KIND_SOLD)
+        counts["marked_sold"] = sold_qs.update(status=Listing.STATUS_SOLD, sold_at=now, revision=release.pk)
+    changes.record(events)
+    return counts
+
+
 # -------------------- DJANGO COMMAND -------------------- #
 class Command(BaseCommand):
     help = "Fetch + parse + import Centris en un seul run (et marque SOLD ce qui disparaît)."
@@ -279,6 +439,11 @@ class Command(BaseCommand):
         parser.add_argument("--retry-seconds", type=int, default=300, help="Pause entre tentatives (sec)")
         parser.add_argument("--save-zip-dir", default="", help="Optionnel: dossier où sauvegarder le ZIP téléchargé")
         parser.add_argument("--no-mark-sold", action="store_true", help="Ne pas marquer SOLD les ID absents")
+        parser.add_argument("--no-photos", action="store_true", help="Ne pas générer les dérivés locaux des photos")
+        parser.add_argument("--photo-workers", type=int, default=DEFAULT_WORKERS, help="Téléchargements de photos en parallèle")
+        parser.add_argument("--no-publish", action="store_true", help="Ne pas régénérer l'export statique (STATIC_EXPORT_ROOT)")
+        parser.add_argument("--force", action="store_true", help="Publier même au-delà des seuils (core/catalog.py)")
+        parser.add_argument("--no-alerts", action="store_true", help="Ne pas évaluer les recherches enregistrées (core/alerts.py)")
 
     def handle(self, *args, **opts):
         base_url = opts["base_url"].strip()
@@ -328,119 +493,60 @@ class Command(BaseCommand):
         items_total = 0
 
         with zipfile.ZipFile(BytesIO(data_bytes), 'r') as z:
-            rows_ins = read_csv_from_zip(z, 'INSCRIPTIONS.TXT')
-            rows_rem = read_csv_from_zip(z, 'REMARQUES.TXT')
-            rows_car = read_csv_from_zip(z, 'CARACTERISTIQUES.TXT')
-            rows_pho = read_csv_from_zip(z, 'PHOTOS.TXT')
-            rows_uni = read_csv_from_zip(z, 'UNITES_DETAILLEES.TXT')
-            rows_pie = read_csv_from_zip(z, 'PIECES_UNITES.TXT')
-
-            by_rem = defaultdict(list); [by_rem[clean(r[0])].append(r) for r in rows_rem if r]
-            by_car = defaultdict(list); [by_car[clean(r[0])].append(r) for r in rows_car if r]
-            by_pho = defaultdict(list); [by_pho[clean(r[0])].append(r) for r in rows_pho if r]
-            by_uni = defaultdict(list); [by_uni[clean(r[0])].append(r) for r in rows_uni if r]
-            by_pie = defaultdict(list); [by_pie[clean(r[0])].append(r) for r in rows_pie if r]
-
-            seen_ids = set()
-
-            with transaction.atomic():
-                for row in rows_ins:
-                    if not row or not clean(row[0]):
-                        continue
-                    items_total += 1
-                    id_ = clean(row[0])
-                    seen_ids.add(id_)
-
-                    prix = extract_price(row)
-                    adresse = (extract_address(row) or "")
-                    annee = extract_year(row)
-                    descr = (extract_description(by_rem.get(id_, [])) or "")
-
-                    # proximites
-                    addenda_txt = extract_addenda(z, id_) or ""
-                    proximites_text, proximites_arr = extract_proximites(addenda_txt, by_car.get(id_, []))
-
-                    # caracteristiques
-                    car_text, car_arr = build_caracteristiques(by_car.get(id_, []))
-
-                    # units / rooms
-                    n_pieces, n_chambres, n_sdb = extract_units(by_uni.get(id_, []), by_pie.get(id_, []))
-
-                    obj, created = Listing.objects.get_or_create(
-                        centris_id=id_,
-                        defaults=dict(
-                            slug=f"listing-{id_}",
-                            prix=prix,
-                            adresse=adresse,
-                            nombre_pieces=n_pieces,
-                            nombre_chambres=n_chambres,
-                            nombre_sdb=n_sdb,
-                            superficie_habitable=None,
-                            superficie_terrain=None,
-                            annee_construction=annee,
-                            inclus="",  # pas mappé pour l’instant
-                            description=descr,
-                            proximites_text=proximites_text,
-                            proximites=proximites_arr,
-                            caracteristiques_text=car_text,
-                            caracteristiques=car_arr,
-                            status=Listing.STATUS_ACTIVE,
-                            sold_at=None,
-                            last_seen_at=now,
-                        ),
+            records = parse_feed(z)
+            release = CatalogRelease(source_name=source_name)
+
+            try:
+                with transaction.atomic():
+                    changes.lock()
+                    # Nouvelle version construite à côté de celle en ligne (core/catalog.py)
+                    catalog.fork(release)
+                    # PostgreSQL: COPY + fusion ensembliste (core/pgload.py); sinon l'ORM
+                    load = pgload.load if pgload.supported() else orm_load
+                    counts = load(records, release, now, mark_sold=do_mark_sold)
+                    items_total, added = counts["items_total"], counts["added"]
+                    updated, marked_sold = counts["updated"], counts["marked_sold"]
+
+                    # Seuils avant publication (rejet = transaction annulée)
+                    release.items_total, release.items_added = items_total, added
+                    release.items_marked_sold, release.items_reactivated = marked_sold, counts["reactivated"]
+                    release.save()
+                    if not opts["force"]:
+                        catalog.check(release)
+
+                    # Log
+                    duration = time.monotonic() - start_ts
+                    FetchLog.objects.create(
+                        file_date=file_date,
+                        source_url=base_url,
+                        source_name=source_name,
+                        items_total=items_total,
+                        items_added=added,
+                        items_updated=updated,
+                        items_marked_sold=marked_sold,
+                        duration_seconds=duration,
                     )
-                    if created:
-                        obj.ensure_slug()
-                        obj.save(update_fields=["slug"])
-                        added += 1
-                    else:
-                        obj.prix = prix
-                        obj.adresse = adresse
-                        obj.nombre_pieces = n_pieces
-                        obj.nombre_chambres = n_chambres
-                        obj.nombre_sdb = n_sdb
-                        obj.superficie_habitable = None
-                        obj.superficie_terrain = None
-                        obj.annee_construction = annee
-                        obj.inclus = ""
-                        obj.description = descr
-                        obj.proximites_text = proximites_text
-                        obj.proximites = proximites_arr
-                        obj.caracteristiques_text = car_text
-                        obj.caracteristiques = car_arr
-                        obj.last_seen_at = now
-                        obj.status = Listing.STATUS_ACTIVE
-                        obj.sold_at = None
-                        obj.ensure_slug()
-                        obj.save()
-                        updated += 1
-
-                    # photos
-                    photos = extract_photos(by_pho.get(id_, []))
-                    if photos:
-                        ListingPhoto.objects.filter(listing=obj).delete()
-                        ListingPhoto.objects.bulk_create(
-                            [ListingPhoto(listing=obj, sequence=(i + 1), url=u) for i, (_, u) in enumerate(photos)]
-                        )
-
-                # Mark SOLD for missing
-                if do_mark_sold:
-                    sold_qs = Listing.objects.filter(status=Listing.STATUS_ACTIVE).exclude(centris_id__in=seen_ids)
-                    marked_sold = sold_qs.update(status=Listing.STATUS_SOLD, sold_at=now)
-
-                # Log
-                duration = time.monotonic() - start_ts
-                FetchLog.objects.create(
-                    file_date=file_date,
-                    source_url=base_url,
-                    source_name=source_name,
-                    items_total=items_total,
-                    items_added=added,
-                    items_updated=updated,
-                    items_marked_sold=marked_sold,
-                    duration_seconds=duration,
-                )
+                    catalog.publish(release)
+            except catalog.RejectedFeed as exc:
+                catalog.reject(release, str(exc))
+                raise CommandError(f"Import rejeté, version en ligne conservée: {exc} (--force pour publier)")
 
         self.stdout.write(self.style.SUCCESS(
             f"Import Centris OK: total={items_total} +{added} ~{updated} sold={marked_sold}"
         ))
+
+        # Recherches enregistrées: seulement les fiches de ce delta
+        if not opts["no_alerts"]:
+            stats = alerts.run(release)
+            self.stdout.write(f"Alertes: {stats['matches']} correspondances, {stats['jobs']} job(s) d'envoi")
+
+        if not opts["no_photos"]:
+            stats = process_pending(workers=max(1, opts["photo_workers"]))
+            self.stdout.write(f"Photos: {stats['processed']}/{stats['urls']} traitées ({stats['failed']} échecs)")
+
+        # Statistiques du planificateur et WAL replié dans la base
+        sqlite.maintain()
+
+        # Pages statiques: après les photos (srcset) et les statistiques
+        if settings.STATIC_EXPORT_ROOT and not opts["no_publish"]:
+            call_command("publish_static", stdout=self.stdout)
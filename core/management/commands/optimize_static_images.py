@@ -0,0 +1,70 @@
+# core/management/commands/optimize_static_images.py
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+MIN_GAIN = 0.05   # on ne remplace un fichier que s'il maigrit d'au moins 5 %
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompresse les JPG/PNG de STATICFILES_DIRS (métadonnées retirées, taille plafonnée) "
+        "et écrit une variante .webp à côté de chacun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-dimension", type=int, default=2400, help="Plus grand côté autorisé (px)")
+        parser.add_argument("--quality", type=int, default=82, help="Qualité JPEG")
+        parser.add_argument("--dry-run", action="store_true", help="Afficher les gains sans écrire")
+
+    def handle(self, *args, **opts):
+        total_before = total_after = 0
+        for root in settings.STATICFILES_DIRS:
+            for dirpath, _, filenames in os.walk(root):
+                for filename in sorted(filenames):
+                    if not filename.lower().endswith(EXTENSIONS):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    before, after = self.optimize(path, opts)
+                    total_before += before
+                    total_after += after
+                    self.stdout.write(f"{os.path.relpath(path, root)}: {before // 1024} Ko -> {after // 1024} Ko")
+        self.stdout.write(self.style.SUCCESS(
+            f"Total: {total_before // 1024} Ko -> {total_after // 1024} Ko"
+            + (" (dry-run)" if opts["dry_run"] else "")
+        ))
+
+    def optimize(self, path, opts):
+        before = os.path.getsize(path)
+        with Image.open(path) as src:
+            fmt = src.format
+            img = ImageOps.exif_transpose(src)
+            img.thumbnail((opts["max_dimension"], opts["max_dimension"]), Image.LANCZOS)
+            if fmt == "JPEG":
+                img = img.convert("RGB")
+                data = self.encode(img, "JPEG", quality=opts["quality"], optimize=True, progressive=True)
+            else:
+                data = self.encode(img, "PNG", optimize=True)
+            webp = self.encode(img, "WEBP", quality=opts["quality"], method=6)
+
+        after = len(data) if len(data) <= before * (1 - MIN_GAIN) else before
+        if opts["dry_run"]:
+            return before, after
+        if after < before:
+            with open(path, "wb") as f:
+                f.write(data)
+        # Variante .webp seulement si elle bat le fichier d'origine optimisé
+        if len(webp) < after:
+            with open(os.path.splitext(path)[0] + ".webp", "wb") as f:
+                f.write(webp)
+        return before, after
+
+    @staticmethod
+    def encode(img, fmt, **params):
+        buf = BytesIO()
+        img.save(buf, fmt, **params)
+        return buf.getvalue()
@@ -0,0 +1,18 @@
+# core/management/commands/process_photos.py
+from django.core.management.base import BaseCommand
+
+from core.photos import DEFAULT_WORKERS, process_pending
+
+
+class Command(BaseCommand):
+    help = "Télécharge les photos Centris sans dérivés et génère les versions WebP/AVIF locales."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Téléchargements en parallèle")
+        parser.add_argument("--limit", type=int, default=None, help="Nb max d'URL à traiter")
+
+    def handle(self, *args, **opts):
+        stats = process_pending(workers=max(1, opts["workers"]), limit=opts["limit"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Photos: {stats['processed']}/{stats['urls']} traitées ({stats['failed']} échecs, {stats['deferred']} en attente)"
+        ))
@@ -0,0 +1,27 @@
+# core/management/commands/publish_static.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.publish import PublishError, publish
+
+
+class Command(BaseCommand):
+    help = "Pré-rend les pages publiques (accueil, liste, fiches) vers STATIC_EXPORT_ROOT et bascule la version servie."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", default="", help="Lien symbolique de l'export (défaut: STATIC_EXPORT_ROOT)")
+        parser.add_argument("--workers", type=int, default=0, help="Rendus en parallèle (défaut: STATIC_EXPORT_WORKERS)")
+        parser.add_argument("--processes", action="store_true", help="Processus plutôt que threads (rendu CPU, GIL)")
+
+    def handle(self, *args, **opts):
+        root = opts["root"] or settings.STATIC_EXPORT_ROOT
+        if not root:
+            raise CommandError("STATIC_EXPORT_ROOT non configuré (ou --root)")
+        workers = max(1, opts["workers"] or settings.STATIC_EXPORT_WORKERS)
+        try:
+            stats = publish(root, workers=workers, processes=opts["processes"])
+        except PublishError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Export statique: {stats['pages']} pages, {stats['written']} réécrites -> {stats['release']}"
+        ))
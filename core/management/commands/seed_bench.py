@@ -0,0 +1,34 @@
+# core/management/commands/seed_bench.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import bench
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplace le catalogue synthétique de bench (inscriptions, photos, collaborateurs, prix) "
+        "dans la base courante. À utiliser sur une base dédiée: DB_NAME=bench.sqlite3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=2000, help="Nb d'inscriptions")
+        parser.add_argument("--photos", type=int, default=8, help="Nb de photos par inscription")
+        parser.add_argument("--agents", type=int, default=12, help="Nb de collaborateurs")
+        parser.add_argument("--certifications", type=int, default=10, help="Nb de prix/distinctions")
+        parser.add_argument("--clear", action="store_true", help="Supprimer les données de bench et s'arrêter")
+
+    def handle(self, *args, **opts):
+        t0 = time.perf_counter()
+        with transaction.atomic():
+            bench.clear()
+            if opts["clear"]:
+                self.stdout.write(self.style.SUCCESS("Données de bench supprimées."))
+                return
+            bench.seed(opts["listings"], opts["photos"], opts["agents"], opts["certifications"])
+        self.stdout.write(self.style.SUCCESS(
+            f"seed: {opts['listings']} listings × {opts['photos']} photos, {opts['agents']} collaborateurs, "
+            f"{opts['certifications']} prix en {time.perf_counter() - t0:.1f}s"
+        ))
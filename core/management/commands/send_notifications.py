@@ -0,0 +1,23 @@
+# core/management/commands/send_notifications.py
+from django.core.management.base import BaseCommand, CommandError
+
+from core.alerts import AlertError, deliver
+from core.notifications import DeliveryError, deliver_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les notifications de contact et les alertes de recherches en attente "
+        "(secours des jobs RQ, ex. cron toutes les 10 minutes)."
+    )
+
+    def handle(self, *args, **opts):
+        errors = []
+        for send in (deliver_pending, deliver):
+            try:
+                send()
+            except (AlertError, DeliveryError) as exc:
+                errors.append(str(exc))
+        if errors:
+            raise CommandError("; ".join(errors))
+        self.stdout.write(self.style.SUCCESS("Notifications envoyées"))
@@ -0,0 +1,42 @@
+# core/management/commands/undo_import.py
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog import CatalogError, live_release, rollback
+from core.models import CatalogRelease
+
+
+class Command(BaseCommand):
+    help = (
+        "Remet en ligne la version du catalogue d'avant le dernier import_centris (ou --to <version>): "
+        "prix, descriptions, statuts et photos reviennent ensemble, sans relancer l'import (core/catalog.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--to", type=int, help="Version (pk de CatalogRelease) à remettre en ligne; défaut: la précédente")
+        parser.add_argument("--list", action="store_true", help="Lister les versions qui ont encore leurs lignes")
+        parser.add_argument("--note", default="", help="Raison consignée sur la version retirée")
+        parser.add_argument("--no-publish", action="store_true", help="Ne pas régénérer l'export statique (STATIC_EXPORT_ROOT)")
+
+    def handle(self, *args, **opts):
+        if opts["list"]:
+            kept = CatalogRelease.objects.filter(
+                state__in=[CatalogRelease.STATE_LIVE, CatalogRelease.STATE_ROLLED_BACK]
+            ).order_by("-pk")
+            live = live_release()
+            for release in kept:
+                marker = " <- en ligne" if live and release.pk == live.pk else ""
+                self.stdout.write(f"#{release.pk} {release.created_at:%Y-%m-%d %H:%M} {release.source_name} "
+                                  f"({release.get_state_display()}, {release.items_total} fiches){marker}")
+            return
+        try:
+            previous, release, events = rollback(to=opts["to"], note=opts["note"])
+        except CatalogError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalogue #{release.pk} ({release.source_name}) remis en ligne à la place de #{previous.pk}: "
+            f"{events} fiches changées"
+        ))
+        if settings.STATIC_EXPORT_ROOT and not opts["no_publish"]:
+            call_command("publish_static", stdout=self.stdout)
@@ -0,0 +1,218 @@
+# core/metrics.py
+"""
+Métriques au format texte Prometheus, servies sur /metrics.
+
+Pas de dépendance externe: compteurs et histogrammes sont tenus en mémoire
+par chaque processus. En mode multiprocessus (gunicorn, plusieurs workers),
+PROMETHEUS_MULTIPROC_DIR pointe vers un dossier partagé: chaque worker y
+écrit son état dans `<pid>.json` (écriture atomique, au plus une fois par
+METRICS_FLUSH_SECONDS en fin de requête, et à la sortie) et /metrics
+additionne tous les fichiers: un scrape voit les autres workers avec ce
+retard au plus.
+Les compteurs des workers morts restent comptés (sémantique Prometheus:
+un compteur ne redescend pas); gunicorn.conf.py vide le dossier au
+démarrage du maître.
+
+Les métriques d'import sont lues dans le dernier FetchLog au moment du
+scrape (un FetchLog n'est écrit qu'à la fin d'un import réussi).
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from django.views.decorators.http import require_safe
+
+from .http import client_ip
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+FAMILIES = {
+    "http_request_duration_seconds": ("histogram", "Durée des requêtes HTTP par vue."),
+    "http_response_size_bytes": ("histogram", "Taille des réponses HTTP par vue (hors streaming)."),
+    "http_responses_total": ("counter", "Réponses HTTP par vue et classe de statut."),
+    "django_db_queries_per_request": ("histogram", "Requêtes SQL par requête HTTP, par vue."),
+    "django_db_query_duration_seconds_total": ("counter", "Temps SQL cumulé par vue."),
+    "cache_requests_total": ("counter", "Lectures de cache applicatif (hit/miss)."),
+    "centris_import_duration_seconds": ("gauge", "Durée du dernier import Centris réussi."),
+    "centris_import_items": ("gauge", "Inscriptions traitées par le dernier import, par type."),
+    "centris_import_last_success_timestamp_seconds": ("gauge", "Horodatage du dernier import réussi."),
+    "centris_import_age_seconds": ("gauge", "Âge du dernier import réussi."),
+}
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Registry:
+    def __init__(self, directory: str = "", pid: Optional[int] = None, flush_interval: float = 0.0):
+        self.directory = directory
+        self.pid = pid  # None: os.getpid() à chaque écriture (sûr après fork, gunicorn --preload)
+        self.flush_interval = flush_interval
+        self.flushed_at = float("-inf")
+        self.samples: Dict[Key, float] = {}
+        self.lock = threading.Lock()
+
+    # --- écriture -------------------------------------------------------
+    def inc(self, name: str, labels: Dict[str, str], value: float = 1.0) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float, buckets: Iterable[float]) -> None:
+        base = tuple(sorted(labels.items()))
+        with self.lock:
+            for bound in list(buckets) + ["+Inf"]:
+                if bound == "+Inf" or value <= bound:
+                    key = (f"{name}_bucket", tuple(sorted(base + (("le", _fmt(bound)),))))
+                    self.samples[key] = self.samples.get(key, 0.0) + 1
+            for suffix, inc in (("_sum", value), ("_count", 1)):
+                key = (name + suffix, base)
+                self.samples[key] = self.samples.get(key, 0.0) + inc
+
+    # --- multiprocessus ---------------------------------------------------
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"{self.pid or os.getpid()}.json")
+
+    def maybe_flush(self) -> None:
+        """flush() si le dernier date d'au moins flush_interval secondes."""
+        if self.directory and time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.directory:
+            return
+        with self.lock:
+            self.flushed_at = time.monotonic()
+            data = [[name, list(labels), value] for (name, labels), value in self.samples.items()]
+        tmp = f"{self._path()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path())
+
+    def collect(self) -> Dict[Key, float]:
+        """État agrégé: fichiers des autres processus + état en mémoire de celui-ci."""
+        merged: Dict[Key, float] = {}
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                if path == self._path():
+                    continue
+                try:
+                    with open(path) as f:
+                        rows = json.load(f)
+                except (OSError, ValueError):
+                    continue  # fichier en cours de remplacement: pris au prochain scrape
+                for name, labels, value in rows:
+                    key = (name, tuple(tuple(pair) for pair in labels))
+                    merged[key] = merged.get(key, 0.0) + value
+        with self.lock:
+            for key, value in self.samples.items():
+                merged[key] = merged.get(key, 0.0) + value
+        return merged
+
+
+def _fmt(value) -> str:
+    if isinstance(value, str):
+        return value
+    if float(value).is_integer():
+        return f"{value:.1f}" if isinstance(value, float) else str(value)
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _family(sample_name: str) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if sample_name.endswith(suffix) and sample_name[: -len(suffix)] in FAMILIES:
+            return sample_name[: -len(suffix)]
+    return sample_name
+
+
+def render(samples: Dict[Key, float]) -> str:
+    by_family: Dict[str, list] = {}
+    for (name, labels), value in samples.items():
+        by_family.setdefault(_family(name), []).append((name, labels, value))
+
+    lines = []
+    for family in sorted(by_family):
+        kind, help_text = FAMILIES.get(family, ("untyped", ""))
+        lines.append(f"# HELP {family} {help_text}")
+        lines.append(f"# TYPE {family} {kind}")
+        for name, labels, value in sorted(by_family[family], key=_sort_key):
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"{name}{{{label_str}}} {_fmt(value)}" if labels else f"{name} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _sort_key(sample):
+    name, labels, _ = sample
+    le = dict(labels).get("le")
+    others = tuple(pair for pair in labels if pair[0] != "le")
+    return name, others, float("inf") if le in (None, "+Inf") else float(le)
+
+
+registry = Registry(
+    getattr(settings, "PROMETHEUS_MULTIPROC_DIR", ""),
+    flush_interval=getattr(settings, "METRICS_FLUSH_SECONDS", 5),
+)
+atexit.register(registry.flush)
+
+
+# --- points d'enregistrement ----------------------------------------------
+def record_request(perf, response) -> None:
+    """Appelé par core.perf.PerfMiddleware avec les mesures de la requête."""
+    view = {"view": perf.url_name or "none"}
+    registry.observe("http_request_duration_seconds", view, perf.total_ms / 1000, LATENCY_BUCKETS)
+    registry.inc("http_responses_total", {**view, "status": f"{response.status_code // 100}xx"})
+    if not response.streaming:
+        registry.observe("http_response_size_bytes", view, len(response.content), SIZE_BUCKETS)
+    registry.observe("django_db_queries_per_request", view, perf.queries, QUERY_BUCKETS)
+    registry.inc("django_db_query_duration_seconds_total", view, perf.db_ms / 1000)
+    registry.maybe_flush()
+
+
+def record_cache(cache_name: str, hit: bool) -> None:
+    registry.inc("cache_requests_total", {"cache": cache_name, "result": "hit" if hit else "miss"})
+
+
+def import_samples(now=None) -> Dict[Key, float]:
+    from .models import FetchLog
+
+    last = FetchLog.objects.order_by("-pk").first()
+    if last is None:
+        return {}
+    now = now or timezone.now()
+    samples = {
+        ("centris_import_duration_seconds", ()): last.duration_seconds,
+        ("centris_import_last_success_timestamp_seconds", ()): last.created_at.timestamp(),
+        ("centris_import_age_seconds", ()): (now - last.created_at).total_seconds(),
+    }
+    for kind, value in (
+        ("total", last.items_total),
+        ("added", last.items_added),
+        ("updated", last.items_updated),
+        ("sold", last.items_marked_sold),
+    ):
+        samples[("centris_import_items", (("kind", kind),))] = value
+    return samples
+
+
+@require_safe
+def metrics_view(request):
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    if client_ip(request) not in allowed:
+        return HttpResponseForbidden()
+    samples = registry.collect()
+    samples.update(import_samples())
+    return HttpResponse(render(samples), content_type=CONTENT_TYPE)
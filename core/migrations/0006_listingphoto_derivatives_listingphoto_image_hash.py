@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_listing_geohash_listing_latitude_listing_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingphoto',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='listingphoto',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
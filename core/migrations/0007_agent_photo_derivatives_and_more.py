@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_listingphoto_derivatives_listingphoto_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='photo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='certification',
+            name='logo_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
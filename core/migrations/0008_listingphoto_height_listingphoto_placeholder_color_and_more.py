@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 21:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_agent_photo_derivatives_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingphoto',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingphoto',
+            name='placeholder_color',
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddField(
+            model_name='listingphoto',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_listingphoto_height_listingphoto_placeholder_color_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='crm_synced_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Transmis au CRM le'),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Courriel envoyé le'),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='notify_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="Tentatives d'envoi"),
+        ),
+    ]
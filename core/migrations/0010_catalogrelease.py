@@ -0,0 +1,48 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_contactmessage_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRelease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('source_name', models.CharField(blank=True, max_length=128)),
+                ('state', models.CharField(choices=[('LIVE', 'En ligne'), ('ROLLED_BACK', 'Annulée'), ('REJECTED', 'Rejetée')], default='LIVE', max_length=12)),
+                ('active_before', models.PositiveIntegerField(default=0)),
+                ('items_total', models.PositiveIntegerField(default=0)),
+                ('items_added', models.PositiveIntegerField(default=0)),
+                ('items_marked_sold', models.PositiveIntegerField(default=0)),
+                ('items_reactivated', models.PositiveIntegerField(default=0)),
+                ('note', models.TextField(blank=True)),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='prev_sold_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='prev_status',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='changed_in',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.catalogrelease'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-18 22:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_catalogrelease'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CREATED', 'Nouvelle'), ('UPDATED', 'Modifiée'), ('PHOTOS', 'Photos modifiées'), ('SOLD', 'Vendue'), ('REMOVED', 'Retirée')], max_length=8)),
+                ('prix_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('listing', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.listing')),
+                ('release', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.catalogrelease')),
+            ],
+            options={
+                'ordering': ['pk'],
+                'indexes': [models.Index(fields=['created_at'], name='core_listin_created_fcd02e_idx')],
+            },
+        ),
+    ]
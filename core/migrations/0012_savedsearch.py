@@ -0,0 +1,61 @@
+# Generated by Django 4.2.23 on 2026-10-18 23:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_listingchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Courriel')),
+                ('name', models.CharField(blank=True, max_length=100, verbose_name='Nom de la recherche')),
+                ('prix_min', models.PositiveIntegerField(blank=True, null=True)),
+                ('prix_max', models.PositiveIntegerField(blank=True, null=True)),
+                ('chambres_min', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('sdb_min', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('codes', models.JSONField(blank=True, default=list)),
+                ('texte', models.CharField(blank=True, max_length=200, verbose_name='Mots (adresse, description)')),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Recherche enregistrée',
+                'verbose_name_plural': 'Recherches enregistrées',
+            },
+        ),
+        migrations.CreateModel(
+            name='SavedSearchMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('NEW', 'Nouvelle fiche'), ('PRICE_DROP', 'Baisse de prix')], max_length=10)),
+                ('prix', models.PositiveIntegerField(blank=True, null=True)),
+                ('prix_before', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.listing')),
+                ('release', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.catalogrelease')),
+                ('search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='core.savedsearch')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='savedsearch',
+            index=models.Index(fields=['email'], name='core_saveds_email_eef648_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='savedsearchmatch',
+            index=models.Index(fields=['notified_at'], name='core_saveds_notifie_3ffcd2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='savedsearchmatch',
+            constraint=models.UniqueConstraint(fields=('search', 'listing', 'kind', 'prix'), name='savedsearchmatch_once'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_savedsearch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingphoto',
+            name='fetch_failures',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listingphoto',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
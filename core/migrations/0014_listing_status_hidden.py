@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_listingphoto_fetch_failures'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listing',
+            name='status',
+            field=models.CharField(choices=[('ACTIVE', 'Active'), ('SOLD', 'Sold'), ('HIDDEN', 'Hidden')], default='ACTIVE', max_length=10),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+def swap_inverted_ranges(apps, schema_editor):
+    # Bornes saisies à l'envers avant la contrainte: échangées
+    SavedSearch = apps.get_model("core", "SavedSearch")
+    SavedSearch.objects.filter(prix_min__gt=models.F("prix_max")).update(
+        prix_min=models.F("prix_max"), prix_max=models.F("prix_min"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_listing_status_hidden'),
+    ]
+
+    operations = [
+        migrations.RunPython(swap_inverted_ranges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='savedsearch',
+            constraint=models.CheckConstraint(check=models.Q(('prix_min__isnull', True), ('prix_max__isnull', True), ('prix_min__lte', models.F('prix_max')), _connector='OR'), name='savedsearch_prix_range'),
+        ),
+    ]
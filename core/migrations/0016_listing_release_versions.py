@@ -0,0 +1,199 @@
+# Fiches versionnées par import (core/catalog.py): une ligne par fiche et par
+# CatalogRelease, pointeur LiveCatalog vers la version en ligne.
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+LISTING_COLUMNS = (
+    "centris_id, slug, prix, adresse, nombre_pieces, nombre_chambres, nombre_sdb, superficie_habitable, "
+    "superficie_terrain, annee_construction, inclus, description, proximites_text, proximites, "
+    "caracteristiques_text, caracteristiques, latitude, longitude, geohash, status, sold_at, "
+    "first_seen_at, last_seen_at, updated_at"
+)
+PHOTO_COLUMNS = (
+    "sequence, url, image_hash, derivatives, width, height, placeholder_color, fetch_failures, retry_after"
+)
+
+
+def copy_match_listing(apps, schema_editor):
+    SavedSearchMatch = apps.get_model("core", "SavedSearchMatch")
+    SavedSearchMatch.objects.update(centris_id=models.F("listing_id"))
+
+
+def copy_to_versions(apps, schema_editor):
+    """Fiches en place -> lignes de la dernière version publiée (les masquées, jamais publiques, sont laissées)."""
+    CatalogRelease = apps.get_model("core", "CatalogRelease")
+    LiveCatalog = apps.get_model("core", "LiveCatalog")
+    Listing = apps.get_model("core", "Listing")
+    if not Listing.objects.exclude(status="HIDDEN").exists():
+        return
+    release = (
+        CatalogRelease.objects.filter(state="LIVE").order_by("-pk").first()
+        or CatalogRelease.objects.create(source_name="migration 0016")
+    )
+    photo_columns = ", ".join(f"p.{c.strip()}" for c in PHOTO_COLUMNS.split(","))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO core_listingversion (release_id, revision, {LISTING_COLUMNS}) "
+            f"SELECT %s, %s, {LISTING_COLUMNS} FROM core_listing WHERE status <> 'HIDDEN'",
+            [release.pk, release.pk],
+        )
+        cursor.execute(
+            f"INSERT INTO core_listingversionphoto (listing_id, {PHOTO_COLUMNS}) "
+            f"SELECT v.id, {photo_columns} FROM core_listingphoto p "
+            f"JOIN core_listingversion v ON v.centris_id = p.listing_id",
+        )
+    # Les autres versions n'ont pas de lignes: pas de retour possible vers elles
+    CatalogRelease.objects.exclude(pk=release.pk).exclude(state="REJECTED").update(state="PRUNED")
+    LiveCatalog.objects.create(pk=1, release=release)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_savedsearch_prix_range'),
+    ]
+
+    operations = [
+        # Correspondances d'alertes: ID Centris, valable pour toutes les versions
+        migrations.RemoveConstraint(
+            model_name='savedsearchmatch',
+            name='savedsearchmatch_once',
+        ),
+        migrations.AddField(
+            model_name='savedsearchmatch',
+            name='centris_id',
+            field=models.CharField(default='', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_match_listing, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='savedsearchmatch',
+            name='listing',
+        ),
+        migrations.RenameField(
+            model_name='savedsearchmatch',
+            old_name='centris_id',
+            new_name='listing_id',
+        ),
+        migrations.AddConstraint(
+            model_name='savedsearchmatch',
+            constraint=models.UniqueConstraint(fields=('search', 'listing_id', 'kind', 'prix'), name='savedsearchmatch_once'),
+        ),
+        # Journal: la colonne listing_id (sans contrainte, indexée) reste telle quelle
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RemoveField(
+                    model_name='listingchange',
+                    name='listing',
+                ),
+                migrations.AddField(
+                    model_name='listingchange',
+                    name='listing_id',
+                    field=models.CharField(db_index=True, max_length=20),
+                    preserve_default=False,
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='catalogrelease',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.catalogrelease'),
+        ),
+        migrations.AlterField(
+            model_name='catalogrelease',
+            name='state',
+            field=models.CharField(choices=[('LIVE', 'Publiée'), ('ROLLED_BACK', 'Annulée'), ('REJECTED', 'Rejetée'), ('PRUNED', 'Purgée')], default='LIVE', max_length=12),
+        ),
+        migrations.CreateModel(
+            name='LiveCatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('switched_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('release', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.catalogrelease')),
+            ],
+        ),
+        # Nouvelles tables sous un nom provisoire, remplies depuis les anciennes, puis renommées
+        migrations.CreateModel(
+            name='ListingVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('centris_id', models.CharField(max_length=20)),
+                ('slug', models.SlugField(db_index=False, max_length=64)),
+                ('prix', models.PositiveIntegerField(blank=True, null=True)),
+                ('adresse', models.CharField(blank=True, max_length=255)),
+                ('nombre_pieces', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('nombre_chambres', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('nombre_sdb', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('superficie_habitable', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('superficie_terrain', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('annee_construction', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('inclus', models.TextField(blank=True)),
+                ('description', models.TextField(blank=True)),
+                ('proximites_text', models.TextField(blank=True)),
+                ('proximites', models.JSONField(blank=True, default=list)),
+                ('caracteristiques_text', models.TextField(blank=True)),
+                ('caracteristiques', models.JSONField(blank=True, default=list)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('geohash', models.CharField(blank=True, max_length=12)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('SOLD', 'Sold')], default='ACTIVE', max_length=10)),
+                ('sold_at', models.DateTimeField(blank=True, null=True)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('first_seen_at', models.DateTimeField(auto_now_add=True)),
+                ('last_seen_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('release', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listings', to='core.catalogrelease')),
+            ],
+            options={
+                'ordering': ['-last_seen_at', '-first_seen_at'],
+                'indexes': [
+                    models.Index(fields=['release', 'status'], name='listing_release_status'),
+                    models.Index(fields=['release', '-last_seen_at'], name='listing_release_last_seen'),
+                    models.Index(fields=['release', 'geohash'], name='listing_release_geohash'),
+                    models.Index(fields=['centris_id'], name='listing_centris_id'),
+                    models.Index(fields=['-first_seen_at'], name='listing_first_seen'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('release', 'centris_id'), name='listing_release_centris_id'),
+                    models.UniqueConstraint(fields=('release', 'slug'), name='listing_release_slug'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='ListingVersionPhoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveIntegerField(default=1)),
+                ('url', models.CharField(max_length=500)),
+                ('image_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('derivatives', models.JSONField(blank=True, default=dict)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('placeholder_color', models.CharField(blank=True, max_length=7)),
+                ('fetch_failures', models.PositiveSmallIntegerField(default=0)),
+                ('retry_after', models.DateTimeField(blank=True, null=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photos', to='core.listingversion')),
+            ],
+            options={
+                'ordering': ['sequence'],
+                'unique_together': {('listing', 'sequence')},
+            },
+        ),
+        migrations.RunPython(copy_to_versions),
+        migrations.DeleteModel(
+            name='ListingPhoto',
+        ),
+        migrations.DeleteModel(
+            name='Listing',
+        ),
+        migrations.RenameModel(
+            old_name='ListingVersion',
+            new_name='Listing',
+        ),
+        migrations.RenameModel(
+            old_name='ListingVersionPhoto',
+            new_name='ListingPhoto',
+        ),
+    ]
@@ -1,9 +1,13 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from django.forms import ValidationError
 from django.db import models
 from django.utils.text import slugify
 from django.utils import timezone
 from django.shortcuts import render
+from datetime import timedelta
+
+from . import fragments, geo, images
 
 # Create your models here.
 class ContactMessage(models.Model):
@@ -12,6 +16,10 @@ class ContactMessage(models.Model):
     phone      = models.CharField("Téléphone", max_length=20, blank=True)
     message    = models.TextField("Message")
     created_at = models.DateTimeField("Reçu le", auto_now_add=True)
+    # Notifications envoyées hors requête (core/notifications.py)
+    emailed_at = models.DateTimeField("Courriel envoyé le", null=True, blank=True)
+    crm_synced_at = models.DateTimeField("Transmis au CRM le", null=True, blank=True)
+    notify_attempts = models.PositiveSmallIntegerField("Tentatives d'envoi", default=0)
 
     class Meta:
         verbose_name = "Message de contact"
@@ -27,7 +35,28 @@ class ContactMessage(models.Model):
     
 
 
+class ListingQuerySet(models.QuerySet):
+    SOLD_VISIBLE_DAYS = 3
+
+    def live(self):
+        """Lignes de la version en ligne (pointeur LiveCatalog): ce qu'une URL de détail ou le journal peut montrer."""
+        return self.filter(release_id=LiveCatalog.release_subquery())
+
+    def visible(self, now=None):
+        """Actives + vendues depuis ≤ 3 jours de la version en ligne (ce que le public voit)."""
+        cutoff = (now or timezone.now()) - timedelta(days=self.SOLD_VISIBLE_DAYS)
+        return self.live().filter(
+            models.Q(status=Listing.STATUS_ACTIVE) |
+            models.Q(status=Listing.STATUS_SOLD, sold_at__gte=cutoff)
+        )
+
+
 class Listing(models.Model):
+    """
+    Une fiche dans une version du catalogue (core/catalog.py): chaque import
+    écrit ses propres lignes (release), le public ne lit que celles de la
+    version en ligne (ListingQuerySet.live()).
+    """
     STATUS_ACTIVE = "ACTIVE"
     STATUS_SOLD = "SOLD"
     STATUS_CHOICES = [
@@ -35,9 +64,10 @@ class Listing(models.Model):
         (STATUS_SOLD, "Sold"),
     ]
 
-    # ID Centris comme clé primaire (string pour rester flexible)
-    centris_id = models.CharField(max_length=20, primary_key=True)
-    slug = models.SlugField(max_length=64, unique=True)
+    release = models.ForeignKey("CatalogRelease", on_delete=models.CASCADE, related_name="listings")
+    # ID Centris (string pour rester flexible), unique dans une version
+    centris_id = models.CharField(max_length=20)
+    slug = models.SlugField(max_length=64, db_index=False)
 
     prix = models.PositiveIntegerField(null=True, blank=True)
     adresse = models.CharField(max_length=255, blank=True)
@@ -62,19 +92,36 @@ class Listing(models.Model):
     caracteristiques_text = models.TextField(blank=True)
     caracteristiques = models.JSONField(default=list, blank=True)  # ex: [{"cat":"Allée","val":"Non pavé"}, ...]
 
+    # Coordonnées du flux + geohash (index spatial portable SQLite/PostgreSQL, voir core/geo.py)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True)
+
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
     sold_at = models.DateTimeField(null=True, blank=True)
 
+    # Version qui a écrit ce contenu (pk de CatalogRelease), recopiée telle quelle
+    # tant qu'un import ne le change pas: deux versions diffèrent là où elle diffère
+    revision = models.PositiveIntegerField(default=0)
+
     # Timestamps pour UI / historique
     first_seen_at = models.DateTimeField(auto_now_add=True)  # date de création en DB
     last_seen_at = models.DateTimeField(null=True, blank=True)  # timestamp du dernier fetch où l’inscription était présente
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ListingQuerySet.as_manager()
+
     class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["release", "centris_id"], name="listing_release_centris_id"),
+            models.UniqueConstraint(fields=["release", "slug"], name="listing_release_slug"),
+        ]
         indexes = [
-            models.Index(fields=["status"]),
-            models.Index(fields=["-last_seen_at"]),
-            models.Index(fields=["-first_seen_at"]),
+            models.Index(fields=["release", "status"], name="listing_release_status"),
+            models.Index(fields=["release", "-last_seen_at"], name="listing_release_last_seen"),
+            models.Index(fields=["release", "geohash"], name="listing_release_geohash"),
+            models.Index(fields=["centris_id"], name="listing_centris_id"),
+            models.Index(fields=["-first_seen_at"], name="listing_first_seen"),
         ]
         ordering = ["-last_seen_at", "-first_seen_at"]
 
@@ -85,12 +132,38 @@ class Listing(models.Model):
         if not self.slug:
             self.slug = slugify(f"listing-{self.centris_id}")[:64]
 
+    def set_coordinates(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+        if latitude is None or longitude is None:
+            self.geohash = ""
+        else:
+            self.geohash = geo.encode(latitude, longitude)
+
 
 class ListingPhoto(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name="photos")
     sequence = models.PositiveIntegerField(default=1)
     url = models.CharField(max_length=500)
 
+    # Dérivés locaux (core/photos.py): sha256 de l'original + largeurs générées par format
+    image_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    derivatives = models.JSONField(default=dict, blank=True)  # ex: {"webp": [320, 640, 1280]}
+
+    # Placeholder (couleur dominante + dimensions) affiché avant le chargement
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder_color = models.CharField(max_length=7, blank=True)  # "#a1b2c3"
+
+    # Téléchargements échoués (core/photos.py): pas de nouvel essai avant retry_after
+    fetch_failures = models.PositiveSmallIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+
+    # Champs calculés à reporter quand l'import recrée les photos d'une inscription
+    DERIVED_FIELDS = (
+        "image_hash", "derivatives", "width", "height", "placeholder_color", "fetch_failures", "retry_after",
+    )
+
     class Meta:
         unique_together = [("listing", "sequence")]
         ordering = ["sequence"]
@@ -98,6 +171,32 @@ class ListingPhoto(models.Model):
     def __str__(self):
         return f"{self.listing_id}#{self.sequence}"
 
+    @staticmethod
+    def derivative_name(digest, width, fmt):
+        return f"listings/{digest[:2]}/{digest[:32]}-{width}.{fmt}"
+
+    def srcset(self, fmt="webp"):
+        return ", ".join(
+            f"{default_storage.url(self.derivative_name(self.image_hash, w, fmt))} {w}w"
+            for w in self.derivatives.get(fmt, [])
+        )
+
+    @property
+    def srcset_webp(self):
+        return self.srcset("webp")
+
+    @property
+    def srcset_avif(self):
+        return self.srcset("avif")
+
+    @property
+    def display_url(self):
+        """Plus grand dérivé WebP local si disponible, sinon l'URL Centris."""
+        widths = self.derivatives.get("webp")
+        if self.image_hash and widths:
+            return default_storage.url(self.derivative_name(self.image_hash, max(widths), "webp"))
+        return self.url
+
 
 class FetchLog(models.Model):
     """Historique des imports pour audit/monitoring."""
@@ -118,6 +217,155 @@ class FetchLog(models.Model):
         return f"Fetch {self.created_at:%Y-%m-%d %H:%M} (total={self.items_total}, +{self.items_added}, ~{self.items_updated}, sold={self.items_marked_sold})"
     
 
+class CatalogRelease(models.Model):
+    """Version du catalogue produite par un import (core/catalog.py); ses fiches: `listings`."""
+    STATE_LIVE = "LIVE"                # publiée (en ligne, ou remplacée par un import suivant)
+    STATE_ROLLED_BACK = "ROLLED_BACK"  # retirée par une annulation; ses lignes restent, republiable
+    STATE_REJECTED = "REJECTED"        # jamais publiée, sans lignes
+    STATE_PRUNED = "PRUNED"            # lignes supprimées par la rétention (core/retention.py)
+    STATE_CHOICES = [
+        (STATE_LIVE, "Publiée"),
+        (STATE_ROLLED_BACK, "Annulée"),
+        (STATE_REJECTED, "Rejetée"),
+        (STATE_PRUNED, "Purgée"),
+    ]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    source_name = models.CharField(max_length=128, blank=True)
+    state = models.CharField(max_length=12, choices=STATE_CHOICES, default=STATE_LIVE)
+    # Version en ligne au moment de l'import, dont les lignes ont été recopiées
+    parent = models.ForeignKey("self", null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    active_before = models.PositiveIntegerField(default=0)     # fiches actives avant l'import
+    items_total = models.PositiveIntegerField(default=0)
+    items_added = models.PositiveIntegerField(default=0)
+    items_marked_sold = models.PositiveIntegerField(default=0)
+    items_reactivated = models.PositiveIntegerField(default=0)
+    note = models.TextField(blank=True)                          # raison du rejet / de l'annulation
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-pk"]
+
+    def __str__(self):
+        return f"Catalogue #{self.pk} {self.created_at:%Y-%m-%d %H:%M} ({self.get_state_display()})"
+
+
+class LiveCatalog(models.Model):
+    """
+    Pointeur unique (pk = PK) vers la version en ligne: publier ou annuler un
+    import, c'est mettre à jour cette ligne (core/catalog.py).
+    """
+    PK = 1
+
+    release = models.ForeignKey(CatalogRelease, null=True, on_delete=models.PROTECT, related_name="+")
+    switched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"En ligne: catalogue #{self.release_id}"
+
+    @classmethod
+    def release_subquery(cls):
+        return models.Subquery(cls.objects.filter(pk=cls.PK).values("release_id")[:1])
+
+
+class ListingChange(models.Model):
+    """
+    Journal des changements de fiches (GET /api/changes/?since=<curseur>,
+    core/changes.py). Le curseur est la clé primaire, croissante.
+    """
+    KIND_CREATED = "CREATED"
+    KIND_UPDATED = "UPDATED"      # contenu du flux ou statut (fiche revenue, version remise en ligne)
+    KIND_PHOTOS = "PHOTOS"
+    KIND_SOLD = "SOLD"
+    KIND_REMOVED = "REMOVED"      # fiche retirée (absente de la version remise en ligne, archivée)
+    KIND_CHOICES = [
+        (KIND_CREATED, "Nouvelle"),
+        (KIND_UPDATED, "Modifiée"),
+        (KIND_PHOTOS, "Photos modifiées"),
+        (KIND_SOLD, "Vendue"),
+        (KIND_REMOVED, "Retirée"),
+    ]
+
+    # ID Centris, pas de clé étrangère: l'événement vaut pour toutes les versions et survit à la fiche (REMOVED)
+    listing_id = models.CharField(max_length=20, db_index=True)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    release = models.ForeignKey(CatalogRelease, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    prix_before = models.PositiveIntegerField(null=True, blank=True)  # prix d'avant si le prix a changé
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["pk"]
+        indexes = [models.Index(fields=["created_at"])]
+
+    def __str__(self):
+        return f"#{self.pk} {self.listing_id} {self.kind}"
+
+
+class SavedSearch(models.Model):
+    """
+    Recherche enregistrée d'un client: alerte courriel quand une fiche qui
+    correspond apparaît ou baisse de prix (core/alerts.py). Critère vide =
+    pas de contrainte; tous les critères remplis doivent correspondre.
+    """
+    email = models.EmailField("Courriel")
+    name = models.CharField("Nom de la recherche", max_length=100, blank=True)
+    prix_min = models.PositiveIntegerField(null=True, blank=True)
+    prix_max = models.PositiveIntegerField(null=True, blank=True)
+    chambres_min = models.PositiveSmallIntegerField(null=True, blank=True)
+    sdb_min = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Codes Centris "CAT:VAL" exigés, ex. ["PROX:PRIM", "SYEG:EGMU"] (caractéristiques et proximités)
+    codes = models.JSONField(default=list, blank=True)
+    texte = models.CharField("Mots (adresse, description)", max_length=200, blank=True)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Recherche enregistrée"
+        verbose_name_plural = "Recherches enregistrées"
+        indexes = [models.Index(fields=["email"])]
+        constraints = [
+            models.CheckConstraint(
+                check=(
+                    models.Q(prix_min__isnull=True) | models.Q(prix_max__isnull=True)
+                    | models.Q(prix_min__lte=models.F("prix_max"))
+                ),
+                name="savedsearch_prix_range",
+            ),
+        ]
+
+    def clean(self):
+        if self.prix_min is not None and self.prix_max is not None and self.prix_min > self.prix_max:
+            raise ValidationError({"prix_max": "Le prix maximum doit être supérieur ou égal au prix minimum."})
+
+    def __str__(self):
+        return f"{self.email} — {self.name or self.pk}"
+
+
+class SavedSearchMatch(models.Model):
+    """Fiche trouvée pour une recherche; envoyée par lot (notified_at), une seule fois par prix."""
+    KIND_NEW = "NEW"
+    KIND_PRICE_DROP = "PRICE_DROP"
+    KIND_CHOICES = [
+        (KIND_NEW, "Nouvelle fiche"),
+        (KIND_PRICE_DROP, "Baisse de prix"),
+    ]
+
+    search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name="matches")
+    listing_id = models.CharField(max_length=20)  # ID Centris (une fiche existe dans plusieurs versions)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    prix = models.PositiveIntegerField(null=True, blank=True)
+    prix_before = models.PositiveIntegerField(null=True, blank=True)
+    release = models.ForeignKey(CatalogRelease, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    created_at = models.DateTimeField(default=timezone.now)
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["search", "listing_id", "kind", "prix"], name="savedsearchmatch_once"),
+        ]
+        indexes = [models.Index(fields=["notified_at"])]
+
+
 class Certification(models.Model):
     """
     Prix / distinctions affichés dans le carrousel.
@@ -125,6 +373,8 @@ class Certification(models.Model):
     """
     name = models.CharField(max_length=200)
     logo = models.ImageField(upload_to="certifications/")
+    # Dérivés WebP/AVIF générés à l'enregistrement, à côté de l'original (core/images.py)
+    logo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     # Optionnel mais utile pour tri manuel dans l’UI (0 = en premier)
     order = models.PositiveIntegerField(default=0, db_index=True)
@@ -138,7 +388,35 @@ class Certification(models.Model):
 
     def __str__(self) -> str:
         return self.name
-    
+
+    LOGO_WIDTHS = (120, 240)   # carrousel: 120px, ×2 pour écrans haute densité
+
+    def save(self, *args, **kwargs):
+        fresh = bool(self.logo) and not self.logo._committed
+        cleared = not self.logo and bool(self.logo_derivatives)
+        # Dérivés de l'ancien fichier (remplacé ou retiré): supprimés après l'enregistrement
+        previous = images.stored_derivatives(self, "logo", "logo_derivatives") if fresh or cleared else None
+        super().save(*args, **kwargs)
+        if previous and previous[0] and previous[1]:
+            images.delete_sibling_derivatives(self.logo.storage, previous[0], previous[1])
+        if fresh or cleared:
+            self.refresh_derivatives()
+
+    def refresh_derivatives(self, force=False):
+        self.logo_derivatives = (
+            images.build_sibling_derivatives(self.logo, self.LOGO_WIDTHS, force=force) if self.logo else {}
+        )
+        Certification.objects.filter(pk=self.pk).update(logo_derivatives=self.logo_derivatives)
+        fragments.bump_version()  # les URL des dérivés apparaissent dans des fragments en cache
+
+    @property
+    def logo_src(self):
+        return images.sibling_url(self.logo, self.logo_derivatives, min_width=240)
+
+    @property
+    def logo_thumb(self):
+        return images.sibling_url(self.logo, self.logo_derivatives)
+
 class Agent(models.Model):
     """
     Collaborateur/courtier affiché sur la page 'collaborateurs'.
@@ -148,6 +426,7 @@ class Agent(models.Model):
     phone = models.CharField(max_length=30, blank=True)
     email = models.EmailField(blank=True)
     photo = models.ImageField(upload_to="agents/", blank=True, null=True)
+    photo_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     bio_short = models.TextField(blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
@@ -162,4 +441,40 @@ class Agent(models.Model):
         verbose_name_plural = "Agents / Collaborateurs"
 
     def __str__(self) -> str:
-        return self.name
\ No newline at end of file
+        return self.name
+
+    PHOTO_WIDTHS = (96, 256, 512)   # aperçu admin 72px, portrait 192–256px (×2)
+
+    def save(self, *args, **kwargs):
+        fresh = bool(self.photo) and not self.photo._committed
+        cleared = not self.photo and bool(self.photo_derivatives)
+        # Dérivés de l'ancien fichier (remplacé ou retiré): supprimés après l'enregistrement
+        previous = images.stored_derivatives(self, "photo", "photo_derivatives") if fresh or cleared else None
+        super().save(*args, **kwargs)
+        if previous and previous[0] and previous[1]:
+            images.delete_sibling_derivatives(self.photo.storage, previous[0], previous[1])
+        if fresh or cleared:
+            self.refresh_derivatives()
+
+    def refresh_derivatives(self, force=False):
+        self.photo_derivatives = (
+            images.build_sibling_derivatives(self.photo, self.PHOTO_WIDTHS, force=force) if self.photo else {}
+        )
+        Agent.objects.filter(pk=self.pk).update(photo_derivatives=self.photo_derivatives)
+        fragments.bump_version()  # les URL des dérivés apparaissent dans des fragments en cache
+
+    @property
+    def photo_src(self):
+        return images.sibling_url(self.photo, self.photo_derivatives, min_width=256)
+
+    @property
+    def photo_thumb(self):
+        return images.sibling_url(self.photo, self.photo_derivatives)
+
+    @property
+    def photo_srcset(self):
+        return images.sibling_srcset(self.photo, self.photo_derivatives, "webp")
+
+    @property
+    def photo_srcset_avif(self):
+        return images.sibling_srcset(self.photo, self.photo_derivatives, "avif")
@@ -0,0 +1,127 @@
+# core/notifications.py
+"""
+Notifications des formulaires de contact, hors requête.
+
+Le POST enregistre le ContactMessage puis appelle `schedule()`: au plus un
+job par fenêtre de NOTIFY_BATCH_SECONDS est planifié sur la file RQ
+"default" (worker: `manage.py rqworker default --with-scheduler`). Le job
+`deliver_pending()` envoie tout ce qui s'est accumulé:
+
+- un courriel par message à CONTACT_NOTIFY_EMAILS, sur une seule
+  connexion SMTP (Reply-To = le client);
+- un seul POST JSON de tous les messages vers CRM_WEBHOOK_URL.
+
+Chaque étape a son horodatage (emailed_at, crm_synced_at): une reprise
+(RQ Retry) ne renvoie pas ce qui est déjà parti. Redis indisponible:
+rien n'est perdu, `manage.py send_notifications` (cron) vide la file
+d'attente en base.
+"""
+import logging
+from datetime import timedelta
+
+import django_rq
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rq import Retry
+
+from .models import ContactMessage
+
+logger = logging.getLogger("core.notifications")
+
+SCHEDULED_KEY = "notifications:scheduled"
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 8                      # au-delà, le message est laissé de côté (journalisé)
+RETRY_INTERVALS = [30, 120, 600, 1800, 3600]
+
+
+class DeliveryError(Exception):
+    pass
+
+
+def schedule():
+    """Planifie un envoi groupé; les POST suivants de la même fenêtre n'ajoutent rien."""
+    window = getattr(settings, "NOTIFY_BATCH_SECONDS", 30)
+    if not cache.add(SCHEDULED_KEY, 1, window):
+        return
+    try:
+        django_rq.get_queue("default").enqueue_in(
+            timedelta(seconds=window), deliver_pending,
+            retry=Retry(max=len(RETRY_INTERVALS), interval=RETRY_INTERVALS),
+        )
+    except RedisError as exc:
+        # La clé reste posée: une seule tentative Redis par fenêtre
+        logger.warning("file RQ indisponible (%s): notifications en attente en base", exc)
+
+
+def pending(field):
+    return ContactMessage.objects.filter(**{f"{field}__isnull": True}, notify_attempts__lt=MAX_ATTEMPTS)
+
+
+def deliver_pending():
+    """Job RQ: envoie courriels et CRM en attente; lève DeliveryError pour être repris."""
+    errors = []
+    recipients = getattr(settings, "CONTACT_NOTIFY_EMAILS", [])
+    if recipients:
+        errors += send_emails(list(pending("emailed_at").order_by("pk")[:BATCH_SIZE]), recipients)
+    if getattr(settings, "CRM_WEBHOOK_URL", ""):
+        errors += sync_crm(list(pending("crm_synced_at").order_by("pk")[:BATCH_SIZE]))
+    if errors:
+        raise DeliveryError("; ".join(errors))
+
+
+def _failed(messages):
+    ContactMessage.objects.filter(pk__in=[m.pk for m in messages]).update(notify_attempts=F("notify_attempts") + 1)
+    for m in messages:
+        if m.notify_attempts + 1 >= MAX_ATTEMPTS:
+            logger.error("message de contact %s abandonné après %d tentatives", m.pk, MAX_ATTEMPTS)
+
+
+def send_emails(messages, recipients):
+    if not messages:
+        return []
+    sent, failed = [], []
+    with get_connection() as connection:
+        for m in messages:
+            email = EmailMessage(
+                subject=f"Nouveau message de {m.name}",
+                body=f"{m.message}\n\n{m.name}\n{m.email}\n{m.phone}\nReçu le {timezone.localtime(m.created_at):%Y-%m-%d %H:%M}",
+                to=recipients,
+                reply_to=[m.email] if m.email else None,
+                connection=connection,
+            )
+            try:
+                email.send()
+            except Exception as exc:  # SMTP: une adresse refusée ne bloque pas le lot
+                logger.warning("courriel du message %s non envoyé: %s", m.pk, exc)
+                failed.append(m)
+            else:
+                sent.append(m.pk)
+    ContactMessage.objects.filter(pk__in=sent).update(emailed_at=timezone.now())
+    if failed:
+        _failed(failed)
+        return [f"{len(failed)} courriel(s) en échec"]
+    return []
+
+
+def sync_crm(messages):
+    if not messages:
+        return []
+    payload = [
+        {
+            "id": m.pk, "name": m.name, "email": m.email, "phone": m.phone,
+            "message": m.message, "created_at": m.created_at.isoformat(),
+        }
+        for m in messages
+    ]
+    try:
+        requests.post(settings.CRM_WEBHOOK_URL, json={"contacts": payload}, timeout=15).raise_for_status()
+    except requests.RequestException as exc:
+        _failed(messages)
+        return [f"CRM: {exc}"]
+    ContactMessage.objects.filter(pk__in=[m.pk for m in messages]).update(crm_synced_at=timezone.now())
+    return []
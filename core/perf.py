@@ -0,0 +1,207 @@
+# core/perf.py
+"""
+Instrumentation par requête: nombre/temps des requêtes SQL, temps de rendu
+des gabarits et temps de la vue.
+
+- PerfMiddleware attache un RequestMetrics à `request.perf`, ajoute l'en-tête
+  Server-Timing (visible dans l'onglet Réseau du navigateur) et journalise
+  les requêtes plus lentes que settings.SLOW_REQUEST_MS sur le logger
+  "core.perf".
+- Les budgets de requêtes SQL par nom d'URL sont déclarés dans
+  core/urls.py (QUERY_BUDGETS); un dépassement est journalisé ici et fait
+  échouer les tests via QueryBudgetMixin.
+
+Le middleware est sync et async: sous ASGI, __acall__ et process_view sont
+des coroutines, et les vues `async def` sont appelées sans passer par un
+thread (pas de repli synchrone).
+
+Limite: pour une StreamingHttpResponse, le SQL exécuté pendant l'itération
+du contenu (après le retour du middleware) n'est pas compté.
+"""
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template as DjangoTemplate
+
+from . import metrics as prom
+
+logger = logging.getLogger("core.perf")
+
+_current = contextvars.ContextVar("core_perf_metrics", default=None)
+
+
+@dataclass
+class RequestMetrics:
+    queries: int = 0
+    db_ms: float = 0.0
+    template_ms: float = 0.0
+    view_ms: float = 0.0
+    total_ms: float = 0.0
+    url_name: str = ""
+    _template_depth: int = 0
+    _view_start: float = 0.0
+
+    def server_timing(self) -> str:
+        return ", ".join([
+            f'db;dur={self.db_ms:.1f};desc="{self.queries} SQL"',
+            f"tpl;dur={self.template_ms:.1f}",
+            f"view;dur={self.view_ms:.1f}",
+            f"total;dur={self.total_ms:.1f}",
+        ])
+
+
+def _query_timer(execute, sql, params, many, context):
+    # Lit les mesures de la requête dans le contexte courant plutôt que de
+    # les capturer: sous ASGI, des requêtes concurrentes partagent le thread
+    # (et donc la connexion) des vues synchrones.
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - t0) * 1000
+
+
+def _add_query_timer(sender=None, connection=None, **kwargs):
+    if _query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_query_timer)
+
+
+def install_query_timer():
+    """
+    Une fois par connexion: celles déjà ouvertes dans ce thread, et toutes
+    celles ouvertes ensuite (threads de sync_to_async compris).
+    """
+    connection_created.connect(_add_query_timer, dispatch_uid="core.perf.query_timer")
+    for alias in connections:
+        _add_query_timer(connection=connections[alias])
+
+
+def install_template_timer():
+    """
+    Chronomètre Template.render du backend Django (appelé par render() /
+    render_to_string). Les {% include %} passent par le moteur, pas par
+    ce point d'entrée: seul le rendu de plus haut niveau est additionné.
+    """
+    if getattr(DjangoTemplate.render, "_perf_wrapped", False):
+        return
+    original = DjangoTemplate.render
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self, context, request)
+        metrics._template_depth += 1
+        t0 = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            metrics._template_depth -= 1
+            if not metrics._template_depth:
+                metrics.template_ms += (time.perf_counter() - t0) * 1000
+
+    render._perf_wrapped = True
+    DjangoTemplate.render = render
+
+
+def query_budget(url_name):
+    from .urls import QUERY_BUDGETS
+    return QUERY_BUDGETS.get(url_name)
+
+
+class PerfMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # Django adapte process_view à la chaîne: une méthode sync serait
+            # passée à sync_to_async (thread) à chaque requête ASGI
+            self.process_view = self.aprocess_view
+        install_query_timer()
+        install_template_timer()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics, token, t0 = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, t0)
+
+    async def __acall__(self, request):
+        metrics, token, t0 = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, t0)
+
+    def start(self, request):
+        for alias in connections:
+            _add_query_timer(connection=connections[alias])  # connexion de ce thread
+        metrics = request.perf = RequestMetrics()
+        return metrics, _current.set(metrics), time.perf_counter()
+
+    def finish(self, request, response, metrics, t0):
+        end = time.perf_counter()
+        metrics.total_ms = (end - t0) * 1000
+        if metrics._view_start:
+            metrics.view_ms = (end - metrics._view_start) * 1000
+        if request.resolver_match:
+            metrics.url_name = request.resolver_match.url_name or ""
+
+        response["Server-Timing"] = metrics.server_timing()
+        self.report(request, metrics)
+        prom.record_request(metrics, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Chronomètre de la vue: de la résolution d'URL jusqu'au retour de la
+        # réponse (post-traitement des middlewares internes compris).
+        request.perf._view_start = time.perf_counter()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        request.perf._view_start = time.perf_counter()
+
+    def report(self, request, metrics):
+        budget = query_budget(metrics.url_name)
+        if budget is not None and metrics.queries > budget:
+            logger.warning(
+                "budget SQL dépassé pour %s: %d requêtes (budget %d)",
+                metrics.url_name, metrics.queries, budget,
+            )
+        if metrics.total_ms >= getattr(settings, "SLOW_REQUEST_MS", 500):
+            logger.warning(
+                "requête lente %s %s (%s): %.0fms, %d SQL (%.0fms), gabarits %.0fms",
+                request.method, request.get_full_path(), metrics.url_name or "-",
+                metrics.total_ms, metrics.queries, metrics.db_ms, metrics.template_ms,
+            )
+
+
+class QueryBudgetMixin:
+    """Pour TestCase: self.assertWithinQueryBudget(self.client.get(url))."""
+
+    def assertWithinQueryBudget(self, response):
+        request = getattr(response, "wsgi_request", None) or response.asgi_request  # Client / AsyncClient
+        metrics = request.perf
+        budget = query_budget(metrics.url_name)
+        self.assertIsNotNone(budget, f"aucun budget SQL déclaré pour {metrics.url_name!r} (core/urls.py)")
+        self.assertLessEqual(
+            metrics.queries, budget,
+            f"{metrics.url_name}: {metrics.queries} requêtes SQL pour un budget de {budget}",
+        )
@@ -0,0 +1,285 @@
+# core/pgload.py
+"""
+Chargement Centris rapide pour PostgreSQL (import_centris, DB_ENGINE postgres).
+
+Les fiches sont envoyées par COPY FROM STDIN au fil de l'analyse (une
+ligne par fiche, URL des photos en JSON; rien n'est gardé en mémoire
+côté Python) dans une table de transit UNLOGGED (pas de WAL, vidée à
+chaque import). En SQL, DISTINCT ON garde la dernière occurrence de
+chaque ID (comme l'ORM) et déplie les photos, puis la fusion se fait en
+quelques requêtes ensemblistes, dans la transaction de l'import, sur les
+seules lignes de la version en construction (copie de la version en
+ligne, core/catalog.py):
+
+1. journal des changements (core/changes.py): CREATED pour les nouvelles
+   fiches, UPDATED si le contenu diffère ou si la fiche revient;
+2. INSERT … ON CONFLICT (release_id, centris_id) DO UPDATE de toutes les
+   fiches (`revision` = cette version si le contenu change);
+3. photos: seules les fiches dont la liste d'URL change sont réécrites
+   (DELETE puis INSERT), les dérivés déjà calculés suivent leur URL (PHOTOS);
+4. fiches absentes du flux marquées SOLD (SOLD).
+
+Même résultat que `orm_load()` (import_centris.py), qui reste le chemin des
+autres moteurs (SQLite). IMPORT_PG_COPY=False force ce chemin générique.
+Mesure: `manage.py bench_import --listings 100000`.
+"""
+import io
+import json
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.db import connection
+
+from . import geo
+from .models import Listing, ListingPhoto
+
+FEED_STAGE = "core_listing_feed"            # lignes du flux, dans l'ordre (doublons compris)
+LISTING_STAGE = "core_listing_stage"        # une ligne par ID: la dernière du flux
+PHOTO_STAGE = "core_listingphoto_stage"
+# Colonnes de Listing fournies par le flux (Record.fields + coordonnées)
+FEED_FIELDS = (
+    "prix", "adresse", "nombre_pieces", "nombre_chambres", "nombre_sdb", "annee_construction",
+    "description", "proximites_text", "proximites", "caracteristiques_text", "caracteristiques",
+    "latitude", "longitude", "geohash",
+)
+JSON_FIELDS = {"proximites", "caracteristiques"}
+COPY_CHUNK = 10000  # lignes par COPY (psycopg2: tampon en mémoire, borné)
+
+
+def supported() -> bool:
+    return connection.vendor == "postgresql" and getattr(settings, "IMPORT_PG_COPY", True)
+
+
+def _column(model, name):
+    field = model._meta.get_field(name)
+    return field.column, field.db_type(connection)
+
+
+def _create_stages(cursor):
+    q = connection.ops.quote_name
+    listing_cols = (
+        [_column(Listing, "centris_id")] + [_column(Listing, f) for f in FEED_FIELDS] + [("photos", "jsonb")]
+    )
+    photo_cols = [("centris_id", _column(Listing, "centris_id")[1]), _column(ListingPhoto, "sequence"),
+                  _column(ListingPhoto, "url")]
+    stages = (
+        (FEED_STAGE, [("seq", "bigint")] + listing_cols),
+        (LISTING_STAGE, listing_cols),
+        (PHOTO_STAGE, photo_cols),
+    )
+    for table, cols in stages:
+        # Recréées à chaque import: leurs colonnes suivent le modèle
+        columns = ", ".join(f"{q(name)} {db_type}" for name, db_type in cols)
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {table} ({columns})")
+
+
+def _copy(cursor, table, columns, rows):
+    """COPY FROM STDIN: psycopg 3 (write_row) ou psycopg2 (copy_expert, par lots)."""
+    raw = cursor.cursor
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    if hasattr(raw, "copy"):
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+        return
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= COPY_CHUNK:
+            _copy_text(raw, sql, chunk)
+            chunk = []
+    if chunk:
+        _copy_text(raw, sql, chunk)
+
+
+TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text(raw, sql, rows):
+    """Format texte de COPY: tabulations, \\N = NULL, antislash et fins de ligne échappés."""
+    buf = io.StringIO()
+    for row in rows:
+        buf.write("\t".join("\\N" if v is None else str(v).translate(TEXT_ESCAPES) for v in row))
+        buf.write("\n")
+    buf.seek(0)
+    raw.copy_expert(sql, buf)
+
+
+def _stage_rows(records):
+    """Une ligne de FEED_STAGE par fiche, produite au fil de l'analyse (seq = rang dans le flux)."""
+    for seq, rec in enumerate(records):
+        lat, lon = rec.latitude, rec.longitude
+        values = {
+            **rec.fields,
+            "latitude": lat, "longitude": lon,
+            "geohash": geo.encode(lat, lon) if lat is not None and lon is not None else "",
+        }
+        yield [seq, rec.centris_id] + [
+            json.dumps(values[f], ensure_ascii=False) if f in JSON_FIELDS else values[f] for f in FEED_FIELDS
+        ] + [json.dumps([url for _, url in rec.photos], ensure_ascii=False)]
+
+
+MERGE_SQL = {
+    # Dernière occurrence de chaque ID (comme orm_load(), qui les applique dans l'ordre)
+    "stage_latest": """
+        INSERT INTO {listing_stage} (centris_id, {feed}, photos)
+        SELECT DISTINCT ON (centris_id) centris_id, {feed}, photos
+        FROM {feed_stage}
+        ORDER BY centris_id, seq DESC
+    """,
+    # Liste vide: photos en base inchangées (orm_load: `if rec.photos`)
+    "stage_photos": """
+        INSERT INTO {photo_stage} (centris_id, sequence, url)
+        SELECT s.centris_id, p.sequence, p.url
+        FROM {listing_stage} s
+        CROSS JOIN LATERAL jsonb_array_elements_text(s.photos) WITH ORDINALITY AS p(url, sequence)
+    """,
+    "changes_created": """
+        INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+        SELECT s.centris_id, 'CREATED', %(release)s, NULL, %(now)s
+        FROM {listing_stage} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_listing l WHERE l.release_id = %(release)s AND l.centris_id = s.centris_id
+        )
+    """,
+    # Même comparaison que orm_load(): colonnes du flux, ou fiche revenue
+    "changes_updated": """
+        INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+        SELECT l.centris_id, 'UPDATED', %(release)s,
+               CASE WHEN l.prix IS DISTINCT FROM s.prix THEN l.prix END, %(now)s
+        FROM core_listing l JOIN {listing_stage} s ON s.centris_id = l.centris_id
+        WHERE l.release_id = %(release)s AND (l.status <> 'ACTIVE' OR ({feed_l}) IS DISTINCT FROM ({feed_s}))
+    """,
+    "reactivated": """
+        SELECT count(*)
+        FROM core_listing l JOIN {listing_stage} s ON s.centris_id = l.centris_id
+        WHERE l.release_id = %(release)s AND l.status <> 'ACTIVE'
+    """,
+    "upsert": """
+        WITH up AS (
+            INSERT INTO core_listing AS l (
+                release_id, centris_id, slug, {feed}, superficie_habitable, superficie_terrain, inclus,
+                status, sold_at, revision, first_seen_at, last_seen_at, updated_at
+            )
+            SELECT %(release)s, centris_id, 'listing-' || centris_id, {feed}, NULL, NULL, '',
+                   'ACTIVE', NULL, %(release)s, %(now)s, %(now)s, %(now)s
+            FROM {listing_stage}
+            ON CONFLICT (release_id, centris_id) DO UPDATE SET
+                {feed_update}, superficie_habitable = NULL, superficie_terrain = NULL, inclus = '',
+                status = 'ACTIVE', sold_at = NULL, last_seen_at = EXCLUDED.last_seen_at,
+                updated_at = EXCLUDED.updated_at,
+                revision = CASE WHEN l.status <> 'ACTIVE' OR ({feed_l}) IS DISTINCT FROM ({feed_excluded})
+                                THEN EXCLUDED.revision ELSE l.revision END
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM up
+    """,
+    "photos_cleanup": """
+        DROP TABLE IF EXISTS pg_temp.core_listingphoto_changed, pg_temp.core_listingphoto_known
+    """,
+    # Fiches dont la liste d'URL (dans l'ordre) diffère de celle de la version
+    "photos_changed": """
+        CREATE TEMP TABLE core_listingphoto_changed AS
+        SELECT f.centris_id, l.id AS listing_id
+        FROM (SELECT centris_id, array_agg(url ORDER BY sequence) AS urls
+              FROM {photo_stage} GROUP BY centris_id) f
+        JOIN core_listing l ON l.release_id = %(release)s AND l.centris_id = f.centris_id
+        LEFT JOIN (SELECT p.listing_id, array_agg(p.url ORDER BY p.sequence) AS urls
+                   FROM core_listingphoto p
+                   JOIN core_listing v ON v.id = p.listing_id
+                   WHERE v.release_id = %(release)s AND v.centris_id IN (SELECT centris_id FROM {photo_stage})
+                   GROUP BY p.listing_id) c ON c.listing_id = l.id
+        WHERE c.urls IS DISTINCT FROM f.urls
+    """,
+    "photos_known": """
+        CREATE TEMP TABLE core_listingphoto_known AS
+        SELECT DISTINCT ON (p.listing_id, p.url)
+               p.listing_id, p.url, p.image_hash, p.derivatives, p.width, p.height, p.placeholder_color,
+               p.fetch_failures, p.retry_after
+        FROM core_listingphoto p JOIN core_listingphoto_changed c ON c.listing_id = p.listing_id
+    """,
+    "changes_photos": """
+        INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+        SELECT c.centris_id, 'PHOTOS', %(release)s, NULL, %(now)s
+        FROM core_listingphoto_changed c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_listingchange e
+            WHERE e.listing_id = c.centris_id AND e.release_id = %(release)s AND e.kind = 'CREATED'
+        )
+    """,
+    "photos_revision": """
+        UPDATE core_listing l SET revision = %(release)s
+        FROM core_listingphoto_changed c WHERE l.id = c.listing_id
+    """,
+    "photos_delete": """
+        DELETE FROM core_listingphoto p USING core_listingphoto_changed c WHERE p.listing_id = c.listing_id
+    """,
+    "photos_insert": """
+        INSERT INTO core_listingphoto
+            (listing_id, sequence, url, image_hash, derivatives, width, height, placeholder_color,
+             fetch_failures, retry_after)
+        SELECT c.listing_id, s.sequence, s.url, COALESCE(k.image_hash, ''), COALESCE(k.derivatives, '{{}}'),
+               k.width, k.height, COALESCE(k.placeholder_color, ''), COALESCE(k.fetch_failures, 0), k.retry_after
+        FROM {photo_stage} s
+        JOIN core_listingphoto_changed c ON c.centris_id = s.centris_id
+        LEFT JOIN core_listingphoto_known k ON k.listing_id = c.listing_id AND k.url = s.url
+    """,
+    "mark_sold": """
+        WITH sold AS (
+            UPDATE core_listing l
+            SET status = 'SOLD', sold_at = %(now)s, revision = %(release)s
+            WHERE l.release_id = %(release)s AND l.status = 'ACTIVE'
+              AND NOT EXISTS (SELECT 1 FROM {listing_stage} s WHERE s.centris_id = l.centris_id)
+            RETURNING l.centris_id
+        )
+        INSERT INTO core_listingchange (listing_id, kind, release_id, prix_before, created_at)
+        SELECT centris_id, 'SOLD', %(release)s, NULL, %(now)s FROM sold
+    """,
+}
+
+
+def load(records: Iterable, release, now, mark_sold: bool = True) -> Dict[str, int]:
+    """Équivalent de orm_load() en COPY + fusion; à appeler dans la transaction de l'import."""
+    counts = dict(items_total=0, added=0, updated=0, reactivated=0, marked_sold=0)
+
+    def counted(records):
+        for rec in records:
+            counts["items_total"] += 1
+            yield rec
+
+    feed_columns = [Listing._meta.get_field(f).column for f in FEED_FIELDS]
+    sql_names = {
+        "feed_stage": FEED_STAGE,
+        "listing_stage": LISTING_STAGE,
+        "photo_stage": PHOTO_STAGE,
+        "feed": ", ".join(feed_columns),
+        "feed_update": ", ".join(f"{c} = EXCLUDED.{c}" for c in feed_columns),
+        "feed_l": ", ".join(f"l.{c}" for c in feed_columns),
+        "feed_s": ", ".join(f"s.{c}" for c in feed_columns),
+        "feed_excluded": ", ".join(f"EXCLUDED.{c}" for c in feed_columns),
+    }
+    params = {"now": now, "release": release.pk}
+    with connection.cursor() as cursor:
+        _create_stages(cursor)
+        _copy(cursor, FEED_STAGE, ["seq", "centris_id"] + feed_columns + ["photos"], _stage_rows(counted(records)))
+
+        def run(name):
+            cursor.execute(MERGE_SQL[name].format(**sql_names), params)
+            return cursor
+
+        run("stage_latest")
+        run("stage_photos")
+        for table in (LISTING_STAGE, PHOTO_STAGE):
+            cursor.execute(f"ANALYZE {table}")
+        run("changes_created")
+        run("changes_updated")
+        counts["reactivated"] = run("reactivated").fetchone()[0]
+        counts["added"], counts["updated"] = run("upsert").fetchone()
+        for name in ("photos_cleanup", "photos_changed", "changes_photos", "photos_known", "photos_revision",
+                     "photos_delete", "photos_insert", "photos_cleanup"):
+            run(name)
+        if mark_sold:
+            counts["marked_sold"] = run("mark_sold").rowcount
+        cursor.execute(f"TRUNCATE {FEED_STAGE}, {LISTING_STAGE}, {PHOTO_STAGE}")
+    return counts
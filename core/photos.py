@@ -0,0 +1,143 @@
+# core/photos.py
+"""
+Pipeline d'images locales pour les photos Centris.
+
+Après un import, chaque photo sans dérivés est téléchargée une seule fois
+(pool de threads borné + requests.Session partagée), puis réencodée en
+WebP (et AVIF si Pillow le supporte) à quelques largeurs. Les fichiers sont
+nommés d'après le sha256 de l'original: deux inscriptions qui partagent une
+photo, ou un import qui la renvoie, réutilisent les mêmes fichiers.
+
+Une URL en échec (404, délai, image illisible) est mémorisée sur ses
+ListingPhoto: le prochain essai attend RETRY_BACKOFF, doublé à chaque
+échec jusqu'à RETRY_BACKOFF_MAX. Un CDN en panne ne coûte donc pas un
+délai d'attente par photo à chaque import.
+"""
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import requests
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from . import images
+from .models import ListingPhoto
+
+logger = logging.getLogger(__name__)
+
+UA = "SebasIT-CentrisImporter/1.0"
+WIDTHS = (320, 640, 1280)
+DEFAULT_WORKERS = 8
+RETRY_BACKOFF = timedelta(hours=1)
+RETRY_BACKOFF_MAX = timedelta(days=7)
+
+
+def make_session(workers: int = DEFAULT_WORKERS) -> requests.Session:
+    """Session partagée par les threads: une connexion keep-alive par worker."""
+    session = requests.Session()
+    session.headers.update({"User-Agent": UA})
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def render_derivatives(data: bytes) -> Dict[str, object]:
+    """
+    Encode l'image source aux largeurs WIDTHS (sans agrandir), l'écrit dans
+    le stockage média et calcule son placeholder. Retourne les champs
+    ListingPhoto à mettre à jour.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    img = images.open_normalized(data)
+
+    done: Dict[str, List[int]] = {}
+    for fmt in images.FORMATS:
+        for width in images.target_widths(img, WIDTHS):
+            name = ListingPhoto.derivative_name(digest, width, fmt)
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(images.encode(img, width, fmt)))
+            done.setdefault(fmt, []).append(width)
+    return {
+        "image_hash": digest,
+        "derivatives": done,
+        "width": img.width,
+        "height": img.height,
+        "placeholder_color": images.dominant_color(img),
+        "fetch_failures": 0,
+        "retry_after": None,
+    }
+
+
+def retry_delay(failures: int) -> timedelta:
+    """Attente après le n-ième échec consécutif: 1 h, 2 h, 4 h… plafonnée."""
+    return min(RETRY_BACKOFF * 2 ** max(0, failures - 1), RETRY_BACKOFF_MAX)
+
+
+def _fetch_and_render(session: requests.Session, url: str):
+    """(url, champs à écrire) ou (url, None) en cas d'échec: une photo ne bloque jamais le lot."""
+    try:
+        r = session.get(url, timeout=30)
+        r.raise_for_status()
+        return url, render_derivatives(r.content)
+    except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError) as e:
+        # OSError: UnidentifiedImageError, image tronquée; ValueError: mode non encodable
+        logger.warning("photo %s ignorée: %s", url, e)
+    except Exception:
+        # Autre erreur de décodage (fichier hostile): consignée, le lot continue
+        logger.exception("photo %s ignorée", url)
+    return url, None
+
+
+def process_pending(workers: int = DEFAULT_WORKERS, limit: Optional[int] = None,
+                    session: Optional[requests.Session] = None) -> Dict[str, int]:
+    """
+    Traite les ListingPhoto sans dérivés ni placeholder (incrémental: une
+    photo déjà traitée n'est plus jamais téléchargée). Une URL partagée par plusieurs
+    lignes n'est téléchargée qu'une fois; les écritures DB restent dans le
+    thread appelant (SQLite n'aime pas les écrivains concurrents). Les URL
+    en échec dont retry_after n'est pas passé sont comptées dans "deferred".
+    """
+    now = timezone.now()
+    pending = (
+        ListingPhoto.objects
+        .filter(Q(image_hash="") | Q(placeholder_color=""))
+        .order_by("listing_id", "sequence")
+    )
+    pks_by_url: Dict[str, List[int]] = {}
+    failures: Dict[str, int] = {}
+    deferred = set()
+    for pk, url, failed, retry_after in pending.values_list("pk", "url", "fetch_failures", "retry_after"):
+        if retry_after is not None and retry_after > now:
+            deferred.add(url)
+            continue
+        pks_by_url.setdefault(url, []).append(pk)
+        failures[url] = max(failures.get(url, 0), failed)
+    urls = list(pks_by_url)
+    if limit is not None:
+        urls = urls[:limit]
+
+    stats = {"urls": len(urls), "processed": 0, "failed": 0, "deferred": len(deferred - set(pks_by_url))}
+    if not urls:
+        return stats
+
+    session = session or make_session(workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for url, result in pool.map(lambda u: _fetch_and_render(session, u), urls):
+            if result is None:
+                ListingPhoto.objects.filter(pk__in=pks_by_url[url]).update(
+                    fetch_failures=F("fetch_failures") + 1,
+                    retry_after=timezone.now() + retry_delay(failures[url] + 1),
+                )
+                stats["failed"] += 1
+                continue
+            ListingPhoto.objects.filter(pk__in=pks_by_url[url]).update(**result)
+            stats["processed"] += 1
+    return stats
@@ -0,0 +1,184 @@
+# core/publish.py
+"""
+Export HTML statique des pages publiques, après import (STATIC_EXPORT_ROOT).
+
+Pages pré-rendues par les vues Django elles-mêmes (même HTML qu'en direct):
+
+    /                         -> index.html
+    /properties/?page=N       -> properties/page-N.html
+    /properties/<slug>/       -> properties/<slug>/index.html   (actives + vendues ≤ 3 jours)
+
+Chaque export est une version complète dans `<root>.releases/<horodatage>/`
+avec son manifest.json (sha256 par fichier). Une page dont le hash n'a pas
+changé est un lien physique vers la version précédente: seul ce qui change
+est réécrit. `<root>` est un lien symbolique remplacé atomiquement
+(os.replace) vers la nouvelle version; les KEEP_RELEASES dernières versions
+restent sur disque pour les lectures en cours. Une page en erreur annule
+l'export: la version en ligne ne bouge pas.
+
+Le serveur frontal sert ces fichiers et retombe sur Django s'ils manquent
+(nouvelle inscription entre deux imports, page hors export), ex. nginx:
+
+    root /srv/site/export;            # = STATIC_EXPORT_ROOT
+    location = / { try_files /index.html @django; }
+    location = /properties/ {
+        set $page $arg_page;
+        if ($page = "") { set $page 1; }
+        try_files /properties/page-$page.html @django;
+    }
+    location /properties/ { try_files $uri/index.html @django; }
+    location @django { proxy_pass http://app; }
+"""
+import hashlib
+import json
+import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import Listing
+from .views import PAGE_SIZE
+
+MANIFEST = "manifest.json"
+KEEP_RELEASES = 3
+DEFAULT_WORKERS = 4
+CHUNK_SIZE = 50
+
+
+class PublishError(Exception):
+    pass
+
+
+def pages() -> List[Tuple[str, str]]:
+    """(URL, fichier relatif) de toutes les pages exportées."""
+    visible = Listing.objects.visible()
+    result = [(reverse("home"), "index.html")]
+    list_url = reverse("properties_list")
+    n_pages = max(1, math.ceil(visible.count() / PAGE_SIZE))
+    result += [(f"{list_url}?page={n}", f"properties/page-{n}.html") for n in range(1, n_pages + 1)]
+    for slug in visible.exclude(slug="").values_list("slug", flat=True).order_by("centris_id"):
+        result.append((reverse("property_detail", args=[slug]), f"properties/{slug}/index.html"))
+    return result
+
+
+def render_page(url: str) -> bytes:
+    """Rend `url` par sa vue, sans middleware (pages sans cookie ni contenu par visiteur)."""
+    request = RequestFactory().get(url)
+    match = resolve(request.path_info)
+    request.resolver_match = match
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    response = view(request, *match.args, **match.kwargs)
+    if response.status_code != 200:
+        raise PublishError(f"{url}: HTTP {response.status_code}")
+    if hasattr(response, "render"):
+        response.render()
+    return response.content
+
+
+def _export_chunk(chunk, release: str, previous: Optional[str], previous_hashes: Dict[str, str]):
+    """Rend un lot de pages dans `release`; retourne [(fichier, sha256, réécrit)]."""
+    results = []
+    try:
+        for url, rel in chunk:
+            content = render_page(url)
+            digest = hashlib.sha256(content).hexdigest()
+            target = os.path.join(release, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            old = os.path.join(previous, rel) if previous else ""
+            if previous_hashes.get(rel) == digest and os.path.isfile(old):
+                os.link(old, target)  # inchangé: même inode, même mtime
+                results.append((rel, digest, False))
+                continue
+            with open(target, "wb") as fh:
+                fh.write(content)
+            results.append((rel, digest, True))
+    finally:
+        connections.close_all()  # connexions de ce thread / processus
+    return results
+
+
+def current_release(root: str) -> Optional[str]:
+    if not os.path.lexists(root):
+        return None
+    if not os.path.islink(root):
+        raise PublishError(f"{root} existe et n'est pas un lien symbolique")
+    return os.path.realpath(root)
+
+
+def _read_manifest(release: Optional[str]) -> Dict[str, str]:
+    if not release:
+        return {}
+    try:
+        with open(os.path.join(release, MANIFEST)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}  # version incomplète ou ancienne: tout est réécrit
+
+
+def swap(root: str, release: str):
+    """Pointe `root` sur `release` en une opération (rename d'un lien temporaire)."""
+    tmp = f"{root}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(release, tmp)
+    os.replace(tmp, root)
+
+
+def prune(releases_dir: str, keep: int = KEEP_RELEASES):
+    for name in sorted(os.listdir(releases_dir))[:-keep]:
+        shutil.rmtree(os.path.join(releases_dir, name), ignore_errors=True)
+
+
+def publish(root: str, workers: int = DEFAULT_WORKERS, processes: bool = False) -> Dict[str, object]:
+    """
+    Exporte toutes les pages() vers une nouvelle version puis bascule `root`.
+    `processes`: rendu dans des processus (fork) plutôt que des threads; le
+    rendu des gabarits est surtout du CPU Python, les threads partagent le GIL.
+    """
+    root = os.path.abspath(root)
+    releases_dir = f"{root}.releases"
+    os.makedirs(releases_dir, exist_ok=True)
+    previous = current_release(root)
+    previous_hashes = _read_manifest(previous)
+
+    release = os.path.join(releases_dir, timezone.now().strftime("%Y%m%d-%H%M%S-%f"))
+    os.makedirs(release)
+    todo = pages()
+    chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+
+    if processes:
+        connections.close_all()  # pas de connexion héritée par les processus enfants
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("fork"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    manifest, written = {}, 0
+    try:
+        with executor as pool:
+            futures = [
+                pool.submit(
+                    _export_chunk, chunk, release, previous,
+                    {rel: previous_hashes[rel] for _, rel in chunk if rel in previous_hashes},
+                )
+                for chunk in chunks
+            ]
+            for future in futures:
+                for rel, digest, rewritten in future.result():
+                    manifest[rel] = digest
+                    written += rewritten
+    except BaseException:
+        shutil.rmtree(release, ignore_errors=True)
+        raise
+
+    with open(os.path.join(release, MANIFEST), "w") as fh:
+        json.dump(manifest, fh, indent=0, sort_keys=True)
+    swap(root, release)
+    prune(releases_dir)
+    return {"pages": len(manifest), "written": written, "linked": len(manifest) - written, "release": release}
@@ -0,0 +1,105 @@
+# core/ratelimit.py
+"""
+Limitation de débit des formulaires: seau à jetons dans le cache partagé.
+
+Un seau par IP et un par courriel soumis (empreinte): un robot qui change
+d'IP mais garde son adresse est freiné aussi. Chaque POST prend un jeton;
+le seau se remplit en continu au débit configuré ("5/10m" = 5 jetons,
+rechargés en 10 minutes). Seau vide: 429 + Retry-After, sans toucher à la
+base.
+
+Lecture puis écriture du cache, sans verrou: des POST strictement
+simultanés peuvent passer un jeton de trop, ce qui suffit contre les
+rafales.
+
+Déploiement:
+- derrière nginx / un répartiteur, TRUSTED_PROXY_COUNT indique combien de
+  mandataires ajoutent X-Forwarded-For (core.http.client_ip); sinon tous
+  les visiteurs partagent le seau de l'adresse du mandataire;
+- les seaux doivent vivre dans un cache partagé (CACHE_URL=redis://…):
+  avec locmem, chaque worker a les siens et le débit est multiplié par le
+  nombre de workers (avertissement core.W001 de `check --deploy`).
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.http import JsonResponse
+
+from .http import client_ip
+
+RATE = re.compile(r"^(\d+)/(\d*)([smhd])$")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """Ex. "5/10m" -> (capacité 5, période 600 s)."""
+    match = RATE.match(rate.strip())
+    if not match:
+        raise ValueError(f"débit invalide: {rate!r} (ex. 5/10m)")
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNITS[unit]
+
+
+def take(state: Optional[Tuple[float, float]], capacity: int, period: float, now: float):
+    """
+    Retire un jeton du seau `state` = (jetons, horodatage).
+    Retourne (nouvel état, secondes avant le prochain jeton; 0 = accepté).
+    """
+    tokens, last = state if state else (float(capacity), now)
+    tokens = min(capacity, tokens + (now - last) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+async def ahit(key: str, rate: str) -> float:
+    capacity, period = parse_rate(rate)
+    state, retry_after = take(await cache.aget(key), capacity, period, time.time())
+    await cache.aset(key, state, int(period) + 1)  # expire une fois le seau plein
+    return retry_after
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs=None, **kwargs):
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend.endswith(("LocMemCache", "DummyCache")):
+        return [checks.Warning(
+            "La limitation de débit des formulaires utilise un cache propre à chaque processus.",
+            hint="Configurez un cache partagé (CACHE_URL=redis://…) pour que les workers partagent les seaux.",
+            id="core.W001",
+        )]
+    return []
+
+
+def fingerprint(value: str) -> str:
+    return hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]
+
+
+def arate_limit(scope: str, setting: str = "CONTACT_RATE_LIMIT"):
+    """Décorateur de vue async POST: un seau par IP, un par courriel soumis."""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            rate = getattr(settings, setting, "5/10m")
+            keys = [f"rl:{scope}:ip:{client_ip(request)}"]
+            email = request.POST.get("email", "")
+            if email:
+                keys.append(f"rl:{scope}:fp:{fingerprint(email)}")
+            for key in keys:
+                retry_after = await ahit(key, rate)
+                if retry_after:
+                    response = JsonResponse(
+                        {"success": False, "error": "Trop de messages envoyés. Réessayez dans quelques minutes."},
+                        status=429,
+                    )
+                    response["Retry-After"] = str(int(retry_after) + 1)
+                    return response
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
@@ -0,0 +1,211 @@
+# core/replicas.py
+"""
+Lectures sur réplicas (DB_REPLICA_URLS, alias "replica1", "replica2"…).
+
+- Seules les vues publiques en lecture (REPLICA_READ_VIEWS, core/urls.py),
+  en GET/HEAD, lisent sur un réplica. Import, admin, formulaires et tout
+  code hors requête restent sur "default"; toutes les écritures aussi.
+- Après une écriture, le client reste collé au primaire (cookie
+  STICKY_COOKIE = heure de l'écriture) tant qu'aucun réplica n'a rattrapé
+  son retard: un réplica n'est choisi que si l'écriture est plus ancienne
+  que son retard mesuré (et que DB_REPLICA_STICKY_SECONDS).
+- Chaque réplica est sondé au plus toutes les DB_REPLICA_CHECK_SECONDS:
+  injoignable ou en retard de plus de DB_REPLICA_MAX_LAG, il est écarté et
+  les lectures retombent sur le primaire. La connexion du réplica a un
+  délai DB_REPLICA_CONNECT_TIMEOUT (settings.py) et une seule requête
+  sonde à la fois: les autres gardent le dernier état connu (le primaire
+  au premier passage) au lieu d'attendre la même connexion.
+"""
+import contextvars
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger("core.replicas")
+
+PRIMARY = "default"
+STICKY_COOKIE = "db_last_write"
+
+# Postgres: retard de rejeu du réplica (0 s'il a tout rejoué ou s'il s'agit d'un primaire)
+PG_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_state = contextvars.ContextVar("core_replicas_state", default=None)
+
+
+def replica_aliases():
+    # Un miroir du primaire (TEST MIRROR, pendant les tests) n'est pas un réplica
+    primary = connections[PRIMARY].settings_dict["NAME"]
+    return [
+        alias for alias in settings.DATABASES
+        if alias != PRIMARY and connections[alias].settings_dict["NAME"] != primary
+    ]
+
+
+# --- santé des réplicas -----------------------------------------------------
+class Health:
+    """Retard (s) de chaque réplica, None s'il est injoignable; mis en cache par processus."""
+
+    def __init__(self):
+        self.checked: Dict[str, Tuple[float, Optional[float]]] = {}
+        self.lock = threading.Lock()
+
+    def lag(self, alias: str) -> Optional[float]:
+        interval = getattr(settings, "DB_REPLICA_CHECK_SECONDS", 10.0)
+        now = time.monotonic()
+        with self.lock:
+            checked_at, previous = self.checked.get(alias, (None, None))
+            if checked_at is not None and now - checked_at < interval:
+                return previous
+            # Sonde en cours: état connu conservé pour l'intervalle
+            self.checked[alias] = (now, previous)
+        lag = self.probe(alias)
+        with self.lock:
+            # Intervalle compté depuis la fin de la sonde (un échec peut durer le délai de connexion)
+            self.checked[alias] = (time.monotonic(), lag)
+        if checked_at is None:
+            previous = 0.0  # premier passage: seul un échec est signalé
+        if (lag is None) != (previous is None):
+            if lag is None:
+                logger.warning("réplica %s injoignable: lectures sur le primaire", alias)
+            else:
+                logger.warning("réplica %s de retour (retard %.1fs)", alias, lag)
+        return lag
+
+    @staticmethod
+    def probe(alias: str) -> Optional[float]:
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                if connection.vendor == "postgresql":
+                    cursor.execute(PG_LAG_SQL)
+                    return float(cursor.fetchone()[0])
+                # Autres moteurs (SQLite de test): joignable = schéma lisible, retard inconnu
+                cursor.execute("SELECT 1 FROM django_migrations LIMIT 1")
+                return 0.0
+        except DatabaseError:
+            connection.close()
+            return None
+
+
+health = Health()
+
+
+# --- état par requête ---------------------------------------------------------
+@dataclass
+class ReadState:
+    request: object = None
+    last_write: Optional[float] = None  # time.time() de la dernière écriture du client
+    wrote: bool = False
+    alias: Optional[str] = None         # réplica retenu pour toute la requête
+
+    def allows_replica(self) -> bool:
+        from .urls import REPLICA_READ_VIEWS
+        match = getattr(self.request, "resolver_match", None)
+        return (
+            not self.wrote
+            and self.request.method in ("GET", "HEAD")
+            and match is not None
+            and match.url_name in REPLICA_READ_VIEWS
+        )
+
+    def pick(self) -> str:
+        if self.alias is None:
+            self.alias = choose_replica(self.last_write)
+        return self.alias
+
+
+def choose_replica(last_write: Optional[float] = None) -> str:
+    max_lag = getattr(settings, "DB_REPLICA_MAX_LAG", 30.0)
+    sticky = getattr(settings, "DB_REPLICA_STICKY_SECONDS", 5.0)
+    since_write = time.time() - last_write if last_write else float("inf")
+    candidates = []
+    for alias in replica_aliases():
+        lag = health.lag(alias)
+        if lag is None or lag > max_lag:
+            continue
+        if since_write <= max(lag, sticky):
+            continue  # l'écriture du client n'est peut-être pas encore rejouée ici
+        candidates.append(alias)
+    return random.choice(candidates) if candidates else PRIMARY
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not replica_aliases() or not state.allows_replica():
+            return None
+        return state.pick()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+            state.last_write = time.time()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # même base, copies différentes
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY  # les réplicas reçoivent le schéma par réplication
+
+
+class ReplicaMiddleware:
+    """Ouvre l'état de routage de la requête et pose le cookie après une écriture."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(request, response)
+
+    def start(self, request):
+        try:
+            last_write = float(request.COOKIES.get(STICKY_COOKIE, ""))
+        except ValueError:
+            last_write = None
+        request.db_state = ReadState(request=request, last_write=last_write)
+        return _state.set(request.db_state)
+
+    def finish(self, request, response):
+        state = request.db_state
+        if state.wrote and replica_aliases():
+            response.set_cookie(
+                STICKY_COOKIE, f"{state.last_write:.3f}",
+                max_age=int(getattr(settings, "DB_REPLICA_MAX_LAG", 30.0)) + 1,
+                secure=request.is_secure(), httponly=True, samesite="Lax",
+            )
+        return response
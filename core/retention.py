@@ -0,0 +1,202 @@
+# core/retention.py
+"""
+Rétention: les tables chaudes ne gardent que ce qui sert.
+
+- Versions du catalogue (core/catalog.py): seules les
+  CATALOG_KEEP_RELEASES dernières publiées gardent leurs lignes (fiches et
+  photos), plus la version en ligne; les autres passent PRUNED et ne
+  peuvent plus être remises en ligne.
+- Fiches vendues depuis plus de RETENTION_SOLD_DAYS dans la version en
+  ligne (le public ne les voit plus après 3 jours): écrites avec leurs
+  photos dans une archive JSON Lines gzip
+  (ARCHIVE_ROOT/listings-<horodatage>.jsonl.gz, une fiche par ligne) puis
+  supprimées de toutes les versions. Les dérivés d'images qui ne servent
+  plus à aucune photo sont supprimés du stockage. Événement REMOVED au
+  journal des changements pour chaque fiche supprimée.
+- FetchLog de plus de RETENTION_FETCHLOG_DAYS: regroupés en une ligne par
+  jour (compteurs additionnés, dernier items_total). Le dernier FetchLog
+  n'est jamais touché (il porte la version du catalogue, core/api.py).
+- Journal des changements: compaction au-delà de CHANGES_COMPACT_DAYS
+  (core/changes.py).
+
+Ensuite VACUUM + ANALYZE (SQLite: puis optimize et checkpoint du WAL,
+core/sqlite.py); l'espace récupéré est mesuré avant/après.
+"""
+import gzip
+import json
+import os
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import changes, sqlite
+from .models import CatalogRelease, FetchLog, Listing, ListingChange, ListingPhoto, LiveCatalog
+
+BATCH_SIZE = 500
+TABLES = (Listing, ListingPhoto, FetchLog, ListingChange)
+PHOTO_FIELDS = ("sequence", "url", "image_hash", "derivatives", "width", "height", "placeholder_color")
+
+
+def delete_unused_derivatives(hashes) -> int:
+    """Supprime du stockage les dérivés {(image_hash, derivatives JSON)} qu'aucune photo ne reprend; retourne le nombre de fichiers."""
+    # Dérivés partagés par une autre photo (même image_hash): conservés
+    still_used = set(ListingPhoto.objects.filter(image_hash__in={h for h, _ in hashes}).values_list("image_hash", flat=True))
+    files = 0
+    for digest, derivatives in hashes:
+        if digest in still_used:
+            continue
+        for fmt, widths in json.loads(derivatives).items():
+            for width in widths:
+                name = ListingPhoto.derivative_name(digest, width, fmt)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                    files += 1
+    return files
+
+
+def prune_releases(dry_run: bool = False) -> Dict[str, int]:
+    """Supprime les lignes des versions au-delà des CATALOG_KEEP_RELEASES dernières; retourne les compteurs."""
+    keep = getattr(settings, "CATALOG_KEEP_RELEASES", 7)
+    kept = CatalogRelease.objects.filter(
+        state__in=[CatalogRelease.STATE_LIVE, CatalogRelease.STATE_ROLLED_BACK]
+    ).exclude(pk=LiveCatalog.release_subquery()).order_by("-pk")
+    old = list(kept.values_list("pk", flat=True)[max(0, keep - 1):])  # + la version en ligne = keep
+    stats = {"releases": len(old), "files": 0}
+    if dry_run or not old:
+        return stats
+    for pk in old:
+        photos = ListingPhoto.objects.filter(listing__release_id=pk)
+        hashes = {
+            (digest, json.dumps(derivatives, sort_keys=True))
+            for digest, derivatives in photos.exclude(image_hash="").values_list("image_hash", "derivatives").distinct()
+        }
+        with transaction.atomic():
+            photos.delete()
+            Listing.objects.filter(release_id=pk).delete()
+            CatalogRelease.objects.filter(pk=pk).update(state=CatalogRelease.STATE_PRUNED)
+        stats["files"] += delete_unused_derivatives(hashes)
+    return stats
+
+
+def expired_listings(now=None):
+    days = getattr(settings, "RETENTION_SOLD_DAYS", 90)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Listing.objects.live().filter(status=Listing.STATUS_SOLD, sold_at__lt=cutoff).order_by("centris_id")
+
+
+def archive_listings(now=None, dry_run: bool = False) -> Dict[str, object]:
+    """Archive puis supprime (toutes versions) les fiches expirées, par lots; retourne les compteurs."""
+    now = now or timezone.now()
+    ids = list(expired_listings(now).values_list("centris_id", flat=True))
+    stats = {"listings": len(ids), "photos": 0, "files": 0, "path": ""}
+    if dry_run or not ids:
+        stats["photos"] = ListingPhoto.objects.filter(listing__in=expired_listings(now)).count()
+        return stats
+
+    root = str(getattr(settings, "ARCHIVE_ROOT", ""))
+    os.makedirs(root, exist_ok=True)
+    path = stats["path"] = os.path.join(root, f"listings-{now:%Y%m%d-%H%M%S}.jsonl.gz")
+    hashes = set()
+    with gzip.open(path, "wt", encoding="utf-8") as archive:
+        for i in range(0, len(ids), BATCH_SIZE):
+            batch = ids[i:i + BATCH_SIZE]
+            every_version = Listing.objects.filter(centris_id__in=batch)
+            photos = defaultdict(list)
+            # Dérivés de toutes les versions (supprimées avec); l'archive garde la version en ligne
+            for photo in ListingPhoto.objects.filter(listing__in=every_version).order_by("sequence").values(
+                "listing_id", *PHOTO_FIELDS
+            ):
+                photos[photo.pop("listing_id")].append(photo)
+                if photo["image_hash"]:
+                    hashes.add((photo["image_hash"], json.dumps(photo["derivatives"], sort_keys=True)))
+            for row in Listing.objects.live().filter(centris_id__in=batch).values():
+                row["photos"] = photos.get(row["id"], [])
+                stats["photos"] += len(row["photos"])
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n")
+            archive.flush()
+            os.fsync(archive.buffer.fileobj.fileno())  # l'archive est sur disque avant la suppression
+            with transaction.atomic():
+                changes.lock()
+                ListingPhoto.objects.filter(listing__in=every_version).delete()
+                every_version.delete()
+                changes.record(
+                    ListingChange(listing_id=centris_id, kind=ListingChange.KIND_REMOVED, created_at=now)
+                    for centris_id in batch
+                )
+
+    stats["files"] = delete_unused_derivatives(hashes)
+    return stats
+
+
+def rollup_fetchlogs(now=None, dry_run: bool = False) -> int:
+    """Un FetchLog par jour au-delà de RETENTION_FETCHLOG_DAYS; retourne le nombre de lignes supprimées."""
+    days = getattr(settings, "RETENTION_FETCHLOG_DAYS", 90)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    latest = FetchLog.objects.aggregate(pk=Max("pk"))["pk"]
+    by_day = defaultdict(list)
+    for log in FetchLog.objects.filter(created_at__lt=cutoff).exclude(pk=latest).order_by("pk"):
+        by_day[timezone.localdate(log.created_at)].append(log)
+
+    removed = 0
+    with transaction.atomic():
+        for logs in by_day.values():
+            if len(logs) < 2:
+                continue
+            kept, merged = logs[-1], logs[:-1]
+            removed += len(merged)
+            if dry_run:
+                continue
+            for field in ("items_added", "items_updated", "items_marked_sold", "duration_seconds"):
+                setattr(kept, field, getattr(kept, field) + sum(getattr(log, field) for log in merged))
+            kept.save()
+            FetchLog.objects.filter(pk__in=[log.pk for log in merged]).delete()
+    return removed
+
+
+def database_size() -> Optional[int]:
+    """Taille du fichier de base (SQLite) ou des tables concernées (PostgreSQL), en octets."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("PRAGMA page_count")
+            pages = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            return pages * cursor.fetchone()[0]
+        if connection.vendor == "postgresql":
+            sizes = " + ".join(["pg_total_relation_size(%s)"] * len(TABLES))
+            cursor.execute(f"SELECT {sizes}", [model._meta.db_table for model in TABLES])
+            return cursor.fetchone()[0]
+    return None
+
+
+def vacuum():
+    """VACUUM + ANALYZE hors transaction; SQLite: optimize et checkpoint du WAL ensuite."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("VACUUM")
+            cursor.execute("ANALYZE")
+        elif connection.vendor == "postgresql":
+            for model in TABLES:
+                cursor.execute(f"VACUUM ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+    sqlite.maintain()
+
+
+def apply(now=None, dry_run: bool = False, do_vacuum: bool = True) -> Dict[str, object]:
+    before = database_size()
+    pruned = prune_releases(dry_run=dry_run)
+    stats = archive_listings(now, dry_run=dry_run)
+    stats["releases"], stats["release_files"] = pruned["releases"], pruned["files"]
+    stats["fetchlogs"] = rollup_fetchlogs(now, dry_run=dry_run)
+    stats["changes"] = changes.compact(now, dry_run=dry_run)
+    if do_vacuum and not dry_run:
+        vacuum()
+    after = database_size()
+    stats["bytes_before"], stats["bytes_after"] = before, after
+    stats["reclaimed"] = before - after if before is not None and after is not None else None
+    return stats
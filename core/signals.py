@@ -0,0 +1,13 @@
+# core/signals.py
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+from . import fragments, sqlite
+from .models import Agent, Certification
+
+
+def connect():
+    connection_created.connect(sqlite.configure, dispatch_uid="sqlite-pragmas")
+    for model in (Certification, Agent):
+        post_save.connect(fragments.bump_version, sender=model, dispatch_uid=f"fragments-save-{model.__name__}")
+        post_delete.connect(fragments.bump_version, sender=model, dispatch_uid=f"fragments-delete-{model.__name__}")
@@ -0,0 +1,135 @@
+# core/sitemaps.py
+"""
+Sitemaps pour les robots: un index et des sitemaps enfants paginés.
+
+- GET /sitemap.xml                  index: sitemap-pages.xml + sitemap-listings-N.xml
+- GET /sitemap-pages.xml            pages fixes (accueil, contact, collaborateurs, investir, à propos)
+- GET /sitemap-listings-N.xml       fiches publiées (Listing.visible()), SITEMAP_PAGE_SIZE par
+                                    fichier, lastmod = updated_at
+
+Comme l'API (core/api.py), le contenu ne change qu'à l'import ou à
+l'expiration d'une vendue: ETag = catalog_version() (304 sans rien
+relire), XML en cache sous une clé versionnée par cette version. Au premier appel après un import, le sitemap des
+fiches est envoyé en flux pendant la lecture (iterator par lots) et mis en
+cache une fois complet.
+"""
+import math
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
+from . import metrics
+from .api import CACHE_TIMEOUT, MAX_AGE, catalog_version
+from .http import acondition, arequire_safe
+from .models import Listing
+
+SITEMAP_PAGE_SIZE = 10000      # protocole: au plus 50 000 URL / 50 Mo par fichier
+SITEMAP_CHUNK_SIZE = 2000
+STATIC_PAGES = ("home", "contact", "collaborators", "invest", "about")
+XML_CONTENT_TYPE = "application/xml; charset=utf-8"
+XML_HEAD = '<?xml version="1.0" encoding="UTF-8"?>\n'
+XMLNS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def _published():
+    return Listing.objects.visible().exclude(slug="").order_by("centris_id")
+
+
+def _entry(tag: str, loc: str, lastmod=None) -> str:
+    mod = f"<lastmod>{lastmod.isoformat(timespec='seconds')}</lastmod>" if lastmod else ""
+    return f"<{tag}><loc>{escape(loc)}</loc>{mod}</{tag}>\n"
+
+
+def _listing_entry(request, slug, updated_at) -> bytes:
+    url = request.build_absolute_uri(reverse("property_detail", args=[slug]))
+    return _entry("url", url, updated_at).encode("utf-8")
+
+
+def _caching_lines(request, rows, key):
+    """Transmet le <urlset> au fil de la lecture, puis met le XML complet en cache."""
+    parts = [f"{XML_HEAD}<urlset {XMLNS}>\n".encode("utf-8")]
+    yield parts[0]
+    for slug, updated_at in rows.iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        parts.append(_listing_entry(request, slug, updated_at))
+        yield parts[-1]
+    parts.append(b"</urlset>\n")
+    yield parts[-1]
+    cache.set(key, b"".join(parts), CACHE_TIMEOUT)
+
+
+async def _acaching_lines(request, rows, key):
+    parts = [f"{XML_HEAD}<urlset {XMLNS}>\n".encode("utf-8")]
+    yield parts[0]
+    async for slug, updated_at in rows.aiterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        parts.append(_listing_entry(request, slug, updated_at))
+        yield parts[-1]
+    parts.append(b"</urlset>\n")
+    yield parts[-1]
+    await cache.aset(key, b"".join(parts), CACHE_TIMEOUT)
+
+
+async def _version(request, *args, **kwargs):
+    return await catalog_version(request)
+
+
+async def _cached(request):
+    """(clé de cache, XML en cache ou None); clé = version + URL absolue (domaine compris)."""
+    key = f"sitemap:{await catalog_version(request)}:{request.build_absolute_uri()}"
+    payload = await cache.aget(key)
+    metrics.record_cache("sitemap", payload is not None)
+    return key, payload
+
+
+def _xml_response(response):
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
+
+
+@arequire_safe
+@acondition(_version)
+async def index(request):
+    key, payload = await _cached(request)
+    if payload is None:
+        n_pages = math.ceil(await _published().acount() / SITEMAP_PAGE_SIZE)
+        sections = ["pages"] + [f"listings-{n}" for n in range(1, n_pages + 1)]
+        payload = "".join(
+            [f"{XML_HEAD}<sitemapindex {XMLNS}>\n"]
+            + [_entry("sitemap", request.build_absolute_uri(reverse("sitemap_section", args=[s]))) for s in sections]
+            + ["</sitemapindex>\n"]
+        ).encode("utf-8")
+        await cache.aset(key, payload, CACHE_TIMEOUT)
+    return _xml_response(HttpResponse(payload, content_type=XML_CONTENT_TYPE))
+
+
+@arequire_safe
+@acondition(_version)
+async def section(request, section):
+    if section == "pages":
+        payload = "".join(
+            [f"{XML_HEAD}<urlset {XMLNS}>\n"]
+            + [_entry("url", request.build_absolute_uri(reverse(name))) for name in STATIC_PAGES]
+            + ["</urlset>\n"]
+        ).encode("utf-8")
+        return _xml_response(HttpResponse(payload, content_type=XML_CONTENT_TYPE))
+
+    prefix, _, number = section.partition("-")
+    if prefix != "listings" or not number.isdigit() or int(number) < 1:
+        raise Http404("Sitemap introuvable")
+    key, payload = await _cached(request)
+    if payload is not None:
+        return _xml_response(HttpResponse(payload, content_type=XML_CONTENT_TYPE))
+
+    page = int(number)
+    rows = _published()[(page - 1) * SITEMAP_PAGE_SIZE:page * SITEMAP_PAGE_SIZE].values_list("slug", "updated_at")
+    if page > 1 and not await rows[:1].aexists():
+        raise Http404("Sitemap introuvable")
+    # Même choix que l'API NDJSON: itérateur async sous ASGI, synchrone sous WSGI
+    if isinstance(request, ASGIRequest):
+        lines = _acaching_lines(request, rows, key)
+    else:
+        lines = _caching_lines(request, rows, key)
+    return _xml_response(StreamingHttpResponse(lines, content_type=XML_CONTENT_TYPE))
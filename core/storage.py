@@ -0,0 +1,70 @@
+# core/storage.py
+"""
+Stockage des fichiers statiques: noms hachés (cache "immutable") + variantes
+précompressées .gz / .br écrites au moment du collectstatic.
+
+Le service de ces fichiers (choix de la variante selon Accept-Encoding,
+Cache-Control longue durée) est fait par lafreniere_site/static_serving.py.
+"""
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:  # optionnel: `pip install brotli` pour les variantes .br
+    import brotli
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".xml", ".html", ".ico", ".webmanifest",
+}
+MIN_SIZE = 512          # en deçà, l'en-tête Content-Encoding coûte plus qu'il ne rapporte
+MIN_RATIO = 0.95        # on garde la variante seulement si elle fait gagner ≥ 5 %
+
+
+def compress_file(path):
+    """Écrit path.gz (et path.br si brotli est installé). Retourne les variantes écrites."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < MIN_SIZE:
+        return []
+
+    written = []
+    variants = [(".gz", lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda d: brotli.compress(d, quality=11)))
+    for suffix, compress in variants:
+        packed = compress(data)
+        if len(packed) <= len(data) * MIN_RATIO:
+            with open(path + suffix, "wb") as f:
+                f.write(packed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    # Les gabarits référencent quelques fichiers absents du dépôt (favicons,
+    # placeholder): on sert l'URL non hachée plutôt que de lever une erreur 500.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not isinstance(processed, Exception):
+                names.add(name)
+                if hashed_name:
+                    names.add(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                compress_file(self.path(name))
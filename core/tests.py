@@ -1,3 +1,1739 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import random
+import re
+import shutil
+import socketserver
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+from datetime import timedelta
+from email import message_from_string
+from html.parser import HTMLParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+from xml.etree import ElementTree
 
-# Create your tests here.
+from asgiref.sync import SyncToAsync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.shortcuts import render
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from lafreniere_site.static_serving import StaticFilesWSGI
+
+from . import admin as admin_site
+from . import (
+    alerts, bench, catalog, changes, export, fragments, geo, metrics, notifications, pgload, photos, publish, ratelimit,
+    replicas,
+)
+from .management.commands.bench_alerts import synthetic_listings, synthetic_searches
+from .management.commands.bench_import import synthetic_records, synthetic_zip
+from .management.commands.import_centris import Record, extract_coordinates, orm_load, parse_feed
+from .models import (
+    Agent, CatalogRelease, Certification, ContactMessage, FetchLog, Listing, ListingChange, ListingPhoto, SavedSearch,
+    SavedSearchMatch,
+)
+from .http import client_ip
+from .perf import PerfMiddleware, QueryBudgetMixin
+from .urls import QUERY_BUDGETS
+
+
+def live_release():
+    """Version en ligne; une version "test" publiée si le catalogue est vide."""
+    return catalog.live_release() or catalog.publish(CatalogRelease.objects.create(source_name="test"))
+
+
+def make_listing(centris_id, **kwargs):
+    kwargs.setdefault("slug", f"listing-{centris_id}")
+    kwargs.setdefault("last_seen_at", timezone.now())
+    kwargs.setdefault("release", live_release())
+    return Listing.objects.create(centris_id=centris_id, **kwargs)
+
+
+class ListingApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.active = make_listing("100", prix=350000, adresse="1, Rue A",
+                                   caracteristiques=[{"cat": "Allée", "val": "Non pavé"}])
+        ListingPhoto.objects.create(listing=self.active, sequence=2, url="https://img/2.jpg")
+        ListingPhoto.objects.create(listing=self.active, sequence=1, url="https://img/1.jpg")
+        make_listing("200", status=Listing.STATUS_SOLD, sold_at=timezone.now() - timedelta(days=10))
+        FetchLog.objects.create(items_total=2)
+
+    def test_list_uses_visible_filter_and_cover_photo(self):
+        res = self.client.get(reverse("api_listings"))
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(data["results"][0]["centris_id"], "100")
+        self.assertEqual(data["results"][0]["photo"], "https://img/1.jpg")
+        self.assertNotIn("description", data["results"][0])
+
+    def test_ndjson_streams_one_line_per_listing(self):
+        make_listing("300")
+        res = self.client.get(reverse("api_listings"), {"format": "ndjson"})
+        self.assertTrue(res.streaming)
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(sorted(json.loads(l)["centris_id"] for l in lines), ["100", "300"])
+
+    def test_detail_includes_photos_and_caracteristiques(self):
+        res = self.client.get(reverse("api_listing_detail", args=["listing-100"]))
+        data = res.json()
+        self.assertEqual([p["sequence"] for p in data["photos"]], [1, 2])
+        self.assertEqual(data["caracteristiques"], [{"cat": "Allée", "val": "Non pavé"}])
+        missing = self.client.get(reverse("api_listing_detail", args=["nope"]))
+        self.assertEqual(missing.status_code, 404)
+
+    def test_etag_follows_last_fetchlog(self):
+        url = reverse("api_listings")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        FetchLog.objects.create(items_total=3)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_page_served_from_cache_until_next_import(self):
+        url = reverse("api_listings")
+        self.client.get(url)
+        make_listing("400")
+        self.assertEqual(self.client.get(url).json()["count"], 1)
+
+        FetchLog.objects.create(items_total=3)
+        self.assertEqual(self.client.get(url).json()["count"], 2)
+
+    def test_cache_key_ignores_unread_parameters(self):
+        url = reverse("api_listings")
+        self.client.get(url, {"page": 1})
+        make_listing("400")
+        for params in ({"page": "1", "x": "random"}, {"x": "other", "page": "1"}, {"page": "abc"}, {"page": 99}):
+            self.assertEqual(self.client.get(url, params).json()["count"], 1)
+        self.client.get(reverse("api_listing_detail", args=["listing-100"]), {"x": "random"})
+        keys = [k for k in cache._cache if ":api:" in k]
+        self.assertEqual(len([k for k in keys if ":listings:" in k and not k.endswith(":count")]), 1)
+        self.assertEqual(len([k for k in keys if ":detail:" in k]), 1)
+
+    def test_sold_listing_expiry_changes_version_without_import(self):
+        make_listing("500", status=Listing.STATUS_SOLD, sold_at=timezone.now() - timedelta(days=2))
+        url = reverse("api_listings")
+        res = self.client.get(url)
+        self.assertEqual(res.json()["count"], 2)
+
+        later = timezone.now() + timedelta(days=1, hours=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 200)
+            self.assertEqual(self.client.get(url).json()["count"], 1)
+
+
+class MapApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for i, (lat, lon) in enumerate([(46.81, -71.21), (46.82, -71.22), (45.50, -73.57)]):
+            listing = make_listing(str(i), slug=f"l-{i}")
+            listing.set_coordinates(lat, lon)
+            listing.save()
+        make_listing("nocoords")
+
+    def test_geohash_reference_vector(self):
+        self.assertEqual(geo.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+
+    def test_extract_coordinates_from_inscription_row(self):
+        row = ["123", "", "", "450000", "46.812345", "-71.208765", "G1R2B5"]
+        self.assertEqual(extract_coordinates(row), (46.812345, -71.208765))
+        self.assertEqual(extract_coordinates(["123", "1.5", "2.5"]), (None, None))
+
+    def test_bbox_returns_markers_inside_viewport(self):
+        res = self.client.get(reverse("api_map"), {"bbox": "-71.3,46.7,-71.1,46.9", "zoom": 14})
+        self.assertEqual(sorted(l["slug"] for l in res.json()["listings"]), ["l-0", "l-1"])
+
+    def test_low_zoom_clusters_server_side(self):
+        res = self.client.get(reverse("api_map"), {"bbox": "-80,44,-60,50", "zoom": 5})
+        clusters = res.json()["clusters"]
+        self.assertEqual(sum(c["count"] for c in clusters), 3)
+        self.assertEqual(max(c["count"] for c in clusters), 2)
+
+    def test_invalid_bbox(self):
+        self.assertEqual(self.client.get(reverse("api_map"), {"bbox": "abc"}).status_code, 400)
+
+
+def jpeg_bytes(width, height, color=(200, 120, 40)):
+    buf = BytesIO()
+    Image.new("RGB", (width, height), color).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class ImageServer:
+    """Serveur HTTP local: mediaserver et dossier Centris (GET), webhook CRM (POST)."""
+
+    def __init__(self, images):
+        self.images = images
+        self.hits = []
+        self.posts = []
+        self.post_status = 200
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                owner.hits.append(self.path)
+                body = owner.images.get(self.path)
+                self.send_response(200 if body else 404)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body or b"")))
+                self.end_headers()
+                self.wfile.write(body or b"")
+
+            def do_POST(self):
+                owner.posts.append(self.rfile.read(int(self.headers["Content-Length"])))
+                self.send_response(owner.post_status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class PhotoPipelineTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_fetches_each_url_once_and_emits_srcset(self):
+        images = {"/a.jpg": jpeg_bytes(1600, 1200), "/b.jpg": jpeg_bytes(500, 400)}
+        with ImageServer(images) as server:
+            one, two = make_listing("1"), make_listing("2")
+            ListingPhoto.objects.create(listing=one, sequence=1, url=server.url + "/a.jpg")
+            ListingPhoto.objects.create(listing=one, sequence=2, url=server.url + "/b.jpg")
+            ListingPhoto.objects.create(listing=two, sequence=1, url=server.url + "/a.jpg")
+            ListingPhoto.objects.create(listing=two, sequence=2, url=server.url + "/missing.jpg")
+
+            with self.assertLogs("core.photos", "WARNING"):
+                stats = photos.process_pending(workers=2)
+            self.assertEqual(stats, {"urls": 3, "processed": 2, "failed": 1, "deferred": 0})
+            self.assertEqual(sorted(server.hits), ["/a.jpg", "/b.jpg", "/missing.jpg"])
+
+            # L'URL en échec attend son délai: le second passage ne télécharge rien
+            stats = photos.process_pending(workers=2)
+            self.assertEqual(stats, {"urls": 0, "processed": 0, "failed": 0, "deferred": 1})
+            self.assertEqual(server.hits.count("/a.jpg"), 1)
+            self.assertEqual(server.hits.count("/missing.jpg"), 1)
+
+            with mock.patch("django.utils.timezone.now", return_value=timezone.now() + timedelta(hours=2)):
+                with self.assertLogs("core.photos", "WARNING"):
+                    photos.process_pending(workers=2)
+            self.assertEqual(server.hits.count("/missing.jpg"), 2)
+            missing = ListingPhoto.objects.get(listing=two, sequence=2)
+            self.assertEqual(missing.fetch_failures, 2)
+            self.assertGreater(missing.retry_after, timezone.now() + timedelta(hours=3))
+
+        big = ListingPhoto.objects.get(listing=two, sequence=1)
+        self.assertEqual(big.derivatives["webp"], [320, 640, 1280])
+        self.assertIn("1280w", big.srcset_webp)
+        self.assertTrue(big.display_url.startswith("/media/listings/"))
+        small = ListingPhoto.objects.get(listing=one, sequence=2)
+        self.assertEqual(small.derivatives["webp"], [320, 500])
+        self.assertEqual((big.width, big.height), (1600, 1200))
+        r, g, b = (int(big.placeholder_color[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertLess(abs(r - 200) + abs(g - 120) + abs(b - 40), 30)
+
+        res = self.client.get(reverse("properties_list"))
+        self.assertContains(res, 'type="image/webp"')
+        self.assertContains(res, 'width="1600" height="1200"')
+        self.assertContains(res, f"background-color: {big.placeholder_color}")
+        res = self.client.get(reverse("property_detail", args=["listing-1"]))
+        self.assertContains(res, 'srcset="/media/listings/')
+
+    def test_bad_image_bodies_fail_without_aborting_the_batch(self):
+        images = {
+            "/ok.jpg": jpeg_bytes(100, 90),
+            "/truncated.jpg": jpeg_bytes(400, 300)[:300],
+            "/bogus.jpg": b"<html>not an image</html>",
+            "/bomb.jpg": jpeg_bytes(200, 200),
+        }
+        with ImageServer(images) as server:
+            listing = make_listing("1")
+            for seq, path in enumerate(images, 1):
+                ListingPhoto.objects.create(listing=listing, sequence=seq, url=server.url + path)
+            # 40 000 px > 2 × 10 000: DecompressionBombError à l'ouverture
+            with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 10000), self.assertLogs("core.photos", "WARNING"):
+                stats = photos.process_pending(workers=2)
+        self.assertEqual(stats, {"urls": 4, "processed": 1, "failed": 3, "deferred": 0})
+        failed = ListingPhoto.objects.filter(fetch_failures=1).values_list("url", flat=True)
+        self.assertEqual(sorted(u.rsplit("/", 1)[1] for u in failed), ["bogus.jpg", "bomb.jpg", "truncated.jpg"])
+        self.assertTrue(ListingPhoto.objects.get(sequence=1).image_hash)
+
+
+class UploadDerivativeTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name, width=800, height=800):
+        exif = Image.Exif()
+        exif[0x010F] = "CameraMaker"
+        buf = BytesIO()
+        Image.new("RGB", (width, height), (10, 20, 30)).save(buf, "JPEG", exif=exif)
+        return SimpleUploadedFile(name, buf.getvalue(), content_type="image/jpeg")
+
+    def test_agent_photo_derivatives_generated_on_save_without_exif(self):
+        agent = Agent.objects.create(name="Jean", title="Courtier", photo=self.upload("jean.jpg"))
+        self.assertEqual(agent.photo_derivatives["webp"], [96, 256, 512])
+        digest = agent.photo_derivatives["hash"]
+        self.assertTrue(agent.photo_src.endswith(f"-{digest}-256.webp"))
+        with agent.photo.storage.open(agent.photo.name.replace(".jpg", f"-{digest}-512.webp")) as f:
+            self.assertEqual(len(Image.open(f).getexif()), 0)
+
+        res = self.client.get(reverse("collaborators"))
+        self.assertContains(res, f"-{digest}-512.webp 512w")
+
+    def test_same_stem_sources_get_distinct_derivatives(self):
+        jpg = Agent.objects.create(name="Jean", photo=self.upload("jean.jpg"))
+        buf = BytesIO()
+        Image.new("RGB", (800, 800), (200, 20, 30)).save(buf, "PNG")
+        png = Agent.objects.create(name="Jeanne", photo=SimpleUploadedFile("jean.png", buf.getvalue()))
+        self.assertNotEqual(jpg.photo_src, png.photo_src)
+        with png.photo.storage.open(png.photo_src.removeprefix(settings.MEDIA_URL)) as f:
+            self.assertGreater(Image.open(f).convert("RGB").getpixel((10, 10))[0], 150)
+
+    def test_clearing_or_replacing_the_source_drops_derivatives(self):
+        agent = Agent.objects.create(name="Jean", photo=self.upload("jean.jpg"))
+        storage, first = agent.photo.storage, agent.photo_src.removeprefix(settings.MEDIA_URL)
+        self.assertTrue(storage.exists(first))
+
+        agent.photo = self.upload("jean2.jpg", 600, 600)
+        agent.save()
+        self.assertFalse(storage.exists(first))
+        second = agent.photo_src.removeprefix(settings.MEDIA_URL)
+        self.assertTrue(storage.exists(second))
+
+        agent.photo = None
+        agent.save()
+        agent.refresh_from_db()
+        self.assertEqual(agent.photo_derivatives, {})
+        self.assertEqual((agent.photo_src, agent.photo_srcset), ("", ""))
+        self.assertFalse(storage.exists(second))
+        res = self.client.get(reverse("collaborators"))
+        self.assertNotContains(res, ".webp")
+
+    def test_backfill_command(self):
+        cert = Certification.objects.create(name="Prix", logo=self.upload("prix.jpg", 100, 50))
+        Certification.objects.filter(pk=cert.pk).update(logo_derivatives={})
+        call_command("build_image_derivatives", stdout=StringIO())
+        cert.refresh_from_db()
+        self.assertEqual(cert.logo_derivatives["webp"], [100])
+        self.assertTrue(cert.logo_src.endswith(f"prix-{cert.logo_derivatives['hash']}-100.webp"))
+
+
+class SMTPServer:
+    """Serveur SMTP local minimal (EHLO, MAIL, RCPT, DATA, QUIT): garde les messages reçus."""
+
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        owner = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, text):
+                self.wfile.write(f"{text}\r\n".encode())
+
+            def handle(self):
+                owner.connections += 1
+                self.reply("220 localhost ESMTP")
+                data = None
+                for raw in self.rfile:
+                    line = raw.decode().rstrip("\r\n")
+                    if data is not None:
+                        if line == ".":
+                            owner.messages.append(message_from_string("\n".join(data)))
+                            data = None
+                            self.reply("250 OK")
+                        else:
+                            data.append(line[1:] if line.startswith("..") else line)
+                    elif line.upper().startswith("DATA"):
+                        data = []
+                        self.reply("354 Fin avec <CRLF>.<CRLF>")
+                    elif line.upper().startswith("QUIT"):
+                        self.reply("221 Bye")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ContactFormTests(TestCase):
+    form = {"name": "Ana", "email": "ana@example.com", "phone": "", "message": "Bonjour"}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def post(self, ip, email, name="contact_submit"):
+        return self.client.post(reverse(name), {**self.form, "email": email}, REMOTE_ADDR=ip)
+
+    @override_settings(CONTACT_RATE_LIMIT="2/m")
+    def test_token_bucket_per_ip_and_per_email(self):
+        with self.assertLogs("core.notifications", "WARNING"):  # pas de Redis ici
+            self.assertEqual(self.post("10.0.0.1", "a@example.com").status_code, 200)
+            self.assertEqual(self.post("10.0.0.1", "b@example.com", "invest_contact_submit").status_code, 200)
+        limited = self.post("10.0.0.1", "c@example.com")
+        self.assertEqual(limited.status_code, 429)
+        self.assertFalse(limited.json()["success"])
+        self.assertGreaterEqual(int(limited["Retry-After"]), 30)
+
+        self.assertEqual(self.post("10.0.0.2", "a@example.com").status_code, 200)
+        self.assertEqual(self.post("10.0.0.3", "A@example.com ").status_code, 429)  # même courriel, autre IP
+        self.assertEqual(ContactMessage.objects.count(), 3)
+
+    @override_settings(CONTACT_RATE_LIMIT="1/m", TRUSTED_PROXY_COUNT=1)
+    def test_client_ip_from_trusted_proxy(self):
+        def post(forwarded, email):
+            return self.client.post(reverse("contact_submit"), {**self.form, "email": email},
+                                    REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR=forwarded)
+
+        with self.assertLogs("core.notifications", "WARNING"):
+            self.assertEqual(post("203.0.113.5", "a@example.com").status_code, 200)
+            # Même mandataire, autre visiteur: autre seau
+            self.assertEqual(post("198.51.100.7", "b@example.com").status_code, 200)
+        # L'entrée ajoutée par le client n'est pas crue: seule la dernière compte
+        self.assertEqual(post("10.9.9.9, 203.0.113.5", "c@example.com").status_code, 429)
+
+    def test_client_ip_hops(self):
+        request = self.client.get("/").wsgi_request
+        request.META.update(REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2, 10.0.0.2")
+        self.assertEqual(client_ip(request), "10.0.0.1")
+        with override_settings(TRUSTED_PROXY_COUNT=2):
+            self.assertEqual(client_ip(request), "2.2.2.2")
+        with override_settings(TRUSTED_PROXY_COUNT=5):
+            self.assertEqual(client_ip(request), "1.1.1.1")
+        request.META["HTTP_X_FORWARDED_FOR"] = "pas-une-ip"
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(client_ip(request), "10.0.0.1")
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([w.id for w in ratelimit.check_shared_cache()], ["core.W001"])
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                                   "LOCATION": "redis://127.0.0.1:6379/1"}}):
+            self.assertEqual(ratelimit.check_shared_cache(), [])
+
+    def test_bucket_refills_continuously(self):
+        state, wait = ratelimit.take(None, 2, 60, now=0)
+        state, wait = ratelimit.take(state, 2, 60, now=0)
+        state, wait = ratelimit.take(state, 2, 60, now=10)
+        self.assertAlmostEqual(wait, 20)
+        state, wait = ratelimit.take(state, 2, 60, now=30)
+        self.assertEqual(wait, 0)
+        self.assertEqual(ratelimit.parse_rate("5/10m"), (5, 600))
+
+    def test_post_does_not_send_inline(self):
+        with SMTPServer() as smtp, override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend", EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=smtp.port, CONTACT_NOTIFY_EMAILS=["courtier@example.com"],
+        ), self.assertLogs("core.notifications", "WARNING"):
+            self.assertEqual(self.post("10.0.0.1", "a@example.com").json(), {"success": True})
+        self.assertEqual(smtp.connections, 0)
+        self.assertIsNone(ContactMessage.objects.get().emailed_at)
+
+    def test_batch_delivery_and_retry_without_resending(self):
+        for i in range(3):
+            ContactMessage.objects.create(name=f"Client {i}", email=f"c{i}@example.com", message="Bonjour")
+        with SMTPServer() as smtp, ImageServer({}) as crm, override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend", EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=smtp.port, CONTACT_NOTIFY_EMAILS=["courtier@example.com"],
+            CRM_WEBHOOK_URL=crm.url + "/hook",
+        ):
+            crm.post_status = 503
+            with self.assertRaisesMessage(notifications.DeliveryError, "CRM: 503"):
+                notifications.deliver_pending()
+            self.assertEqual((smtp.connections, len(smtp.messages)), (1, 3))  # un lot, une connexion
+            self.assertEqual(smtp.messages[0]["Reply-To"], "c0@example.com")
+            self.assertFalse(ContactMessage.objects.filter(emailed_at=None).exists())
+            self.assertEqual(set(ContactMessage.objects.values_list("notify_attempts", flat=True)), {1})
+
+            crm.post_status = 200
+            notifications.deliver_pending()  # reprise: CRM seulement
+            self.assertEqual(len(smtp.messages), 3)
+            contacts = json.loads(crm.posts[-1])["contacts"]
+            self.assertEqual([c["name"] for c in contacts], ["Client 0", "Client 1", "Client 2"])
+            self.assertFalse(ContactMessage.objects.filter(crm_synced_at=None).exists())
+
+            notifications.deliver_pending()
+            self.assertEqual((len(smtp.messages), len(crm.posts)), (3, 2))
+
+
+class StaticPipelineTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        src, self.root = os.path.join(tmp, "src"), os.path.join(tmp, "root")
+        os.makedirs(os.path.join(src, "css"))
+        with open(os.path.join(src, "css", "site.css"), "w") as f:
+            f.write("body { color: #322D29; }\n" * 200)
+        override = override_settings(
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[src],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def serve(self, path, **environ):
+        captured = {}
+
+        def start_response(status, headers):
+            captured["status"], captured["headers"] = status, dict(headers)
+
+        app = StaticFilesWSGI(lambda env, sr: sr("404 Not Found", []) or [b"django"])
+        body = b"".join(app({"REQUEST_METHOD": "GET", "PATH_INFO": path, **environ}, start_response))
+        return captured["status"], captured["headers"], body
+
+    def test_collectstatic_writes_hashed_names_and_gzip_siblings(self):
+        hashed = staticfiles_storage.stored_name("css/site.css")
+        self.assertRegex(hashed, r"css/site\.[0-9a-f]{12}\.css$")
+        self.assertTrue(os.path.exists(os.path.join(self.root, hashed + ".gz")))
+
+    def test_serves_precompressed_variant_with_immutable_cache(self):
+        url = staticfiles_storage.url("css/site.css")
+        status, headers, body = self.serve(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        gz_etag = headers["ETag"]
+        self.assertEqual(status, "200 OK")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertIn("immutable", headers["Cache-Control"])
+        self.assertIn(b"#322D29", gzip.decompress(body))
+
+        status, headers, body = self.serve(url)
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+
+        status, _, _ = self.serve(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=gz_etag)
+        self.assertEqual(status, "304 Not Modified")
+
+    def test_unknown_paths_fall_through_to_django(self):
+        self.assertEqual(self.serve("/static/../../etc/passwd")[0], "404 Not Found")
+        self.assertEqual(self.serve("/properties/")[2], b"django")
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_home_skips_certification_query_when_warm(self):
+        Certification.objects.create(name="Prix Or")
+        self.client.get(reverse("home"))
+        with self.assertNumQueries(0):
+            res = self.client.get(reverse("home"))
+        self.assertContains(res, "Prix Or")
+
+    def test_certification_save_and_delete_invalidate_fragments(self):
+        cert = Certification.objects.create(name="Prix Or")
+        self.client.get(reverse("home"))
+
+        cert.name = "Prix Platine"
+        cert.save()
+        self.assertContains(self.client.get(reverse("home")), "Prix Platine")
+
+        cert.delete()
+        self.assertNotContains(self.client.get(reverse("home")), "Prix Platine")
+
+    def test_agent_save_bumps_version(self):
+        before = fragments.current_version()
+        Agent.objects.create(name="Jean", title="Courtier")
+        self.assertNotEqual(fragments.current_version(), before)
+
+    def test_static_version_is_part_of_the_key(self):
+        fragments.static_version.cache_clear()
+        self.addCleanup(fragments.static_version.cache_clear)
+        with override_settings(STATIC_VERSION="deploy-1"):
+            before = fragments.current_version()
+            fragments.static_version.cache_clear()
+        with override_settings(STATIC_VERSION="deploy-2"):
+            self.assertNotEqual(fragments.current_version(), before)
+            self.assertTrue(fragments.current_version().endswith("-deploy-2"))
+
+        fragments.static_version.cache_clear()
+        with mock.patch.object(staticfiles_storage, "read_manifest", return_value='{"paths": {"a.css": "a.1.css"}}'):
+            first = fragments.static_version()
+            fragments.static_version.cache_clear()
+        with mock.patch.object(staticfiles_storage, "read_manifest", return_value='{"paths": {"a.css": "a.2.css"}}'):
+            self.assertNotEqual(fragments.static_version(), first)
+
+    def test_bench_templates_command(self):
+        out = StringIO()
+        call_command("bench_templates", repeat=1, stdout=out)
+        self.assertIn("awards_carousel", out.getvalue())
+
+
+class StylesheetCounter(HTMLParser):
+    """Compte les <link rel=stylesheet> vus par un navigateur avec JS (hors <noscript>)."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+        self.in_noscript = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "noscript":
+            self.in_noscript = True
+        elif tag == "link" and attrs.get("rel") == "stylesheet" and not self.in_noscript:
+            self.count += 1
+
+    def handle_endtag(self, tag):
+        if tag == "noscript":
+            self.in_noscript = False
+
+
+class StylesheetTests(TestCase):
+    def test_every_page_emits_a_single_stylesheet_link(self):
+        make_listing("1", slug="listing-1", adresse="1, Rue A")
+        Certification.objects.create(name="Prix Or")
+        pages = ["home", "contact", "collaborators", "invest", "about", "properties_list"]
+        urls = [reverse(name) for name in pages] + [reverse("property_detail", args=["listing-1"])]
+        for url in urls:
+            with self.subTest(url=url):
+                res = self.client.get(url)
+                self.assertEqual(res.status_code, 200)
+                html = res.content.decode()
+                parser = StylesheetCounter()
+                parser.feed(html)
+                self.assertEqual(parser.count, 1)
+                self.assertEqual(html.count("<style>\n  *,::before"), 1)  # CSS critique inliné une fois
+
+
+class CacheablePagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_public_pages_identical_for_anonymous_visitors_and_cookie_free(self):
+        for name in ("home", "contact", "invest", "about", "collaborators"):
+            with self.subTest(name=name):
+                first, second = Client().get(reverse(name)), Client().get(reverse(name))
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first.cookies, {})
+                self.assertNotIn("Cookie", first.get("Vary", ""))
+                self.assertNotIn("csrfmiddlewaretoken", first.content.decode())
+        self.assertIn("public", Client().get(reverse("contact"))["Cache-Control"])
+
+    def test_token_fetched_lazily_then_form_posts(self):
+        client = Client(enforce_csrf_checks=True)
+        form = {"name": "Ana", "email": "ana@example.com", "message": "Bonjour"}
+        self.assertEqual(client.post(reverse("contact_submit"), form).status_code, 403)
+
+        res = client.get(reverse("csrf_token"))
+        self.assertIn("no-store", res["Cache-Control"])
+        self.assertIn("csrftoken", res.cookies)
+        with self.assertLogs("core.notifications", "WARNING"):  # pas de Redis ici
+            posted = client.post(reverse("contact_submit"), form, HTTP_X_CSRFTOKEN=res.json()["token"])
+        self.assertEqual(posted.json(), {"success": True})
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for i in range(5):
+            listing = make_listing(str(i), latitude=46.81, longitude=-71.22, geohash=geo.encode(46.81, -71.22))
+            for s in (1, 2, 3):
+                ListingPhoto.objects.create(listing=listing, sequence=s, url=f"https://img/{i}/{s}.jpg")
+        for name, title in (("Jean", "Courtier"), ("Julie", "Adjointe"), ("Marc", "Courtier agréé")):
+            Agent.objects.create(name=name, title=title)
+        Certification.objects.create(name="Prix Or")
+        FetchLog.objects.create(items_total=5)
+
+    def test_every_page_stays_within_its_budget(self):
+        requests = {
+            "home": (reverse("home"), {}),
+            "contact": (reverse("contact"), {}),
+            "csrf_token": (reverse("csrf_token"), {}),
+            "collaborators": (reverse("collaborators"), {}),
+            "invest": (reverse("invest"), {}),
+            "about": (reverse("about"), {}),
+            "properties_list": (reverse("properties_list"), {}),
+            "property_detail": (reverse("property_detail", args=["listing-1"]), {}),
+            "api_listings": (reverse("api_listings"), {}),
+            "api_listing_detail": (reverse("api_listing_detail", args=["listing-1"]), {}),
+            "api_map": (reverse("api_map"), {"bbox": "-71.3,46.7,-71.1,46.9", "zoom": 14}),
+            "api_changes": (reverse("api_changes"), {}),
+            "sitemap": (reverse("sitemap"), {}),
+            "sitemap_section": (reverse("sitemap_section", args=["listings-1"]), {}),
+            "metrics": (reverse("metrics"), {}),
+        }
+        self.assertEqual(set(requests), set(QUERY_BUDGETS))
+        for name, (url, params) in requests.items():
+            with self.subTest(name=name):
+                res = self.client.get(url, params)
+                self.assertEqual(res.status_code, 200)
+                self.assertWithinQueryBudget(res)
+
+    def test_server_timing_header_and_slow_request_log(self):
+        res = self.client.get(reverse("properties_list"))
+        self.assertRegex(res["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ SQL", tpl;dur=[\d.]+, view;dur=')
+        self.assertGreater(res.wsgi_request.perf.template_ms, 0)
+
+        with override_settings(SLOW_REQUEST_MS=0), self.assertLogs("core.perf", "WARNING") as logs:
+            self.client.get(reverse("properties_list"))
+        self.assertIn("requête lente GET /properties/ (properties_list)", logs.output[0])
+
+
+class AsyncViewsTests(QueryBudgetMixin, TestCase):
+    ASYNC_VIEWS = ("properties_list", "property_detail", "contact_submit", "invest_contact_submit",
+                   "api_listings", "api_listing_detail", "api_map")
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for i in range(3):
+            listing = make_listing(str(i), latitude=46.81, longitude=-71.22, geohash=geo.encode(46.81, -71.22))
+            ListingPhoto.objects.create(listing=listing, sequence=1, url=f"https://img/{i}/1.jpg")
+        FetchLog.objects.create(items_total=3)
+
+    def test_views_are_async_and_perf_hooks_are_coroutines(self):
+        for name in self.ASYNC_VIEWS:
+            args = ["listing-1"] if "detail" in name else []
+            with self.subTest(name=name):
+                self.assertTrue(iscoroutinefunction(resolve(reverse(name, args=args)).func))
+        # La chaîne ASGI n'adapte aucun middleware maison (ni __call__ ni process_view)
+        handler = ASGIHandler()
+        perf_hooks = [m for m in handler._view_middleware if isinstance(getattr(m, "__self__", None), PerfMiddleware)]
+        self.assertEqual(len(perf_hooks), 1)
+        self.assertTrue(iscoroutinefunction(perf_hooks[0]))
+        self.assertNotIsInstance(perf_hooks[0], SyncToAsync)
+
+    async def test_no_sync_fallback_for_perf_middleware_over_asgi(self):
+        adapted = []
+        original = SyncToAsync.__call__
+
+        async def spy(self, *args, **kwargs):
+            adapted.append(self.func)
+            return await original(self, *args, **kwargs)
+
+        with mock.patch.object(SyncToAsync, "__call__", spy):
+            res = await self.async_client.get(reverse("api_listings"))
+        self.assertEqual(res.status_code, 200)
+        self.assertGreater(res.asgi_request.perf.view_ms, 0)
+        owners = [type(getattr(func, "__self__", None)).__module__ for func in adapted]
+        self.assertNotIn("core.perf", owners)
+
+    async def test_pages_over_asgi_within_budget(self):
+        for url in (reverse("properties_list") + "?page=2", reverse("property_detail", args=["listing-1"]),
+                    reverse("api_listings"), reverse("api_listing_detail", args=["listing-1"])):
+            with self.subTest(url=url):
+                res = await self.async_client.get(url)
+                self.assertEqual(res.status_code, 200)
+                self.assertWithinQueryBudget(res)
+        res = await self.async_client.get(reverse("property_detail", args=["nope"]))
+        self.assertEqual(res.status_code, 404)
+
+    async def test_templates_render_off_the_event_loop(self):
+        on_loop = []
+
+        def spy(*args, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return render(*args, **kwargs)
+
+        with mock.patch("core.views.render", spy):
+            for url in (reverse("properties_list"), reverse("property_detail", args=["listing-1"])):
+                self.assertEqual((await self.async_client.get(url)).status_code, 200)
+        self.assertEqual(on_loop, [False, False])
+
+    async def test_etag_and_methods_over_asgi(self):
+        url = reverse("api_listings")
+        etag = (await self.async_client.get(url))["ETag"]
+        self.assertEqual((await self.async_client.get(url, headers={"If-None-Match": etag})).status_code, 304)
+        self.assertEqual((await self.async_client.post(url)).status_code, 405)
+        self.assertEqual((await self.async_client.get(reverse("contact_submit"))).status_code, 405)
+
+    async def test_ndjson_streams_asynchronously(self):
+        res = await self.async_client.get(reverse("api_listings"), {"format": "ndjson"})
+        self.assertTrue(res.is_async)
+        lines = b"".join([chunk async for chunk in res.streaming_content]).decode().splitlines()
+        self.assertEqual(sorted(json.loads(l)["centris_id"] for l in lines), ["0", "1", "2"])
+
+    async def test_contact_submit_over_asgi(self):
+        form = {"name": "Ana", "email": "ana@example.com", "message": "Bonjour"}
+        with self.assertLogs("core.notifications", "WARNING"):
+            res = await self.async_client.post(reverse("invest_contact_submit"), form)
+        self.assertEqual(res.json(), {"success": True})
+        self.assertEqual((await ContactMessage.objects.aget()).message, "[Invest] Bonjour")
+
+
+class MetricsTests(TestCase):
+    def test_metrics_endpoint_exposes_requests_cache_and_import(self):
+        FetchLog.objects.create(items_total=10, items_added=3, items_updated=2, items_marked_sold=1,
+                                duration_seconds=12.5)
+        self.client.get(reverse("home"))
+        self.client.get(reverse("api_listings"))
+        self.client.get(reverse("api_listings"))
+
+        res = self.client.get("/metrics")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = res.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('http_request_duration_seconds_bucket{le="+Inf",view="home"}', body)
+        self.assertIn('http_responses_total{status="2xx",view="api_listings"}', body)
+        self.assertIn('cache_requests_total{cache="api",result="hit"}', body)
+        self.assertIn("centris_import_duration_seconds 12.5", body)
+        self.assertIn('centris_import_items{kind="added"} 3', body)
+        self.assertRegex(body, r"centris_import_age_seconds \d")
+
+    def test_metrics_restricted_to_allowed_ips(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.7").status_code, 403)
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            proxied = self.client.get("/metrics", REMOTE_ADDR="127.0.0.1", HTTP_X_FORWARDED_FOR="10.0.0.7")
+            self.assertEqual(proxied.status_code, 403)
+
+    def test_multiprocess_counters_are_summed(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        worker_a = metrics.Registry(directory, pid=101)
+        worker_b = metrics.Registry(directory, pid=102)
+        for worker in (worker_a, worker_b):
+            worker.observe("http_request_duration_seconds", {"view": "home"}, 0.02, metrics.LATENCY_BUCKETS)
+            worker.flush()
+        worker_a.observe("http_request_duration_seconds", {"view": "home"}, 3.0, metrics.LATENCY_BUCKETS)
+
+        body = metrics.render(worker_a.collect())
+        self.assertIn('http_request_duration_seconds_count{view="home"} 3.0', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="0.025",view="home"} 2.0', body)
+        self.assertIn('http_request_duration_seconds_bucket{le="5.0",view="home"} 3.0', body)
+
+    def test_request_flush_is_throttled(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        worker = metrics.Registry(directory, pid=103, flush_interval=5)
+        with mock.patch.object(worker, "flush", wraps=worker.flush) as flush, \
+                mock.patch("core.metrics.time.monotonic", side_effect=[1000.0, 1000.0, 1001.0, 1006.0, 1006.0]):
+            for _ in range(3):
+                worker.inc("http_responses_total", {"view": "home", "status": "2xx"})
+                worker.maybe_flush()
+        self.assertEqual(flush.call_count, 2)
+        with open(os.path.join(directory, "103.json")) as f:
+            self.assertEqual(json.load(f)[0][2], 3.0)
+
+
+class BenchViewsTests(TransactionTestCase):
+    def test_seed_run_and_compare(self):
+        call_command("seed_bench", listings=60, photos=2, agents=4, certifications=2, stdout=StringIO())
+        self.assertEqual(Listing.objects.filter(slug__startswith="bench-").count(), 60)
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = os.path.join(tmp, "run.json")
+        with self.assertLogs("core.notifications", "WARNING"):  # pas de Redis: envoi laissé en base
+            call_command("bench_views", target="all", requests=3, warmup=1, concurrency=1, json_path=path,
+                         stdout=StringIO())
+        with open(path) as f:
+            report = json.load(f)
+        for target in ("wsgi", "asgi"):
+            results = report["results"][target]
+            self.assertEqual(set(results), {"home", "properties_list", "property_detail", "collaborators",
+                                            "contact_submit", "invest_submit"})
+            self.assertEqual(sum(r["errors"] for r in results.values()), 0)
+            self.assertEqual(results["properties_list"]["queries_per_request"], 3.0)
+
+        # Référence plus sobre en SQL: la comparaison doit échouer
+        report["results"]["wsgi"]["properties_list"]["queries_per_request"] = 1.0
+        with open(path, "w") as f:
+            json.dump(report, f)
+        with self.assertRaisesMessage(CommandError, "wsgi/properties_list: SQL/req 1.0 → 3.0"):
+            call_command("bench_views", requests=3, warmup=0, concurrency=1, scenarios=["properties_list"],
+                         baseline=path, tolerance=100, stdout=StringIO())
+
+        call_command("seed_bench", clear=True, stdout=StringIO())
+        self.assertFalse(Listing.objects.exists())
+
+
+class PublishStaticTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for i in range(52):  # 2 pages de liste
+            make_listing(str(i), prix=100000 + i)
+        make_listing("old", status=Listing.STATUS_SOLD, sold_at=timezone.now() - timedelta(days=10))
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.root = os.path.join(tmp, "export")
+
+    def publish(self):
+        out = StringIO()
+        call_command("publish_static", root=self.root, workers=3, stdout=out)
+        return out.getvalue()
+
+    def path(self, rel):
+        return os.path.join(self.root, rel)
+
+    def test_export_rewrites_only_changed_pages(self):
+        self.assertIn("55 pages, 55 réécrites", self.publish())
+        self.assertTrue(os.path.islink(self.root))
+        first = os.path.realpath(self.root)
+        for url, rel in [("/", "index.html"), ("/properties/?page=2", "properties/page-2.html"),
+                         ("/properties/listing-7/", "properties/listing-7/index.html")]:
+            with self.subTest(url=url), open(self.path(rel), "rb") as fh:
+                self.assertEqual(fh.read(), self.client.get(url).content)
+        self.assertFalse(os.path.exists(self.path("properties/listing-old/index.html")))
+        with open(self.path("properties/page-1.html")) as fh:
+            self.assertIn('href="?page=2"', fh.read())
+        inode = os.stat(self.path("properties/listing-3/index.html")).st_ino
+
+        # Rien n'a changé: nouvelle version faite de liens vers l'ancienne
+        self.assertIn("55 pages, 0 réécrites", self.publish())
+        self.assertNotEqual(os.path.realpath(self.root), first)
+        self.assertEqual(os.stat(self.path("properties/listing-3/index.html")).st_ino, inode)
+
+        # Un prix change: sa fiche et sa page de liste seulement
+        Listing.objects.filter(slug="listing-51").update(prix=999999)
+        self.assertIn("55 pages, 2 réécrites", self.publish())
+        with open(self.path("properties/listing-51/index.html")) as fh:
+            self.assertIn("999", fh.read())
+        self.assertEqual(os.stat(self.path("properties/listing-3/index.html")).st_ino, inode)
+
+        self.publish()
+        self.assertEqual(len(os.listdir(self.root + ".releases")), publish.KEEP_RELEASES)
+        self.assertFalse(os.path.exists(first))
+
+    def test_failed_page_keeps_live_release(self):
+        self.publish()
+        live = os.path.realpath(self.root)
+        make_listing("broken", slug="broken")
+        with mock.patch.object(publish, "render_page", side_effect=publish.PublishError("/x/: HTTP 500")):
+            with self.assertRaisesMessage(CommandError, "HTTP 500"):
+                self.publish()
+        self.assertEqual(os.path.realpath(self.root), live)
+        self.assertEqual(os.listdir(self.root + ".releases"), [os.path.basename(live)])
+
+    @override_settings(STATIC_EXPORT_ROOT="")
+    def test_requires_root(self):
+        with self.assertRaisesMessage(CommandError, "STATIC_EXPORT_ROOT"):
+            call_command("publish_static", stdout=StringIO())
+
+
+class RetentionTests(TransactionTestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.archive = os.path.join(tmp, "archive")
+        override = override_settings(MEDIA_ROOT=os.path.join(tmp, "media"), ARCHIVE_ROOT=self.archive,
+                                     CATALOG_KEEP_RELEASES=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        old, recent = timezone.now() - timedelta(days=200), timezone.now() - timedelta(days=10)
+        derivatives = {"webp": [320]}
+        # Versions antérieures: la plus ancienne dépasse CATALOG_KEEP_RELEASES
+        self.older = CatalogRelease.objects.create(source_name="older")
+        gone = Listing.objects.create(release=self.older, centris_id="gone", slug="listing-gone")
+        ListingPhoto.objects.create(listing=gone, sequence=1, url="https://img/gone.jpg",
+                                    image_hash="d" * 64, derivatives=derivatives)
+        previous = CatalogRelease.objects.create(source_name="previous")
+        Listing.objects.create(release=previous, centris_id="old0", slug="listing-old0", prix=1)
+        for i, digest in enumerate(["a" * 64, "b" * 64, "c" * 64]):
+            listing = make_listing(f"old{i}", status=Listing.STATUS_SOLD, sold_at=old, description="x" * 5000)
+            ListingPhoto.objects.create(listing=listing, sequence=1, url=f"https://img/{i}.jpg",
+                                        image_hash=digest, derivatives=derivatives)
+        make_listing("recent", status=Listing.STATUS_SOLD, sold_at=recent)
+        active = make_listing("active")
+        ListingPhoto.objects.create(listing=active, sequence=1, url="https://img/0.jpg",
+                                    image_hash="a" * 64, derivatives=derivatives)  # dérivé partagé
+        for digest in ("a" * 64, "b" * 64, "c" * 64, "d" * 64):
+            default_storage.save(ListingPhoto.derivative_name(digest, 320, "webp"), ContentFile(b"webp"))
+
+        for _ in range(4):
+            FetchLog.objects.create(items_total=10, items_added=1, duration_seconds=2.0)
+        FetchLog.objects.update(created_at=old)
+        self.latest = FetchLog.objects.create(items_total=12)
+
+    def test_archives_old_sold_listings_and_rolls_up_fetchlogs(self):
+        out = StringIO()
+        call_command("apply_retention", dry_run=True, stdout=out)
+        self.assertIn("[dry-run] Versions du catalogue purgées: 1", out.getvalue())
+        self.assertIn("[dry-run] Fiches archivées: 3 (3 photos", out.getvalue())
+        self.assertEqual(Listing.objects.count(), 7)
+
+        out = StringIO()
+        call_command("apply_retention", stdout=out)
+        self.assertIn("Versions du catalogue purgées: 1 (1 dérivés supprimés)", out.getvalue())
+        self.assertIn("Fiches archivées: 3 (3 photos, 2 dérivés supprimés)", out.getvalue())
+        self.assertIn("FetchLog regroupés: 3 lignes supprimées", out.getvalue())
+        self.assertIn("Journal des changements compacté: 0 événements supprimés", out.getvalue())
+        self.assertIn("Mo récupérés", out.getvalue())
+        self.assertEqual(
+            sorted(ListingChange.objects.values_list("listing_id", "kind")),
+            [("old0", "REMOVED"), ("old1", "REMOVED"), ("old2", "REMOVED")],
+        )
+
+        # Fiches archivées supprimées de toutes les versions; version purgée sans lignes
+        self.assertEqual(sorted(Listing.objects.values_list("centris_id", flat=True)), ["active", "recent"])
+        self.assertEqual(CatalogRelease.objects.get(pk=self.older.pk).state, CatalogRelease.STATE_PRUNED)
+        with self.assertRaisesMessage(catalog.CatalogError, "purgée"):
+            catalog.rollback(to=self.older.pk)
+        self.assertEqual(ListingPhoto.objects.count(), 1)
+        self.assertTrue(default_storage.exists(ListingPhoto.derivative_name("a" * 64, 320, "webp")))
+        self.assertFalse(default_storage.exists(ListingPhoto.derivative_name("b" * 64, 320, "webp")))
+        self.assertFalse(default_storage.exists(ListingPhoto.derivative_name("d" * 64, 320, "webp")))
+
+        [name] = os.listdir(self.archive)
+        with gzip.open(os.path.join(self.archive, name), "rt", encoding="utf-8") as fh:
+            rows = [json.loads(line) for line in fh]
+        self.assertEqual(sorted(r["centris_id"] for r in rows), ["old0", "old1", "old2"])
+        old0 = next(r for r in rows if r["centris_id"] == "old0")
+        self.assertEqual(old0["photos"][0]["derivatives"], {"webp": [320]})
+
+        rolled = FetchLog.objects.exclude(pk=self.latest.pk).get()
+        self.assertEqual((rolled.items_added, rolled.duration_seconds), (4, 8.0))
+        self.assertTrue(FetchLog.objects.filter(pk=self.latest.pk).exists())
+
+
+def centris_zip(n_listings, n_photos=5, prix=300000, remarque="Belle propriété. "):
+    """ZIP au format du flux Centris (sans en-tête, cp1252), `n_listings` inscriptions."""
+    files = {"INSCRIPTIONS.TXT": [], "REMARQUES.TXT": [], "PHOTOS.TXT": []}
+    for i in range(n_listings):
+        row = [""] * 40
+        row[0], row[6], row[25], row[27], row[29] = f"C{i}", str(prix + i), str(i), "Rue du Test", "G1A 1A1"
+        row[30], row[31] = f"46.{800 + i % 100}", "-71.22"
+        files["INSCRIPTIONS.TXT"].append(row)
+        files["REMARQUES.TXT"].append([f"C{i}", "1", "F", "", "", "", remarque * 100])
+        files["PHOTOS.TXT"] += [[f"C{i}", str(s), "", "", "", "", f"https://img.example/{i}/{s}.jpg"]
+                                for s in range(1, n_photos + 1)]
+    buf = BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, rows in files.items():
+            text = StringIO()
+            csv.writer(text).writerows(rows)
+            z.writestr(name, text.getvalue().encode("cp1252"))
+    return buf.getvalue()
+
+
+# Lecteurs concurrents (4 threads) jusqu'à l'apparition de STOP_FILE
+PAGE_READERS = """
+import json, os, threading
+from core.bench import WSGIClient, timed
+client, stats = WSGIClient(), {"requests": 0, "errors": [], "max_ms": 0}
+def loop():
+    while not os.path.exists(os.environ["STOP_FILE"]):
+        for url in ("/properties/", "/properties/bench-1/", "/api/listings/?page=2"):
+            ms, (status, _, _) = timed(client.request, "GET", url)
+            stats["requests"] += 1
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            if status != 200:
+                stats["errors"].append(f"{status} {url}")
+threads = [threading.Thread(target=loop) for _ in range(4)]
+[t.start() for t in threads]
+[t.join() for t in threads]
+print(json.dumps(stats))
+"""
+
+
+class SQLiteProductionTests(SimpleTestCase):
+    """Base fichier dans des processus séparés, comme en production (gunicorn + import cron)."""
+
+    def manage(self, *args, **kwargs):
+        return subprocess.run([sys.executable, "manage.py", *args], cwd=settings.BASE_DIR, env=self.env,
+                              capture_output=True, text=True, timeout=300, **kwargs)
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.db = os.path.join(tmp, "site.sqlite3")
+        self.stop_file = os.path.join(tmp, "stop")
+        self.env = {
+            **os.environ, "DB_NAME": self.db, "SQLITE_PROFILE": "production", "STOP_FILE": self.stop_file,
+            "DEBUG": "False", "ALLOWED_HOSTS": "localhost", "SECURE_SSL_REDIRECT": "False",
+            "PROMETHEUS_MULTIPROC_DIR": "",
+        }
+        for command in (["migrate"], ["seed_bench", "--listings", "200", "--photos", "2"]):
+            self.assertEqual(self.manage(*command).returncode, 0)
+
+    def test_pages_never_locked_during_full_import(self):
+        index = b'<a href="NOMADESMARKETING20260101.zip">NOMADESMARKETING20260101.zip</a>'
+        files = {"/centris/": index, "/centris/NOMADESMARKETING20260101.zip": centris_zip(1500)}
+        with ImageServer(files) as server:
+            readers = subprocess.Popen([sys.executable, "manage.py", "shell", "-c", PAGE_READERS],
+                                       cwd=settings.BASE_DIR, env=self.env, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, text=True)
+            try:
+                # Les 200 fiches bench disparaissent du flux: au-delà du seuil de publication
+                result = self.manage("import_centris", "--base-url", f"{server.url}/centris/",
+                                     "--retries", "1", "--no-photos", "--force")
+            finally:
+                open(self.stop_file, "w").close()
+                out, err = readers.communicate(timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Import Centris OK: total=1500 +1500", result.stdout)
+
+        stats = json.loads(out.strip().splitlines()[-1])
+        self.assertGreater(stats["requests"], 0)
+        self.assertEqual(stats["errors"], [])
+        self.assertNotIn("database is locked", err)
+        # En journal DELETE, les lecteurs attendent le commit de l'import (plusieurs secondes)
+        self.assertLess(stats["max_ms"], 1500)
+
+        with sqlite3.connect(self.db) as db:
+            self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            live = "SELECT count(*) FROM core_listing WHERE release_id = (SELECT release_id FROM core_livecatalog)"
+            self.assertEqual(db.execute(live).fetchone()[0], 1700)
+            # Les 200 fiches bench restent dans la version précédente (retour possible)
+            self.assertEqual(db.execute("SELECT count(*) FROM core_listing").fetchone()[0], 1900)
+        self.assertEqual(os.path.getsize(self.db + "-wal"), 0)  # checkpoint TRUNCATE après l'import
+
+
+class CatalogReleaseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        index = b'<a href="NOMADESMARKETING20260101.zip">NOMADESMARKETING20260101.zip</a>'
+        self.server = ImageServer({"/centris/": index})
+        self.enterContext(self.server)
+
+    def import_feed(self, n_listings, *args, **zip_options):
+        self.server.images["/centris/NOMADESMARKETING20260101.zip"] = centris_zip(n_listings, n_photos=1, **zip_options)
+        call_command("import_centris", f"--base-url={self.server.url}/centris/", "--retries=1", "--no-photos",
+                     *args, stdout=StringIO(), stderr=StringIO())
+
+    def statuses(self):
+        return dict(Listing.objects.live().values_list("centris_id", "status"))
+
+    def test_truncated_feed_rejected_then_import_undone(self):
+        self.import_feed(10)
+        before = self.statuses()
+
+        # INSCRIPTIONS.TXT tronqué: la moitié des fiches disparaîtrait
+        with self.assertRaisesMessage(CommandError, "5/10 fiches actives disparues (50 % > 20 %)"):
+            self.import_feed(5)
+        self.assertEqual(self.statuses(), before)
+        self.assertEqual(FetchLog.objects.count(), 1)
+        self.assertEqual(CatalogRelease.objects.get(state=CatalogRelease.STATE_REJECTED).items_marked_sold, 5)
+        self.assertEqual(Listing.objects.count(), 10)  # lignes de la version rejetée annulées avec elle
+
+        self.import_feed(5, "--force")
+        sold = {k: v for k, v in self.statuses().items() if v == Listing.STATUS_SOLD}
+        self.assertEqual(len(sold), 5)
+
+        # 5 fiches reviennent, 2 nouvelles; puis annulation de cet import
+        self.import_feed(12)
+        latest = catalog.live_release()
+        self.assertEqual(Listing.objects.live().filter(status=Listing.STATUS_ACTIVE).count(), 12)
+        new = Listing.objects.live().get(centris_id="C11")
+        ListingPhoto.objects.filter(listing=new).update(image_hash="a" * 64, derivatives={"webp": [320]})
+        url = reverse("api_listings")
+        etag = self.client.get(url)["ETag"]
+        out = StringIO()
+        call_command("undo_import", note="test", stdout=out)
+        self.assertIn(f"remis en ligne à la place de #{latest.pk}", out.getvalue())
+        self.assertEqual({k: v for k, v in self.statuses().items() if v == Listing.STATUS_SOLD}, sold)
+        # Les nouvelles ne sont pas dans la version remise en ligne; leurs lignes restent dans l'annulée
+        self.assertNotIn("C11", self.statuses())
+        self.assertEqual(Listing.objects.filter(centris_id="C11").count(), 1)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["count"], 10)  # vendues depuis ≤ 3 jours comprises
+        self.assertEqual(self.client.get(reverse("api_listing_detail", args=[new.slug])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("property_detail", args=[new.slug])).status_code, 404)
+
+        # Plusieurs versions en arrière, jusqu'au premier import
+        call_command("undo_import", stdout=StringIO())
+        self.assertEqual(self.statuses(), before)
+        with self.assertRaisesMessage(CommandError, "aucune version à remettre en ligne"):
+            call_command("undo_import", stdout=StringIO())
+
+        # Retour à la version annulée (--to): nouvelles fiches et dérivés de leurs photos
+        out = StringIO()
+        call_command("undo_import", "--list", stdout=out)
+        self.assertIn(f"#{latest.pk} ", out.getvalue())
+        call_command("undo_import", f"--to={latest.pk}", stdout=StringIO())
+        self.assertEqual(Listing.objects.live().filter(status=Listing.STATUS_ACTIVE).count(), 12)
+        self.assertEqual(ListingPhoto.objects.get(listing__in=Listing.objects.live(), listing__centris_id="C11").image_hash,
+                         "a" * 64)
+        self.assertEqual(
+            list(CatalogRelease.objects.order_by("pk").values_list("state", flat=True)),
+            ["ROLLED_BACK", "REJECTED", "ROLLED_BACK", "LIVE"],
+        )
+        self.import_feed(12)
+        self.assertEqual(catalog.live_release().parent, latest)
+
+    def test_rollback_restores_prices_and_descriptions(self):
+        self.import_feed(3)
+        good = catalog.live_release()
+        self.import_feed(3, prix=900000, remarque="Flux erroné. ")
+        detail = reverse("api_listing_detail", args=["listing-C0"])
+        data = self.client.get(detail).json()
+        self.assertEqual(data["prix"], 900000)
+        self.assertIn("Flux erroné.", data["description"])
+
+        with CaptureQueriesContext(connection) as queries:
+            catalog.rollback(note="prix erronés")
+        # Bascule du pointeur: aucune fiche ni photo réécrite
+        writes = [q["sql"] for q in queries.captured_queries
+                  if re.match(r'(UPDATE|INSERT INTO|DELETE FROM) "?core_listing(photo)?"?\s', q["sql"])]
+        self.assertEqual(writes, [])
+        self.assertEqual(catalog.live_release(), good)
+
+        listing = Listing.objects.live().get(centris_id="C0")
+        self.assertEqual(listing.prix, 300000)
+        self.assertIn("Belle propriété.", listing.description)
+        data = self.client.get(detail).json()  # clé de cache versionnée par le pointeur
+        self.assertEqual(data["prix"], 300000)
+        self.assertNotIn("Flux erroné.", data["description"])
+        self.assertContains(self.client.get(reverse("property_detail", args=["listing-C0"])), "Belle propriété.")
+        self.assertEqual(
+            sorted(Listing.objects.live().values_list("prix", flat=True)), [300000, 300001, 300002],
+        )
+
+
+class ImportLoaderTests(TestCase):
+    def test_copy_text_escapes_and_nulls(self):
+        class Raw:
+            def copy_expert(self, sql, buf):
+                self.sql, self.data = sql, buf.read()
+
+        raw = Raw()
+        pgload._copy_text(raw, "COPY t (a, b, c, d) FROM STDIN", [["a\tb", None, "x\\y\nz", 2.5]])
+        self.assertEqual(raw.data, "a\\tb\t\\N\tx\\\\y\\nz\t2.5\n")
+
+    def test_sqlite_uses_generic_loader(self):
+        self.assertFalse(pgload.supported())
+        out = StringIO()
+        call_command("bench_import", listings=40, photos=2, stdout=out)
+        self.assertIn("sqlite / orm: 40 fiches", out.getvalue())
+        self.assertIn("+40 ~0 sold=0", out.getvalue())
+        self.assertIn("+0 ~39 sold=1", out.getvalue())
+        self.assertFalse(Listing.objects.exists())  # rollback
+        with self.assertRaisesMessage(CommandError, "PostgreSQL seulement"):
+            call_command("bench_import", listings=10, loader="copy", stdout=StringIO())
+
+    def test_feed_files_are_read_once_whatever_the_listing_count(self):
+        read = zipfile.ZipFile.read
+        with zipfile.ZipFile(BytesIO(synthetic_zip(300, 2))) as z, \
+                mock.patch.object(zipfile.ZipFile, "read", autospec=True, side_effect=read) as spy:
+            records = list(parse_feed(z))
+        self.assertEqual(len(records), 300)
+        names = [call.args[1] for call in spy.call_args_list]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("ADDENDA.TXT", names)
+        expected = next(synthetic_records(300, 2))
+        self.assertEqual(records[0].photos, expected.photos)
+        self.assertEqual(records[0].fields["caracteristiques"], expected.fields["caracteristiques"])
+        self.assertEqual(records[0].fields["proximites"], ["École", "Parc"])
+
+
+@skipUnless(connection.vendor == "postgresql", "MERGE_SQL: PostgreSQL seulement (DB_ENGINE)")
+class PgLoadTests(TestCase):
+    def feed(self, generation):
+        records = list(synthetic_records(60, 2, generation))
+        # Doublon: la dernière occurrence d'un ID l'emporte, comme dans orm_load()
+        first = records[3]
+        stale = Record(first.centris_id, {**first.fields, "prix": 1}, first.latitude, first.longitude,
+                       [(1, "https://img.example/stale.jpg")])
+        return [stale] + records
+
+    def snapshot(self, load):
+        """État après deux imports avec `load`, puis annulé."""
+        state = {}
+        with transaction.atomic():
+            for generation in (0, 1):
+                release = catalog.fork(CatalogRelease(source_name="test"))
+                state[generation] = load(iter(self.feed(generation)), release, timezone.now())
+                catalog.publish(release)
+                if generation == 0:
+                    ListingPhoto.objects.update(image_hash="h", derivatives={"webp": ["x"]})
+            live = Listing.objects.live()
+            state["listings"] = sorted(live.values_list("centris_id", "status", "prix", "geohash", "proximites"))
+            state["photos"] = sorted(ListingPhoto.objects.filter(listing__in=live).values_list(
+                "listing__centris_id", "sequence", "url", "image_hash"))
+            # Fiches dont le contenu a changé au second import, et elles seules
+            state["revised"] = sorted(live.filter(revision=release.pk).values_list("centris_id", flat=True))
+            state["events"] = sorted(ListingChange.objects.values_list("listing_id", "kind", "prix_before"))
+            transaction.set_rollback(True)
+        return state
+
+    def test_merge_sql_matches_orm_load(self):
+        copied = self.snapshot(pgload.load)
+        self.assertEqual(copied, self.snapshot(orm_load))
+        self.assertEqual(copied[0]["added"], 60)
+        self.assertEqual(copied[1]["marked_sold"], 1)
+        prix = dict((row[0], row[2]) for row in copied["listings"])
+        self.assertNotEqual(prix["X0000003"], 1)
+        # Photos inchangées: dérivés gardés; photos changées: à recalculer
+        hashes = {(row[0], row[2]): row[3] for row in copied["photos"]}
+        self.assertEqual(hashes[("X0000002", "https://img.example/2/1-0.jpg")], "h")
+        self.assertEqual(hashes[("X0000020", "https://img.example/20/1-1.jpg")], "")
+
+
+# Un client sans écriture, puis un client qui écrit (formulaire de contact)
+REPLICA_CLIENTS = """
+import json
+from django.test import Client
+from core.replicas import STICKY_COOKIE
+reader, writer = Client(), Client()
+form = {"name": "Ana", "email": "ana@example.com", "message": "Bonjour"}
+print(json.dumps({
+    "detail": reader.get("/properties/listing-P1/").status_code,
+    "api_count": reader.get("/api/listings/").json()["count"],
+    "submit": writer.post("/contact/submit/", form).json(),
+    "sticky_cookie": STICKY_COOKIE in writer.cookies,
+    "writer_detail": writer.get("/properties/listing-P1/").status_code,
+    "reader_detail": reader.get("/properties/listing-P1/").status_code,
+}))
+"""
+
+
+class ReadReplicaTests(SimpleTestCase):
+    """Réplica = copie du fichier SQLite primaire, figée avant la dernière écriture (retard)."""
+
+    def manage(self, *args, replica_url):
+        env = {
+            **os.environ, "DB_NAME": self.primary, "DB_REPLICA_URLS": replica_url,
+            "DEBUG": "False", "ALLOWED_HOSTS": "testserver", "SECURE_SSL_REDIRECT": "False",
+            "PROMETHEUS_MULTIPROC_DIR": "",
+        }
+        result = subprocess.run([sys.executable, "manage.py", *args], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.primary, self.replica = os.path.join(tmp, "primary.sqlite3"), os.path.join(tmp, "replica.sqlite3")
+        self.replica_url = f"sqlite:///{self.replica}"
+        self.manage("migrate", replica_url=self.replica_url)
+        self.manage("seed_bench", "--listings", "5", "--photos", "1", replica_url=self.replica_url)
+        shutil.copyfile(self.primary, self.replica)
+        self.manage("shell", "-c", "from django.utils import timezone; from core import catalog; "
+                    "from core.models import Listing; Listing.objects.create(release=catalog.live_release(), "
+                    "centris_id='P1', slug='listing-P1', last_seen_at=timezone.now())",
+                    replica_url=self.replica_url)
+
+    def count(self, path, table):
+        with sqlite3.connect(path) as db:
+            return db.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+
+    def test_public_reads_on_replica_writes_and_sticky_reads_on_primary(self):
+        out = json.loads(self.manage("shell", "-c", REPLICA_CLIENTS, replica_url=self.replica_url).stdout)
+        self.assertEqual(out["detail"], 404)       # pas encore « répliqué »
+        self.assertEqual(out["api_count"], 5)
+        self.assertEqual(out["submit"], {"success": True})
+        self.assertTrue(out["sticky_cookie"])
+        self.assertEqual(out["writer_detail"], 200)  # collé au primaire après son écriture
+        self.assertEqual(out["reader_detail"], 404)
+        self.assertEqual(self.count(self.primary, "core_contactmessage"), 1)
+        self.assertEqual(self.count(self.replica, "core_contactmessage"), 0)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        missing = f"sqlite:///{os.path.dirname(self.primary)}/absent/replica.sqlite3"
+        result = self.manage("shell", "-c", REPLICA_CLIENTS, replica_url=missing)
+        self.assertEqual(json.loads(result.stdout)["detail"], 200)
+        self.assertIn("réplica replica1 injoignable", result.stderr)
+
+
+class ReplicaHealthTests(SimpleTestCase):
+    def test_failed_probe_is_cached_and_not_repeated_concurrently(self):
+        health, calls = replicas.Health(), []
+        started, release = threading.Event(), threading.Event()
+
+        def probe(alias):
+            calls.append(alias)
+            started.set()
+            release.wait(5)
+            return None
+
+        with mock.patch.object(replicas.Health, "probe", staticmethod(probe)), \
+                self.assertLogs("core.replicas", "WARNING"):
+            worker = threading.Thread(target=health.lag, args=["replica1"])
+            worker.start()
+            started.wait(5)
+            self.assertIsNone(health.lag("replica1"))  # sonde en cours: primaire, sans attendre
+            release.set()
+            worker.join()
+            self.assertIsNone(health.lag("replica1"))  # échec gardé pour l'intervalle
+        self.assertEqual(calls, ["replica1"])
+
+    def test_replica_connections_have_a_connect_timeout(self):
+        env = {**os.environ, "DB_REPLICA_URLS": "postgres://site:pw@10.255.255.1:5432/site,sqlite:////tmp/r.sqlite3",
+               "DB_REPLICA_CONNECT_TIMEOUT": "3"}
+        code = "from django.conf import settings as s; print(s.DATABASES['replica1']['OPTIONS'], " \
+               "s.DATABASES['replica2']['OPTIONS'])"
+        result = subprocess.run([sys.executable, "manage.py", "shell", "-c", code], cwd=settings.BASE_DIR,
+                                env=env, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.stdout.strip(), "{'connect_timeout': 3} {'timeout': 3}", result.stderr)
+
+
+class AdminLargeTableTests(TestCase):
+    """Changelists admin sur 100 000 fiches: pas de COUNT(*) plein, pas de <select> géant."""
+
+    N_LISTINGS = 100000
+    MAX_SECONDS = 1.0
+
+    @classmethod
+    def setUpTestData(cls):
+        bench.seed(cls.N_LISTINGS, 1)  # ANALYZE compris: estimations disponibles
+        cls.admin_user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+
+    def timed_get(self, url, **params):
+        start = time.perf_counter()
+        response = self.client.get(url, params)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, self.MAX_SECONDS, f"{url} {params}: {elapsed:.2f} s")
+        return response
+
+    def test_changelists_use_estimate_and_lean_columns(self):
+        self.assertGreaterEqual(admin_site.estimated_count(Listing), admin_site.ESTIMATE_THRESHOLD)
+        response = self.timed_get(reverse("admin:core_listing_changelist"))
+        self.assertIsInstance(response.context["cl"].paginator, admin_site.EstimatedCountPaginator)
+        self.assertNotIn("description", str(response.context["cl"].result_list.query))
+        self.timed_get(reverse("admin:core_listingphoto_changelist"))
+        self.timed_get(reverse("admin:core_fetchlog_changelist"))
+
+    def test_prefix_search_on_ids(self):
+        response = self.timed_get(reverse("admin:core_listing_changelist"), q="B00012")
+        self.assertEqual(response.context["cl"].result_count, 100)
+        response = self.timed_get(reverse("admin:core_listingphoto_changelist"), q="B000123")
+        self.assertEqual(response.context["cl"].result_count, 10)
+        response = self.timed_get(reverse("admin:core_listing_changelist"), q="Banc")  # adresse: icontains
+        self.assertTrue(response.context["cl"].result_count)
+
+    def test_photo_form_has_no_listing_select(self):
+        photo = ListingPhoto.objects.first()
+        response = self.timed_get(reverse("admin:core_listingphoto_change", args=[photo.pk]))
+        self.assertContains(response, "admin-autocomplete")
+        self.assertLess(response.content.count(b"<option"), 50)
+        response = self.timed_get(reverse("admin:autocomplete"), app_label="core", model_name="listingphoto",
+                                  field_name="listing", term="B0000099")
+        listing = Listing.objects.get(centris_id="B0000099")  # une seule version: celle du bench
+        self.assertEqual([r["id"] for r in response.json()["results"]], [str(listing.pk)])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(self.admin_user)
+        make_listing("100", prix=350000, adresse="1, Rue de l'Église", description="long texte")
+        make_listing("200", status=Listing.STATUS_SOLD, sold_at=timezone.now())
+        ContactMessage.objects.create(name="Élise", email="e@example.com", message="Bonjour,\nune visite?")
+
+    def action(self, model_name, action, **params):
+        data = {"action": action, "select_across": "1", "index": "0", "_selected_action": ["x"]}
+        url = reverse(f"admin:core_{model_name}_changelist")
+        response = self.client.post(f"{url}?{urlencode(params)}", data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_admin_actions_stream_filtered_queryset(self):
+        body = self.action("listing", "export_csv", status__exact="ACTIVE")
+        rows = list(csv.reader(StringIO(body.lstrip("\ufeff"))))
+        self.assertEqual(rows[0], list(export.EXPORT_FIELDS[Listing]))
+        self.assertEqual([r[0] for r in rows[1:]], ["100"])
+        self.assertEqual(rows[1][3], "1, Rue de l'Église")
+        self.assertNotIn("long texte", body)
+
+        lines = self.action("contactmessage", "export_ndjson").splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["message"], "Bonjour,\nune visite?")
+
+    def test_csv_neutralizes_formulas(self):
+        formula = '=HYPERLINK("http://x","y")'
+        ContactMessage.objects.create(name=formula, email="x@example.com", phone="+1 514", message="@cmd")
+        rows = list(csv.reader(StringIO(self.action("contactmessage", "export_csv").lstrip("\ufeff"))))
+        header, row = rows[0], rows[-1]
+        self.assertEqual(row[header.index("name")], "'" + formula)
+        self.assertEqual(row[header.index("phone")], "'+1 514")
+        self.assertEqual(row[header.index("message")], "'@cmd")
+        self.assertEqual(rows[1][header.index("name")], "Élise")
+        ndjson = self.action("contactmessage", "export_ndjson").splitlines()
+        self.assertEqual(json.loads(ndjson[-1])["name"], formula)
+
+    def test_command_to_file_and_stdout(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        path = os.path.join(tmp, "fiches.csv")
+        call_command("export_data", "listings", output=path, stderr=StringIO())
+        with open(path, encoding="utf-8-sig", newline="") as fh:
+            self.assertEqual([r["centris_id"] for r in csv.DictReader(fh)], ["100", "200"])
+
+        out = StringIO()
+        call_command("export_data", "listings", format="ndjson", status="SOLD", stdout=out, stderr=StringIO())
+        self.assertEqual([json.loads(line)["centris_id"] for line in out.getvalue().splitlines()], ["200"])
+        with self.assertRaisesMessage(CommandError, "--status ne s'applique qu'aux fiches"):
+            call_command("export_data", "contacts", status="SOLD", stdout=out, stderr=StringIO())
+
+    def test_memory_stays_flat(self):
+        def peak(n):
+            ContactMessage.objects.all().delete()
+            ContactMessage.objects.bulk_create(
+                ContactMessage(name=f"Client {i}", email="c@example.com", message="m" * 200) for i in range(n)
+            )
+            tracemalloc.start()
+            try:
+                count = sum(1 for _ in export.lines(ContactMessage.objects.order_by("pk"), "ndjson"))
+                return count, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        small_count, small = peak(2 * export.EXPORT_CHUNK_SIZE)
+        large_count, large = peak(10 * export.EXPORT_CHUNK_SIZE)
+        self.assertEqual(large_count, 10 * export.EXPORT_CHUNK_SIZE)
+        self.assertLess(large, 1.5 * small)
+
+
+class SitemapTests(TestCase):
+    NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        for i in range(5):
+            make_listing(str(i))
+        make_listing("90", status=Listing.STATUS_SOLD, sold_at=timezone.now() - timedelta(days=10))
+        FetchLog.objects.create(items_total=5)
+
+    def get_xml(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, ElementTree.fromstring(body)
+
+    def locs(self, root):
+        return [el.text for el in root.iter(f"{self.NS}loc")]
+
+    @mock.patch("core.sitemaps.SITEMAP_PAGE_SIZE", 2)
+    def test_index_and_paged_listing_sitemaps(self):
+        response, root = self.get_xml(reverse("sitemap"))
+        self.assertEqual(root.tag, f"{self.NS}sitemapindex")
+        self.assertEqual(self.locs(root), [
+            "http://testserver/sitemap-pages.xml", "http://testserver/sitemap-listings-1.xml",
+            "http://testserver/sitemap-listings-2.xml", "http://testserver/sitemap-listings-3.xml",
+        ])
+        _, root = self.get_xml(reverse("sitemap_section", args=["pages"]))
+        self.assertEqual(self.locs(root), [f"http://testserver{reverse(n)}" for n in
+                                           ("home", "contact", "collaborators", "invest", "about")])
+
+        slugs = []
+        for n in (1, 2, 3):
+            response, root = self.get_xml(reverse("sitemap_section", args=[f"listings-{n}"]))
+            self.assertTrue(response.streaming)
+            slugs += [loc.rsplit("/", 2)[1] for loc in self.locs(root)]
+            self.assertEqual(len(list(root.iter(f"{self.NS}lastmod"))), len(self.locs(root)))
+        self.assertEqual(slugs, [f"listing-{i}" for i in range(5)])  # vendue depuis 10 jours: absente
+        self.assertEqual(self.client.get(reverse("sitemap_section", args=["listings-4"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("sitemap_section", args=["autre"])).status_code, 404)
+
+        # 2e lecture: depuis le cache, sans lire les fiches
+        with self.assertNumQueries(1):
+            response, root = self.get_xml(reverse("sitemap_section", args=["listings-1"]))
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(self.locs(root)), 2)
+
+    def test_conditional_get_until_next_import(self):
+        response, _ = self.get_xml(reverse("sitemap"))
+        etag = response["ETag"]
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse("sitemap"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        make_listing("500")
+        FetchLog.objects.create(items_total=6)
+        response, root = self.get_xml(reverse("sitemap_section", args=["listings-1"]), HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn("http://testserver/properties/listing-500/", self.locs(root))
+
+
+class ListingChangeTests(TestCase):
+    def load(self, generation):
+        release = catalog.fork(CatalogRelease())
+        orm_load(synthetic_records(100, 2, generation), release, timezone.now())
+        return catalog.publish(release)
+
+    def sync(self, since, limit):
+        """Suit les pages de /api/changes/ comme un client; retourne (événements, dernier curseur)."""
+        events = []
+        while True:
+            data = self.client.get(reverse("api_changes"), {"since": since, "limit": limit}).json()
+            events += data["changes"]
+            since = data["next"]
+            if not data["has_more"]:
+                return events, since
+
+    def test_import_records_only_deltas(self):
+        self.load(0)
+        events, cursor = self.sync(0, 40)
+        self.assertEqual(len(events), 100)
+        self.assertEqual({e["kind"] for e in events}, {"CREATED"})
+        self.assertEqual(events[0]["listing"]["slug"], "listing-X0000000")
+
+        # 2 % disparues, 2 % nouvelles, 10 % de prix, 5 % de photos
+        self.load(1)
+        events, cursor = self.sync(cursor, 7)
+        by_kind = {}
+        for e in events:
+            by_kind.setdefault(e["kind"], []).append(e["centris_id"])
+        self.assertEqual(by_kind["CREATED"], ["X0000100", "X0000101"])
+        self.assertEqual(by_kind["SOLD"], ["X0000001", "X0000051"])
+        self.assertEqual(by_kind["UPDATED"], [f"X{i:07d}" for i in range(0, 100, 10)])
+        self.assertEqual(by_kind["PHOTOS"], [f"X{i:07d}" for i in range(0, 100, 20)])
+        price = next(e for e in events if e["centris_id"] == "X0000010" and e["kind"] == "UPDATED")
+        self.assertEqual((price["prix_before"], price["listing"]["prix"]), (200010, 201010))
+        self.assertEqual(self.sync(cursor, 7), ([], cursor))
+
+        # Version d'avant remise en ligne: un événement par fiche qui diffère
+        catalog.rollback()
+        events, cursor = self.sync(cursor, 100)
+        self.assertEqual(sorted((e["kind"], e["centris_id"], e["listing"] is None) for e in events), [
+            ("REMOVED", "X0000100", True), ("REMOVED", "X0000101", True),
+        ] + sorted(
+            ("UPDATED", f"X{i:07d}", False) for i in [1, 51] + list(range(0, 100, 10))
+        ))
+        price = next(e for e in events if e["centris_id"] == "X0000010")
+        self.assertEqual((price["prix_before"], price["listing"]["prix"]), (201010, 200010))
+        self.assertEqual(self.client.get(reverse("api_changes"), {"since": "x"}).status_code, 400)
+
+    def test_compaction_keeps_latest_event_per_listing(self):
+        self.load(0)
+        self.load(1)
+        total = ListingChange.objects.count()
+        self.assertEqual(changes.compact(), 0)  # événements récents: rien ne bouge
+
+        later = timezone.now() + timedelta(days=31)
+        self.assertEqual(changes.compact(later, dry_run=True), total - 102)
+        self.assertEqual(changes.compact(later), total - 102)
+        latest = dict(ListingChange.objects.values_list("listing_id", "kind"))
+        self.assertEqual(len(latest), 102)
+        self.assertEqual((latest["X0000000"], latest["X0000001"], latest["X0000002"]), ("PHOTOS", "SOLD", "CREATED"))
+        events, _ = self.sync(0, 500)  # client parti longtemps: l'état final de chaque fiche
+        self.assertEqual(len(events), 102)
+
+
+class SavedSearchAlertTests(TestCase):
+    def load(self, generation):
+        release = catalog.fork(CatalogRelease())
+        orm_load(synthetic_records(100, 1, generation), release, timezone.now())
+        return catalog.publish(release)
+
+    def test_index_agrees_with_direct_evaluation(self):
+        rnd = random.Random(7)
+        searches = list(synthetic_searches(400, rnd))
+        for pk, search in enumerate(searches, 1):
+            search.pk = pk
+            if pk % 10 == 0 and search.prix_min is not None and search.prix_max is not None:
+                # Intervalle inversé (refusé en base): ne correspond à rien
+                search.prix_min, search.prix_max = search.prix_max, search.prix_min
+        index = alerts.SearchIndex(
+            (s.pk, s.prix_min, s.prix_max, s.chambres_min, s.sdb_min, s.codes, s.texte) for s in searches
+        )
+        for listing in synthetic_listings(60, rnd):
+            self.assertEqual(index.match(listing), {s.pk for s in searches if alerts.matches_naive(s, listing)})
+        self.assertEqual(index.match({"prix": None}), {s.pk for s in searches if alerts.matches_naive(s, {})})
+        inverted = {s.pk for s in searches if s.pk % 10 == 0 and s.prix_max is not None and s.prix_min is not None}
+        self.assertTrue(inverted)
+        for prix in range(0, 1500000, 5000):
+            self.assertFalse(index.match({"prix": prix}) & inverted)
+
+    def test_inverted_price_range_is_rejected(self):
+        search = SavedSearch(email="a@example.com", prix_min=300000, prix_max=200000)
+        with self.assertRaises(ValidationError):
+            search.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            search.save()
+        SavedSearch.objects.create(email="a@example.com", prix_min=200000, prix_max=200000)
+
+    def test_import_delta_matches_are_batched_and_sent_once(self):
+        self.load(1)  # prix +1000 pour i % 10 == 0, X0000001 et X0000051 absentes
+        narrow = SavedSearch.objects.create(email="a@example.com", name="Budget", prix_min=200000, prix_max=200020)
+        SavedSearch.objects.create(email="b@example.com", prix_min=200050, chambres_min=1,
+                                   codes=["ALLE:Asphalte", "PROX:Parc"], texte="rue du BANC")
+        SavedSearch.objects.create(email="c@example.com", active=False)
+        release = self.load(0)  # baisses de prix et 2 nouvelles fiches
+
+        with mock.patch("core.alerts.django_rq.get_queue") as get_queue:
+            self.assertEqual(alerts.run(release), {"matches": 5, "jobs": 1})
+        (func, ids), _ = get_queue.return_value.enqueue.call_args
+        self.assertEqual(func, alerts.deliver)
+        self.assertEqual(
+            sorted(SavedSearchMatch.objects.filter(search=narrow).values_list("kind", "listing_id", "prix_before")),
+            [("NEW", "X0000001", None), ("PRICE_DROP", "X0000000", 201000),
+             ("PRICE_DROP", "X0000010", 201010), ("PRICE_DROP", "X0000020", 201020)],
+        )
+        self.assertEqual(list(SavedSearchMatch.objects.exclude(search=narrow).values_list("listing_id", flat=True)),
+                         ["X0000051"])
+
+        alerts.deliver(ids)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["a@example.com", "b@example.com"])
+        body = next(m.body for m in mail.outbox if m.to == ["a@example.com"])
+        self.assertIn("Baisse de prix [Budget]", body)
+        self.assertIn("/properties/listing-X0000010/", body)
+        self.assertFalse(SavedSearchMatch.objects.filter(notified_at=None).exists())
+
+        # Même version réévaluée: rien de nouveau
+        with mock.patch("core.alerts.django_rq.get_queue") as get_queue:
+            self.assertEqual(alerts.run(release), {"matches": 0, "jobs": 0})
+        get_queue.return_value.enqueue.assert_not_called()
+
+    def test_without_redis_alerts_wait_in_database(self):
+        SavedSearch.objects.create(email="a@example.com", prix_max=200010)
+        with self.assertLogs("core.alerts", "WARNING"):
+            self.assertEqual(alerts.run(self.load(0)), {"matches": 11, "jobs": 0})
+        call_command("send_notifications", stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("11 fiche(s)", mail.outbox[0].subject)
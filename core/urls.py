@@ -1,6 +1,6 @@
 # core/urls.py
 from django.urls import path
-from . import views
+from . import api, metrics, sitemaps, views
 
 urlpatterns = [
     path('', views.index, name='home'),
@@ -11,5 +11,51 @@ urlpatterns = [
     path("a-propos/", views.a_propos, name="about"),
     path("properties/", views.properties_list, name="properties_list"),
     path("contact/submit/", views.contact_submit, name="contact_submit"),
+    path("csrf/", views.csrf_token, name="csrf_token"),
     path("properties/<slug:slug>/", views.property_detail, name="property_detail"),
-]
\ No newline at end of file
+
+    # API JSON (lecture seule)
+    path("api/listings/", api.listings, name="api_listings"),
+    path("api/listings/<slug:slug>/", api.listing_detail, name="api_listing_detail"),
+    path("api/map/", api.listings_map, name="api_map"),
+    path("api/changes/", api.listing_changes, name="api_changes"),
+
+    # Sitemaps (index + enfants paginés, core/sitemaps.py)
+    path("sitemap.xml", sitemaps.index, name="sitemap"),
+    path("sitemap-<slug:section>.xml", sitemaps.section, name="sitemap_section"),
+
+    # Prometheus (format texte, réservé à METRICS_ALLOWED_IPS)
+    path("metrics", metrics.metrics_view, name="metrics"),
+]
+# Budget de requêtes SQL par nom d'URL (cache froid, utilisateur anonyme).
+# Dépassement: avertissement "core.perf" en prod, échec dans core/tests.py.
+QUERY_BUDGETS = {
+    "home": 1,
+    "contact": 0,
+    "csrf_token": 0,
+    "collaborators": 1,
+    "invest": 0,
+    "about": 0,
+    "properties_list": 3,
+    "property_detail": 2,
+    "api_listings": 3,
+    "api_listing_detail": 3,
+    "api_map": 2,
+    "api_changes": 2,
+    "sitemap": 2,
+    "sitemap_section": 2,
+    "metrics": 1,
+}
+
+# Vues publiques en lecture servies par un réplica (GET/HEAD, voir core/replicas.py)
+REPLICA_READ_VIEWS = {
+    "home",
+    "collaborators",
+    "properties_list",
+    "property_detail",
+    "api_listings",
+    "api_listing_detail",
+    "api_map",
+    "sitemap",
+    "sitemap_section",
+}
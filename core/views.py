@@ -1,10 +1,16 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.shortcuts import render
-from django.views.decorators.http import require_POST
+from django.http import Http404
+from django.middleware.csrf import get_token
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.cache import cache_control
 from .forms import ContactForm
+from asgiref.sync import sync_to_async
+from . import notifications
+from .http import arequire_POST, arequire_safe
+from .ratelimit import arate_limit
 from .models import Agent, Certification, ContactMessage
-from django.shortcuts import render, get_object_or_404
 from django.shortcuts import render
 from django.core.paginator import Paginator
 from django.db.models import Prefetch
@@ -17,6 +23,33 @@ from django.core.paginator import Paginator
 from django.shortcuts import render
 from .models import Listing
 
+PAGE_SIZE = 50
+# Pages sans cookie ni contenu par visiteur: cache partagé / CDN autorisé
+PUBLIC_PAGE_MAX_AGE = 300
+
+
+async def apaginate(qs, page_number):
+    """
+    Paginator.get_page() pour l'ORM async: compte et tranche via acount() et
+    `async for`; le Paginator ne sert plus qu'au calcul des numéros de page.
+    """
+    paginator = Paginator(range(await qs.acount()), PAGE_SIZE)
+    page_obj = paginator.get_page(page_number)
+    if paginator.count:
+        page_obj.object_list = [obj async for obj in qs[page_obj.start_index() - 1:page_obj.end_index()]]
+    else:
+        page_obj.object_list = []
+    return paginator, page_obj
+
+
+async def arender(request, template_name, context):
+    """
+    render() hors de la boucle d'événements: processeurs de contexte
+    (cache.get des fragments) et gabarits ({% cache %}, relations) sont
+    synchrones. Le contexte ne doit contenir que des données déjà évaluées.
+    """
+    return await sync_to_async(render)(request, template_name, context)
+
 # Create your views here.
 def index(request):
     """
@@ -53,24 +86,39 @@ def index(request):
     awards = Certification.objects.all().order_by("id") 
     return render(request, 'index.html', { "awards": awards, })
 
+@cache_control(public=True, max_age=PUBLIC_PAGE_MAX_AGE)
 def contact_page(request):
     return render(request, "contact.html")
 
-@require_POST
-def contact_submit(request):
+
+@arequire_safe
+async def csrf_token(request):
+    """
+    Jeton CSRF demandé par le JS juste avant l'envoi d'un formulaire: pose
+    le cookie csrftoken ici plutôt que dans les pages (qui restent
+    identiques pour tous et cachables). Jamais mis en cache.
+    """
+    response = JsonResponse({"token": get_token(request)})
+    add_never_cache_headers(response)
+    return response
+
+@arequire_POST
+@arate_limit("contact")
+async def contact_submit(request):
     form = ContactForm(request.POST)
     if not form.is_valid():
         # Retourne la première erreur lisible
         err = "; ".join([f"{k}: {', '.join(v)}" for k, v in form.errors.items()])
         return JsonResponse({"success": False, "error": err or "Formulaire invalide."})
     data = form.cleaned_data
-    ContactMessage.objects.create(
+    await ContactMessage.objects.acreate(
         name=data["name"],
         email=data["email"],
         phone=data.get("phone", ""),
         message=data["message"],
     )
-    # (Optionnel) envoi email: à brancher si souhaité.
+    # Courriel et CRM partent d'un job RQ groupé (core/notifications.py)
+    await sync_to_async(notifications.schedule)()
     return JsonResponse({"success": True})
 
 
@@ -81,12 +129,11 @@ def collaborators_page(request):
     - regroupe selon le champ 'title' (icontains 'courtier' vs 'adjointe')
     - photos en N&B par défaut, couleur au hover (géré via classes Tailwind)
     """
-    agents_courtiers = (
-        Agent.objects.filter(title__icontains="courtier").order_by("name")
-    )
-    agents_adjointes = (
-        Agent.objects.filter(title__icontains="adjointe").order_by("name")
+    agents = list(
+        Agent.objects.filter(Q(title__icontains="courtier") | Q(title__icontains="adjointe")).order_by("name")
     )
+    agents_courtiers = [a for a in agents if "courtier" in a.title.lower()]
+    agents_adjointes = [a for a in agents if "adjointe" in a.title.lower()]
     return render(
         request,
         "collaborateurs.html",
@@ -96,68 +143,73 @@ def collaborators_page(request):
         },
     )
 
+@cache_control(public=True, max_age=PUBLIC_PAGE_MAX_AGE)
 def invest_page(request):
     return render(request, "invest.html")
 
-@require_POST
-def invest_contact_submit(request):
+@arequire_POST
+@arate_limit("contact")
+async def invest_contact_submit(request):
     form = ContactForm(request.POST)
     if not form.is_valid():
         err = "; ".join([f"{k}: {', '.join(v)}" for k, v in form.errors.items()])
         return JsonResponse({"success": False, "error": err or "Formulaire invalide."})
     data = form.cleaned_data
-    ContactMessage.objects.create(
+    await ContactMessage.objects.acreate(
         name=data["name"],
         email=data["email"],
         phone=data.get("phone", ""),
         message="[Invest] " + data["message"],
     )
+    await sync_to_async(notifications.schedule)()
     return JsonResponse({"success": True})
 
 def a_propos(request):
     return render(request, "about.html")
 
-def properties_list(request):
+async def properties_list(request):
     """Liste les propriétés actives + vendues depuis ≤ 3 jours, paginées."""
-    cutoff = timezone.now() - timedelta(days=3)
-
-    qs = (
-        Listing.objects
-        .filter(
-            Q(status=Listing.STATUS_ACTIVE) |
-            Q(status=Listing.STATUS_SOLD, sold_at__gte=cutoff)
-        )
-        .prefetch_related("photos")
+    # Seule la photo de couverture sert dans la grille: prefetch limité à 1 par inscription
+    qs = Listing.objects.visible().prefetch_related(
+        Prefetch("photos", queryset=ListingPhoto.objects.order_by("sequence")[:1], to_attr="cover_photos")
     )
 
-    paginator = Paginator(qs, 50)  # 12 cartes / page (ajuste si besoin)
-    page_number = request.GET.get("page") or 1
-    page_obj = paginator.get_page(page_number)
+    paginator, page_obj = await apaginate(qs, request.GET.get("page") or 1)
+    # Liens de pagination sans l'ancien "page=": une seule valeur par lien
+    # (core/publish.py fait correspondre ?page=N à page-N.html)
+    query = request.GET.copy()
+    query.pop("page", None)
 
     context = {
         "listings": page_obj.object_list,
         "paginator": paginator,
         "page_obj": page_obj,
+        "query": query.urlencode(),
     }
-    return render(request, "properties_list.html", context)
+    return await arender(request, "properties_list.html", context)
 
 
-def property_detail(request, slug):
+async def property_detail(request, slug):
     """
     Détail d'une propriété: on adapte le modèle Listing ⇒ objet `property`
     attendu par le template, et on wrap les photos pour exposer .image.url
     """
-    listing = get_object_or_404(
-        Listing.objects.prefetch_related(
+    try:
+        listing = await Listing.objects.live().prefetch_related(
             Prefetch("photos", queryset=ListingPhoto.objects.order_by("sequence"))
-        ),
-        slug=slug,
-    )
+        ).aget(slug=slug)
+    except Listing.DoesNotExist:
+        raise Http404("Aucune propriété ne correspond à cette adresse.")
 
     # --- Wrap pour que le template puisse faire images.X.image.url
     # (image est un namespace avec un attribut url)
+    # url = dérivé WebP local si le pipeline photo est passé, srcset pour les tuiles,
+    # couleur + dimensions pour le placeholder
     images = [
-        SimpleNamespace(image=SimpleNamespace(url=p.url))
+        SimpleNamespace(image=SimpleNamespace(
+            url=p.display_url, srcset=p.srcset_webp,
+            width=p.width, height=p.height, color=p.placeholder_color,
+        ))
         for p in listing.photos.all()
     ]
 
@@ -181,4 +233,4 @@ def property_detail(request, slug):
         "property": property_view,
         "images": images,  # déjà triées par `sequence`
     }
-    return render(request, "property_detail.html", ctx)
\ No newline at end of file
+    return await arender(request, "property_detail.html", ctx)
\ No newline at end of file
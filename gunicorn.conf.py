@@ -0,0 +1,36 @@
+# gunicorn.conf.py — lu automatiquement par gunicorn depuis le dossier courant.
+#
+# Métriques multiprocessus (core/metrics.py): chaque worker écrit ses
+# compteurs dans PROMETHEUS_MULTIPROC_DIR; /metrics les additionne.
+#
+# Déploiement ASGI (vues async: liste/détail des propriétés, API, formulaires):
+#
+#     pip install "uvicorn[standard]"
+#     GUNICORN_ASGI=1 gunicorn -w 4
+#
+# Chaque worker uvicorn sert ses requêtes dans une boucle asyncio; l'ORM
+# async délègue le SQL à un thread par worker, où s'exécutent aussi les vues
+# restées synchrones (accueil, collaborateurs): autant de workers que de
+# cœurs, comme en WSGI. Sans GUNICORN_ASGI, on garde les workers sync:
+#
+#     gunicorn -w 4 lafreniere_site.wsgi:application
+import glob
+import os
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/lafreniere-metrics")
+
+if os.environ.get("GUNICORN_ASGI"):
+    # Un thread par requête sous ASGI: une connexion persistante par thread
+    # ne serait jamais réutilisée
+    os.environ.setdefault("CONN_MAX_AGE", "0")
+    worker_class = "uvicorn.workers.UvicornWorker"
+    wsgi_app = "lafreniere_site.asgi:application"
+    keepalive = 5
+
+
+def on_starting(server):
+    # Nouveau maître = nouveaux compteurs: on repart d'un dossier vide
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
@@ -3,6 +3,9 @@ ASGI config for lafreniere_site project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Servi en production par gunicorn + workers uvicorn (GUNICORN_ASGI=1, voir
+gunicorn.conf.py) ou, en local, `uvicorn lafreniere_site.asgi:application`.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -13,4 +16,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lafreniere_site.settings')
 
-application = get_asgi_application()
+# Fichiers statiques précompressés/hachés servis avant Django (voir static_serving.py)
+from lafreniere_site.static_serving import StaticFilesASGI  # noqa: E402
+
+application = StaticFilesASGI(get_asgi_application())
@@ -0,0 +1,127 @@
+"""
+Service des fichiers statiques depuis STATIC_ROOT, devant l'application Django.
+
+- choisit la variante précompressée (.br puis .gz, écrites par collectstatic)
+  selon Accept-Encoding;
+- Cache-Control "immutable" d'un an pour les noms hachés (styles.3f2a9c1b0d4e.css),
+  une heure pour les autres;
+- ETag / If-None-Match -> 304.
+
+Tout chemin hors STATIC_URL ou absent de STATIC_ROOT est passé à Django.
+Utilisé par wsgi.py (gunicorn sync) et asgi.py.
+"""
+import asyncio
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_SHORT = "public, max-age=3600"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+CHUNK_SIZE = 1 << 16
+
+
+def _accepted(accept_encoding):
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def resolve(path, accept_encoding="", if_none_match=""):
+    """
+    Retourne (status, headers, chemin_fichier | None) ou None si la requête
+    ne concerne pas un fichier statique existant.
+    """
+    prefix = settings.STATIC_URL
+    if not settings.STATIC_ROOT or not path.startswith(prefix):
+        return None
+    root = os.path.realpath(settings.STATIC_ROOT)
+    full = os.path.realpath(os.path.join(root, path[len(prefix):]))
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        return None
+
+    content_type, _ = mimetypes.guess_type(full)
+    content_type = content_type or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+        content_type += "; charset=utf-8"
+
+    headers = [("Content-Type", content_type)]
+    chosen, suffix = full, ""
+    accepted = _accepted(accept_encoding)
+    has_variants = False
+    for encoding, ext in ENCODINGS:
+        if os.path.isfile(full + ext):
+            has_variants = True
+            if not suffix and (encoding in accepted or "*" in accepted):
+                chosen, suffix = full + ext, ext
+                headers.append(("Content-Encoding", encoding))
+    if has_variants:
+        headers.append(("Vary", "Accept-Encoding"))
+
+    st = os.stat(chosen)
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}{suffix}"'
+    headers += [
+        ("Cache-Control", CACHE_IMMUTABLE if HASHED_NAME.search(full) else CACHE_SHORT),
+        ("ETag", etag),
+        ("Last-Modified", formatdate(st.st_mtime, usegmt=True)),
+    ]
+    if etag in [t.strip() for t in if_none_match.split(",")]:
+        return "304 Not Modified", [h for h in headers if h[0] != "Content-Type"], None
+    headers.append(("Content-Length", str(st.st_size)))
+    return "200 OK", headers, chosen
+
+
+class StaticFilesWSGI:
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        method = environ.get("REQUEST_METHOD")
+        if method in ("GET", "HEAD"):
+            # PATH_INFO est décodé en latin-1 par le serveur WSGI (PEP 3333)
+            path = environ.get("PATH_INFO", "").encode("latin-1").decode("utf-8", "replace")
+            found = resolve(path, environ.get("HTTP_ACCEPT_ENCODING", ""), environ.get("HTTP_IF_NONE_MATCH", ""))
+            if found:
+                status, headers, filepath = found
+                start_response(status, headers)
+                if filepath is None or method == "HEAD":
+                    return []
+                wrapper = environ.get("wsgi.file_wrapper", FileWrapper)
+                return wrapper(open(filepath, "rb"), CHUNK_SIZE)
+        return self.app(environ, start_response)
+
+
+class StaticFilesASGI:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            req = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+            found = resolve(scope["path"], req.get("accept-encoding", ""), req.get("if-none-match", ""))
+            if found:
+                status, headers, filepath = found
+                await send({
+                    "type": "http.response.start",
+                    "status": int(status[:3]),
+                    "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+                })
+                if filepath is None or scope["method"] == "HEAD":
+                    await send({"type": "http.response.body", "body": b""})
+                    return
+                with open(filepath, "rb") as f:
+                    while True:
+                        chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                        await send({"type": "http.response.body", "body": chunk, "more_body": bool(chunk)})
+                        if not chunk:
+                            return
+        await self.app(scope, receive, send)
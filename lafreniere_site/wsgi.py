@@ -13,4 +13,7 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lafreniere_site.settings')
 
-application = get_wsgi_application()
+# Fichiers statiques précompressés/hachés servis avant Django (voir static_serving.py)
+from lafreniere_site.static_serving import StaticFilesWSGI  # noqa: E402
+
+application = StaticFilesWSGI(get_wsgi_application())